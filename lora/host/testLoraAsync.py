@@ -0,0 +1,107 @@
+###########################################
+# test of the uasyncio API of the RAK811
+# driver against a scripted module on the
+# E32 simulator clock, runs on a host :
+# cd lora && python3 host/testLoraAsync.py
+###########################################
+
+import os
+import sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [os.path.join(os.path.dirname(os.path.dirname(here)), 'loraE32', 'host'), os.path.dirname(here)]
+
+import e32sim
+from e32sim import sim
+from loraAsync import asyncRak811
+import uasyncio as asyncio
+import utime
+
+# answer of the module after a command (us)
+REPLY_US = 20000
+
+
+class scriptedRak811:
+    ''' RAK811 on a UART of a board, answers the AT commands of script, writes lines of unsolicited output '''
+
+    def __init__(self, script):
+        self.script = script                       # command -> answer (bytes)
+        self.toHost = bytearray()
+        self.written = []
+
+    def hostWrite(self, data):
+        data = bytes(data)
+        self.written.append(data)
+        answer = self.script.get(data.strip().decode())
+        if answer is not None:
+            sim.at(REPLY_US, lambda: self.toHost.extend(answer))
+        return len(data)
+
+    def hostRead(self, n=None):
+        if not self.toHost:
+            return None
+        if n is None:
+            n = len(self.toHost)
+        data = bytes(self.toHost[:n])
+        del self.toHost[:n]
+        return data
+
+    def output(self, line, delay_ms):
+        sim.at(delay_ms * 1000, lambda: self.toHost.extend(line))
+
+
+module = scriptedRak811({ 'at+version':b'OK V3.0.0.14.H\r\n',
+                          'at+set_config=lora:work_mode:1':b'OK\r\n',
+                          'at+set_config=lora:ch_mask:0:0001':b'ERROR: 1\r\n',
+                          'at+get_config=lora:status':b'OK\r\nWork Mode: LoRaP2P\r\nList End\r\n' })
+results = {}
+
+
+def node():
+    rak = asyncRak811(1, 115200, timeout=500)
+    assert rak.start() == 'OK'
+    assert rak.getVersion() == 'V3.0.0.14.H', rak.getVersion()
+
+    async def requests():
+        start = utime.ticks_ms()
+        assert await rak.request('at+version') == 'OK'
+        assert rak.response == ['OK V3.0.0.14.H'], rak.response
+        # returns as soon as the module answers
+        assert utime.ticks_diff(utime.ticks_ms(), start) < 30
+        assert await rak.request('at+set_config=lora:work_mode:1') == 'OK'
+        assert rak.response == ['OK']
+        # ERROR line
+        assert await rak.request('at+set_config=lora:ch_mask:0:0001') == 'NOK'
+        assert rak.error == 'ERROR: 1'
+        # terminal token other than OK
+        assert await rak.request('at+get_config=lora:status', 'List End') == 'OK'
+        assert rak.response[-2:] == ['Work Mode: LoRaP2P', 'List End']
+        # no answer : NOK after the timeout
+        start = utime.ticks_ms()
+        assert await rak.request('at+unknown', timeout=200) == 'NOK'
+        assert 200 <= utime.ticks_diff(utime.ticks_ms(), start) < 210
+        results['requests'] = True
+
+    async def receiver():
+        # a received message while a request runs
+        module.output(b'at+recv=0,-40,10,4:31323334\r\n', 10)
+        results['recv'] = await rak.recvLine()
+
+    async def main():
+        await asyncio.gather(requests(), receiver())
+
+    asyncio.run(main())
+    rak.stop()
+
+
+board = e32sim.Board('node')
+board.uarts[1] = module
+sim.process(board, node)
+sim.run(10000)
+errors = [p.error for p in sim.processes if p.error is not None]
+sim.stop()
+assert not errors, errors
+assert results['requests']
+assert results['recv'] == b'at+recv=0,-40,10,4:31323334', results
+assert module.written[0] == b'at+version\r\n'
+print('testLoraAsync OK')
@@ -3,28 +3,58 @@ import utime
 
 class rak811:
     ''' class to communicate with an ESP32 via serial AT commands to the RAK811 LoRa module '''
-    
-    def __init__(self, RxTxPort, baudrate, debug=False):
+
+    # terminal tokens of a response
+    OK = b'OK'
+    ERROR = b'ERROR'
+    LISTEND = b'List End'
+    RECV = b'at+recv'
+    # maximum length of a response line (longer lines are cut)
+    LINEMAX = 256
+    # size of the UART read buffer
+    CHUNK = 64
+    # number of received messages (at+recv) kept until recv() reads them
+    RECVMAX = 8
+    # states of the response parser
+    IDLE = 0
+    WAIT = 1
+    DONE = 2
+
+    def __init__(self, RxTxPort, baudrate, debug=False, timeout=1000):
         self.RxTx = RxTxPort # RxTx channel of the ESP (1 or 2)
         self.bd = baudrate
         self.debug = debug
         self.version = ""
         self.serdev = None  # instance for UART
-        
+        self.timeout = timeout  # maximum wait time for a response (ms)
+        # response parser
+        self.chunk = bytearray(rak811.CHUNK)  # UART read buffer
+        self.chunkmv = memoryview(self.chunk)
+        self.line = bytearray(rak811.LINEMAX)  # line being received
+        self.linelen = 0
+        self.state = rak811.IDLE
+        self.token = rak811.OK  # terminal token of the running command
+        self.result = "NOK"  # result of the last command
+        self.response = []  # lines of the response of the last command
+        self.error = None  # ERROR line of the last command
+        self.received = []  # received messages (at+recv lines) not yet read by recv()
+
     def start(self):
         try:
             # make UART instance
             self.serdev = UART(self.RxTx, self.bd)
-            # get version of LoRa board
-            self.serdev.write(str.encode("at+version\r\n"))
-            return self.isOK(20, "OK")
-        
+            # get version of LoRa board (OK V3.0.0.14.H)
+            res = self.command("at+version", "OK")
+            if res == "OK" and self.response:
+                self.version = self.response[-1][2:].strip()
+            return res
+
         except Exception as E:
             if self.debug:
                 print("error on start UART", E)
             return "NOK"
-        
-    
+
+
     def stop(self):
         try:
             # only if UART instance exists
@@ -56,33 +86,115 @@ class rak811:
         pass
     
     
+    def command(self, cmd, stop="OK", timeout=None):
+        ''' Send an AT command and wait for the terminal token stop ("OK", "List End", ...) or an ERROR line.
+            Returns "OK" or "NOK" (ERROR or no terminal token within timeout ms), the response lines are
+            in self.response '''
+        self.begin(cmd, stop)
+        return self.waitFor(timeout)
+
+
+    def begin(self, cmd, stop="OK"):
+        ''' Send an AT command without waiting for the response '''
+        self.beginRaw(cmd.encode() + b"\r\n", stop.encode())
+
+
+    def beginRaw(self, data, stop=OK):
+        ''' Send an AT command line (bytes, bytearray or memoryview ending with \\r\\n) without waiting for the response,
+            stop is the terminal token as bytes '''
+        # messages received before the command are kept
+        self.poll()
+        self.token = stop
+        self.response = []
+        self.error = None
+        self.result = "NOK"
+        self.state = rak811.WAIT
+        if self.debug:
+            print(bytes(data))
+        self.serdev.write(data)
+
+
+    def waitFor(self, timeout=None):
+        ''' Read the UART until the running command is done or for timeout ms (default self.timeout) '''
+        if timeout is None:
+            timeout = self.timeout
+        start = utime.ticks_ms()
+        while True:
+            self.poll()
+            if self.state == rak811.DONE:
+                self.state = rak811.IDLE
+                return self.result
+            if utime.ticks_diff(utime.ticks_ms(), start) >= timeout:
+                if self.debug:
+                    print('Timeout waiting for %s after %d ms'%(self.token.decode(), timeout))
+                self.state = rak811.IDLE
+                return "NOK"
+            utime.sleep_ms(1)
+
+
+    def poll(self):
+        ''' Read the bytes received by the UART into the response parser (does not wait) '''
+        while self.serdev.any():
+            n = self.serdev.readinto(self.chunkmv, rak811.CHUNK)
+            if not n:
+                break
+            self.parse(self.chunkmv[:n])
+
+
+    def parse(self, data):
+        ''' Split the received bytes into lines in the line buffer, a complete line goes to the state machine '''
+        line = self.line
+        for b in data:
+            if b == 0x0A:  # \n
+                n = self.linelen
+                if n and line[n-1] == 0x0D:  # \r
+                    n -= 1
+                self.linelen = 0
+                if n:
+                    self.handleLine(bytes(line[:n]))
+            elif self.linelen < rak811.LINEMAX:
+                line[self.linelen] = b
+                self.linelen += 1
+
+
+    def handleLine(self, line):
+        ''' State machine of the response : a line with the terminal token or an ERROR line ends the running
+            command, at+recv lines are received messages '''
+        if self.debug:
+            print(line)
+        if line.startswith(rak811.RECV):
+            if len(self.received) >= rak811.RECVMAX:
+                self.received.pop(0)
+            self.received.append(line)
+            if self.state == rak811.WAIT and self.token == rak811.RECV:
+                self.result = "OK"
+                self.state = rak811.DONE
+            return
+        if self.state != rak811.WAIT:
+            return
+        if line.startswith(rak811.ERROR):
+            self.error = line.decode()
+            self.result = "NOK"
+            self.state = rak811.DONE
+            return
+        self.response.append(line.decode())
+        if self.token in line:
+            self.result = "OK"
+            self.state = rak811.DONE
+
+
     def isOK(self, lines, stop):
+        ''' Wait for the terminal token stop of a command sent with serdev.write. The wait is bounded by
+            self.timeout, lines is kept for existing callers '''
         try:
-            counter = 0
-            while counter < lines:
-                # wait a while before reading
-                utime.sleep_ms(20)
-                res = self.serdev.readline()
-                # no answer
-                if res == None:
-                    counter += 1
-                    continue
-                # we did get an answer
-                res = res.decode('utf-8')
-                if self.debug:
-                    print(res)
-                # Is it OK ?
-                if stop.upper() in res.upper():
-                    return "OK"
-                counter += 1
-            # no answer after lines tries
-            return "NOK"
-        
+            self.token = stop.encode()
+            self.response = []
+            self.error = None
+            self.result = "NOK"
+            self.state = rak811.WAIT
+            return self.waitFor()
+
         except Exception as E:
             if self.debug:
                 print('Error on isOK: ',E)
             return "NOK"
-            
-        
-        
-            
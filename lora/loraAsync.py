@@ -0,0 +1,63 @@
+import uasyncio as asyncio
+import utime
+from lora import rak811
+
+class asyncRak811(rak811):
+    ''' class to communicate with the RAK811 LoRa module via AT commands with uasyncio : the UART is read with a
+        StreamReader, so a command returns as soon as the module answers and other tasks run meanwhile '''
+
+    # maximum time recvLine holds the UART (ms)
+    RECVWAIT = 100
+
+    def __init__(self, RxTxPort, baudrate, debug=False, timeout=1000):
+        super().__init__(RxTxPort, baudrate, debug, timeout)
+        self.reader = None  # StreamReader on the UART
+        self.lock = asyncio.Lock()  # one command at a time
+
+
+    def start(self):
+        res = super().start()
+        if res == "OK":
+            self.reader = asyncio.StreamReader(self.serdev)
+        return res
+
+
+    async def request(self, cmd, stop="OK", timeout=None):
+        ''' Send an AT command and await the terminal token stop or an ERROR line, see command '''
+        async with self.lock:
+            self.begin(cmd, stop)
+            return await self.awaitResponse(timeout)
+
+
+    async def awaitResponse(self, timeout=None):
+        ''' Await the end of the running command for timeout ms (default self.timeout) '''
+        if timeout is None:
+            timeout = self.timeout
+        start = utime.ticks_ms()
+        while self.state != rak811.DONE:
+            remaining = timeout - utime.ticks_diff(utime.ticks_ms(), start)
+            if remaining <= 0:
+                if self.debug:
+                    print('Timeout waiting for %s after %d ms'%(self.token.decode(), timeout))
+                self.state = rak811.IDLE
+                return "NOK"
+            try:
+                data = await asyncio.wait_for_ms(self.reader.read(rak811.CHUNK), remaining)
+            except asyncio.TimeoutError:
+                continue
+            self.parse(data)
+        self.state = rak811.IDLE
+        return self.result
+
+
+    async def recvLine(self):
+        ''' Await the next received message (at+recv line). The UART is read in slices of RECVWAIT ms, so a
+            request of another task does not wait longer '''
+        while not self.received:
+            async with self.lock:
+                try:
+                    data = await asyncio.wait_for_ms(self.reader.read(rak811.CHUNK), asyncRak811.RECVWAIT)
+                except asyncio.TimeoutError:
+                    continue
+                self.parse(data)
+        return self.received.pop(0)
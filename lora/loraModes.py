@@ -5,6 +5,20 @@ import utime
 class rak811P2P(rak811):
     ''' class for P2P communication between RAB811 LoRa modules '''
     
+    # key names (lower case, without spaces, underscores and a LoRaP2P prefix) of the lines of
+    # at+get_config=lora:status and the settings they hold
+    STATUSKEYS = {"workmode":"mode", "frequency":"freq", "freq":"freq", "spreadfact":"spreading", "spreadingfactor":"spreading",
+                  "sf":"spreading", "bandwidth":"bandwidth", "bw":"bandwidth", "coderate":"codingrate", "codingrate":"codingrate",
+                  "cr":"codingrate", "preamlen":"preamble", "preamble":"preamble", "preamblelength":"preamble",
+                  "power":"power", "txpower":"power"}
+    # bandwidth 125, 250, 500 kHz and its index in the lorap2p config
+    BANDWIDTHS = {125:0, 250:1, 500:2}
+    # AT command of a send, the payload is hex encoded between the prefix and \r\n
+    SENDPREFIX = b"at+send=lorap2p:"
+    HEXDIGITS = b"0123456789abcdef"
+    # maximum payload length of a send (bytes)
+    MAXSEND = 255
+    
     def __init__(self, RxTx, baudrate, freq=869525000, bandwidth=125, spreading=7, codingrate=1, preamble=5, power=5, debug=False):
         self.freq = freq
         self.bandwidth = bandwidth
@@ -12,24 +26,24 @@ class rak811P2P(rak811):
         self.coderate = codingrate
         self.preamble = preamble
         self.power = power
+        self.startStats = {}
+        # preallocated send command : prefix, hex encoded payload, \r\n
+        self.sendbuf = bytearray(len(rak811P2P.SENDPREFIX) + 2 * rak811P2P.MAXSEND + 2)
+        self.sendbuf[:len(rak811P2P.SENDPREFIX)] = rak811P2P.SENDPREFIX
+        self.sendmv = memoryview(self.sendbuf)
+        self.sendlen = 0
+        self.lastMsg = None  # str or bytes message encoded in the send buffer
         super().__init__(RxTx, baudrate, debug)
     
     
     def start(self):
+        ''' Start the RAK811 in P2P mode. The work mode and P2P parameters of the module are queried once, only the
+            commands for settings which differ are sent '''
         try:
+            start = utime.ticks_ms()
             if super().start() == "OK":
-                # set P2P mode
-                utime.sleep_ms(20)
-                self.serdev.write(str.encode("at+set_config=lora:work_mode:1\r\n"))
-                res = self.isOK(10, "OK")
-                if res == "NOK":
-                    if self.debug:
-                        print("change mode to P2P not OK")
-                    return "NOK"
-                
                 # translate bandwidth 125, 250, 500 kHz to 0, 1, 2
-                posBandWidths = {125:0, 250:1, 500:2}
-                self.bandwidth=posBandWidths.get(self.bandwidth, 0)
+                self.bandwidth=rak811P2P.BANDWIDTHS.get(self.bandwidth, self.bandwidth if self.bandwidth in (0, 1, 2) else 0)
                 # control spreading
                 if self.spread < 7 or self.spread > 12:
                     self.spread = 7
@@ -43,13 +57,38 @@ class rak811P2P(rak811):
                 if self.power < 5 or self.power > 14:
                     self.power = 5
                 
+                # current settings of the module
+                status = self.readStatus()
+                sent = 0
+                
+                # set P2P mode
+                if str(status.get("mode", "")).lower() != "lorap2p":
+                    res = self.command("at+set_config=lora:work_mode:1", "OK")
+                    if res == "NOK":
+                        if self.debug:
+                            print("change mode to P2P not OK")
+                        return "NOK"
+                    sent += 1
+                    # P2P parameters of the module unknown after the mode switch
+                    status = {}
+                
                 # set communication parameters
-                sendSettingStr = "lorap2p:" + str(self.freq) + ":" + str(self.spread) + ":" + str(self.bandwidth) + ":" + str(self.coderate) + ":" + str(self.preamble) + ":" + str(self.power)
-                self.serdev.write(str.encode("at+set_config=" + sendSettingStr + "\r\n"))
-                res = self.isOK(10, "OK")
-                if res == "NOK" and self.debug:
-                    print("problem with P2P config params")
-                    return "NOK"
+                wanted = {"freq":self.freq, "spreading":self.spread, "bandwidth":self.bandwidth, "codingrate":self.coderate,
+                          "preamble":self.preamble, "power":self.power}
+                if any(status.get(key) != value for key, value in wanted.items()):
+                    sendSettingStr = "lorap2p:" + str(self.freq) + ":" + str(self.spread) + ":" + str(self.bandwidth) + ":" + str(self.coderate) + ":" + str(self.preamble) + ":" + str(self.power)
+                    res = self.command("at+set_config=" + sendSettingStr, "OK")
+                    if res == "NOK":
+                        if self.debug:
+                            print("problem with P2P config params")
+                        return "NOK"
+                    sent += 1
+                
+                # bring-up time : start() and since power-up (boot or wake from deep sleep)
+                self.startStats = {"start_ms":utime.ticks_diff(utime.ticks_ms(), start), "ready_ms":utime.ticks_ms(),
+                                   "commands":2 + sent, "skipped":2 - sent}
+                if self.debug:
+                    print(self.startStats)
                 return "OK"
             else:
                 if self.debug:
@@ -62,14 +101,70 @@ class rak811P2P(rak811):
             return "NOK"
 
     
+    def readStatus(self):
+        ''' Query the work mode and P2P parameters of the module (at+get_config=lora:status). Returns a dictionary
+            with the settings found (mode, freq, spreading, bandwidth, codingrate, preamble, power) '''
+        status = {}
+        if self.command("at+get_config=lora:status", "List End") != "OK":
+            return status
+        for line in self.response:
+            if ":" not in line:
+                continue
+            key, value = line.split(":", 1)
+            key = key.lower().replace(" ", "").replace("_", "")
+            if key.startswith("ok"):
+                key = key[2:]
+            for prefix in ("lorap2p", "p2p"):
+                if key.startswith(prefix):
+                    key = key[len(prefix):]
+            name = rak811P2P.STATUSKEYS.get(key)
+            if name is None or name in status:
+                continue
+            value = value.strip()
+            if name != "mode":
+                # leading digits of the value (869525000, 125 kHz, ...)
+                digits = ""
+                for c in value:
+                    if not c.isdigit():
+                        break
+                    digits += c
+                if digits == "":
+                    continue
+                value = int(digits)
+                if name == "bandwidth":
+                    value = rak811P2P.BANDWIDTHS.get(value, value)
+            status[name] = value
+        return status
+
+    
+    def getStartStats(self):
+        ''' Bring-up of the last start() : duration of start() and ticks since power-up when ready (ms), commands
+            sent and configuration commands skipped because the module had the settings '''
+        return self.startStats
+
+    
     def send(self,msg):
+        ''' Send a message (str, bytes, bytearray or memoryview) to the P2P nodes. The payload is hex encoded in the
+            preallocated send buffer, a repeat of the same str or bytes message sends the buffer again '''
         try:
-            Hex = ubinascii.hexlify(msg.encode("utf-8"))
-            if self.debug:
-                print(Hex)
-            self.serdev.write(str.encode("at+send=lorap2p:" + str(Hex.decode()) + "\r\n"))
-            res = self.isOK(5, "OK")
-            return res
+            if msg is not self.lastMsg or self.sendlen == 0:
+                data = msg.encode("utf-8") if type(msg) == str else msg
+                if len(data) > rak811P2P.MAXSEND:
+                    raise ValueError("payload longer than %d bytes"%(rak811P2P.MAXSEND))
+                buf = self.sendbuf
+                digits = rak811P2P.HEXDIGITS
+                pos = len(rak811P2P.SENDPREFIX)
+                for b in data:
+                    buf[pos] = digits[b >> 4]
+                    buf[pos + 1] = digits[b & 0x0F]
+                    pos += 2
+                buf[pos] = 0x0D
+                buf[pos + 1] = 0x0A
+                self.sendlen = pos + 2
+                # a bytearray or memoryview can change between two sends
+                self.lastMsg = msg if type(msg) in (str, bytes) else None
+            self.beginRaw(self.sendmv[:self.sendlen], rak811.OK)
+            return self.waitFor()
         
         except Exception as E:
             if self.debug:
@@ -79,13 +174,14 @@ class rak811P2P(rak811):
     
     def recv(self):
         try:
-            res = self.serdev.readline()
-            if res == None:
+            # at+recv lines are collected by the response parser
+            self.poll()
+            if not self.received:
                 if self.debug:
                     print('No response')
                 return "NOK"
             else:
-                res = res.decode('utf-8')
+                res = self.received.pop(0).decode('utf-8')
                 if self.debug:
                     print(res)
                 if "at+recv" in res:
@@ -96,8 +192,8 @@ class rak811P2P(rak811):
                         if self.debug:
                             print('No valid message payload')
                         return "NOK"
-                    # remove \r\n from the end of the payload
-                    msg = msg[1][:-2]  
+                    # the response parser removed \r\n from the end of the payload
+                    msg = msg[1]
                     msg = ubinascii.unhexlify(msg).decode('utf-8')
                     return 'msg=' + msg
                 else:
@@ -117,8 +213,7 @@ class rak811P2P(rak811):
 
     def getStatus(self):
         try:
-            self.serdev.write(str.encode("at+get_config=lora:status\r\n"))
-            return self.isOK(30, "List End")
+            return self.command("at+get_config=lora:status", "List End")
         
         except Exception as E:
             if self.debug:
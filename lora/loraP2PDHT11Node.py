@@ -133,7 +133,8 @@ try:
     if res == "NOK":
         print("problem init RAK811, quit the application")
         sys.exit()
-    print(rak811.getStatus())
+    # bring-up time of the RAK811 (share of the awake time)
+    print(rak811.getStartStats())
     
     #init sensoren
     sens = []
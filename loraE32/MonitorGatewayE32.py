@@ -0,0 +1,69 @@
+###########################################################################
+# this node receives sensor data from the sensor nodes on channel 4 and
+# channel 6 with two E32 modules, on UART1 and UART2. Like MonitorNodeE32.py
+# the sensor data is stored in an Influx database table.
+###########################################################################
+# receiving fixed monitor
+###########################################################################
+# transmitter - address 0001 - channel 02
+# message     - address 0003 - channel 04 or 06
+# receiver 1  - address FFFF - channel 04 - UART1
+# receiver 2  - address FFFF - channel 06 - UART2
+###########################################################################
+
+from loraE32 import ebyteE32
+from gatewayE32 import gatewayE32
+from influxE32 import influxE32
+import simpleWifi
+import utime
+
+# pins E32 on UART1
+M0pin1 = 25
+M1pin1 = 26
+AUXpin1 = 27
+# pins E32 on UART2
+M0pin2 = 32
+M1pin2 = 33
+AUXpin2 = 35
+
+# seconds from 1970-01-01 (Influx timestamps) to 2000-01-01 (epoch of utime.time)
+EPOCH = 946684800
+
+# instances
+e32a = ebyteE32(M0pin1, M1pin1, AUXpin1, Port='U1', Address=0xFFFF, Channel=0x04, debug=False)
+e32b = ebyteE32(M0pin2, M1pin2, AUXpin2, Port='U2', Address=0xFFFF, Channel=0x06, debug=False)
+gateway = gatewayE32([e32a, e32b], useChecksum=True)
+gateway.start()
+
+# influxdb, sensor points with the time of each sample
+dbhost = "192.168.1.40"
+points = influxE32(dbhost, 8086, "serre_frank", "sensors", debug=False)
+
+# connect to WiFi
+myWifi = simpleWifi.Wifi()
+if myWifi.open():
+    print(myWifi.get_IPdata())
+else:
+    print('No connection to WiFi')
+
+# loop to receive sensor data of both modules
+while True:
+    for message in gateway.recvMessages():
+        if 'node' not in message.keys():
+            continue
+        print('Receiving gateway : message %s'%(message))
+        # a batch contains the samples of several wakeups of the sensor node, written with the time of each sample
+        node = 'node_' + message.get('node')
+        now = utime.time() + EPOCH
+        for sample in message.get('batch', [message]):
+            timestamp = now - sample.get('age', 0)
+            for field in ('temp', 'hum', 'pres'):
+                value = sample.get(field)
+                if value is not None:
+                    points.add(node, field, value, timestamp)
+        points.write()
+    # wait for next check
+    utime.sleep_ms(1000)
+
+# stop E32 modules
+gateway.stop()
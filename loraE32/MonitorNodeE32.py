@@ -1,7 +1,9 @@
 ###########################################################################
 # this node receives sensor data from all sensor nodes transmitting on
 # channel 4. Valid sensor data is stored in an Influx database table to be
-# visualized in a Grafana dashboard
+# visualized in a Grafana dashboard. Sensor data can be sent as JSON or
+# as a binary payload, both decode to the same dictionary. A batch of
+# samples is unpacked into the individual samples.
 ###########################################################################
 # receiving fixed monitor
 ###########################################################################
@@ -12,6 +14,7 @@
 
 from loraE32 import ebyteE32
 from influxdbTools import influxdbPutData
+from influxE32 import influxE32
 import simpleWifi
 import utime
 
@@ -20,6 +23,9 @@ M0pin = 25
 M1pin = 26
 AUXpin = 27
 
+# seconds from 1970-01-01 (Influx timestamps) to 2000-01-01 (epoch of utime.time)
+EPOCH = 946684800
+
 # instances
 e32 = ebyteE32(M0pin, M1pin, AUXpin, Address=0xFFFF, Channel=0x04, debug=False)
 e32.start()
@@ -27,6 +33,8 @@ e32.start()
 # influxdb
 dbhost = "192.168.1.40"
 influx = influxdbPutData(dbhost, 8086, "serre_frank", "node", "field", "value", debug=False)
+# sensor points with the time of each sample (influxdbTools writes them with the write time)
+points = influxE32(dbhost, 8086, "serre_frank", "sensors", debug=False)
 
 # connect to WiFi
 myWifi = simpleWifi.Wifi()
@@ -38,29 +46,46 @@ else:
 # loop to receive sensor data
 from_address = 0x0001
 from_channel = 0x02
+cycles = 0
+# listen session : the module stays in normal mode, a poll only reads the UART
+e32.listen(useChecksum=True)
 while True:
     # check for sensor data 
-    message = e32.recvMessage(from_address, from_channel, useChecksum=True)
-    if 'node' in message.keys():
+    for message in e32.pollMessages():
+        if 'node' not in message.keys():
+            continue
         # display message
         print('.')
         print('Receiving fixed monitor : address %d - channel %d - message %s'%(from_address, from_channel, message))
-        # fill datastructure with sensor data
+        # a batch contains the samples of several wakeups of the sensor node, each sample is written with the
+        # time it was taken : age seconds before the last sample, which is sent when it is taken
         node = 'node_' + message.get('node')
-        field = 'temp'
-        value = message.get('temp')
-        if value is not None:
-            influx.makeDataStringNodeFieldValue(node, field, value)  # temperature
-        field = 'hum'
-        value = message.get('hum')
-        if value is not None:
-            influx.makeDataStringNodeFieldValue(node, field, value)  # humidity
-        field = 'pres'
-        value = message.get('pres')
-        if value is not None:
-            influx.makeDataStringNodeFieldValue(node, field, value)  # pressure
+        now = utime.time() + EPOCH
+        for sample in message.get('batch', [message]):
+            timestamp = now - sample.get('age', 0)
+            # fill datastructure with sensor data
+            field = 'temp'
+            value = sample.get('temp')
+            if value is not None:
+                points.add(node, field, value, timestamp)  # temperature
+            field = 'hum'
+            value = sample.get('hum')
+            if value is not None:
+                points.add(node, field, value, timestamp)  # humidity
+            field = 'pres'
+            value = sample.get('pres')
+            if value is not None:
+                points.add(node, field, value, timestamp)  # pressure
         # write sensor data to influxdb
+        points.write()
+    # publish the driver statistics every 5 minutes
+    cycles += 1
+    if cycles % 60 == 0:
+        stats = e32.stats()
+        for field in ('mode_ms', 'aux_ms', 'aux_timeouts', 'frames_rx', 'checksum_errors', 'decode_errors'):
+            influx.makeDataStringNodeFieldValue('monitor', field, stats[field])
         influx.writeToInfluxdb()
+        e32.resetStats()
     # wait for next check
     print('.', end='')
     utime.sleep_ms(5000)
@@ -0,0 +1,108 @@
+###########################################################################
+# this node receives sensor data from all sensor nodes transmitting on
+# channel 4, like MonitorNodeE32.py but with uasyncio : receiving radio
+# traffic, pushing to the Influx database and showing the last message on
+# the oled display run as tasks on one event loop
+###########################################################################
+# receiving fixed monitor
+###########################################################################
+# transmitter - address 0001 - channel 02
+# message     - address 0003 - channel 04
+# receiver    - address FFFF - channel 04
+###########################################################################
+
+from machine import Pin, I2C
+from asyncE32 import asyncE32
+from influxE32 import influxE32
+import simpleWifi
+import ssd1306
+import uasyncio as asyncio
+import utime
+
+
+class myGlobals:
+    queue = []              # received messages waiting for influxdb : (receive time, message)
+    last = ''               # last received node for the display
+
+
+# pins E32
+M0pin = 25
+M1pin = 26
+AUXpin = 27
+oled_i2c_address = 0x3C # decimaal 60
+
+# seconds from 1970-01-01 (Influx timestamps) to 2000-01-01 (epoch of utime.time)
+EPOCH = 946684800
+
+# instances
+e32 = asyncE32(M0pin, M1pin, AUXpin, Address=0xFFFF, Channel=0x04, debug=False)
+e32.start()
+i2c = I2C(scl=Pin(21), sda=Pin(22))
+oled = ssd1306.SSD1306_I2C(128, 64, i2c, addr = oled_i2c_address)
+
+# influxdb, sensor points with the time of each sample
+dbhost = "192.168.1.40"
+points = influxE32(dbhost, 8086, "serre_frank", "sensors", debug=False)
+
+# connect to WiFi
+myWifi = simpleWifi.Wifi()
+if myWifi.open():
+    print(myWifi.get_IPdata())
+else:
+    print('No connection to WiFi')
+
+
+# coroutine receiving sensor data
+async def receive(from_address, from_channel):
+    async for message in e32.messages(from_address, from_channel, useChecksum=True):
+        if 'node' in message.keys():
+            print('Receiving fixed monitor : address %d - channel %d - message %s'%(from_address, from_channel, message))
+            myGlobals.queue.append((utime.time() + EPOCH, message))
+            myGlobals.last = 'node_' + message.get('node')
+
+
+# coroutine writing sensor data to influxdb
+async def push():
+    while True:
+        while myGlobals.queue:
+            received, message = myGlobals.queue.pop(0)
+            node = 'node_' + message.get('node')
+            # a batch is written with the time of each sample
+            for sample in message.get('batch', [message]):
+                timestamp = received - sample.get('age', 0)
+                for field in ('temp', 'hum', 'pres'):
+                    value = sample.get(field)
+                    if value is not None:
+                        points.add(node, field, value, timestamp)
+            points.write()
+        await asyncio.sleep_ms(100)
+
+
+# coroutine showing the last received node on the display
+async def display():
+    while True:
+        oled.fill(0)
+        oled.text('E32 monitor', 0, 0)
+        oled.text(myGlobals.last, 0, 16)
+        oled.show()
+        await asyncio.sleep(1)
+
+
+try:
+    # event loop scheduler initialiseren
+    loop = asyncio.get_event_loop()
+    # taken op de event loop queue zetten
+    loop.create_task(receive(0x0001, 0x02))
+    loop.create_task(push())
+    loop.create_task(display())
+    # taken laten uitvoeren
+    loop.run_forever()
+
+except Exception as E:
+    print('Probleem met asyncio - %s'%E)
+
+finally:
+    # event loop scheduler afsluiten
+    loop.close()
+    e32.stop()
+    oled.poweroff()
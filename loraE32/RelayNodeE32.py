@@ -0,0 +1,41 @@
+###########################################################################
+# this node relays the sensor data of sensor nodes out of range of the
+# monitor node. The sensor nodes send to the relay with sendRouted, the
+# relay forwards the frames without decoding them : to the monitor node
+# when it is in range, otherwise to the next relay.
+###########################################################################
+# multi-hop relay
+###########################################################################
+# transmitter - address 0001 - channel 02 - default route 0005 ch 04
+# relay       - address 0005 - channel 04
+# monitor     - address 0003 - channel 04 - in range of the relay
+###########################################################################
+
+from relayE32 import relayE32
+import utime
+
+# pins E32
+M0pin = 25
+M1pin = 26
+AUXpin = 27
+
+# instances
+e32 = relayE32(M0pin, M1pin, AUXpin, Address=0x0005, Channel=0x04, debug=False)
+e32.start()
+
+# routing table : the monitor node is in range, no route needed.
+# a monitor behind another relay would be :
+# e32.addRoute(0x0003, 0x04, 0x0006, 0x04)
+
+# loop to forward sensor data
+from_address = 0x0001
+from_channel = 0x02
+cycles = 0
+while True:
+    # forwarded frames yield no message, only messages for the relay itself
+    for message in e32.recvMessages(from_address, from_channel, useChecksum=True):
+        print('Receiving relay : message %s'%(message))
+    cycles += 1
+    if cycles % 600 == 0:
+        print('Relay statistics : %s'%(e32.getRelayStats()))
+    utime.sleep_ms(100)
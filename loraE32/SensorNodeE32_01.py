@@ -1,6 +1,8 @@
 ###########################################################################
-# this node sends temperature & humidity of a DHT11 sensor every 5 minutes,
-# after transmitting the ESP32 goes to deepsleep to save battery power
+# this node sends temperature & humidity of a DHT11 sensor every 5 minutes.
+# The samples are packed in RTC memory and sent as one batch when the E32
+# sub-packet is full, in between the ESP32 goes to deepsleep to save
+# battery power without starting the E32 module
 ###########################################################################
 # transmitter - address 0001 - channel 02
 # message     - address 0003 - channel 04
@@ -9,6 +11,7 @@
 
 from machine import Pin, deepsleep
 from loraE32 import ebyteE32
+from packerE32 import packerE32
 import dht
 import utime
 import sys
@@ -21,10 +24,6 @@ AUXpin = 27
 # pin DHT11
 DHTpin = 14
 
-# instance E32
-e32 = ebyteE32(M0pin, M1pin, AUXpin, Address=0x0001, Channel=0x02, debug=False)
-e32.start()
-
 # instance DHT11
 dht11 = dht.DHT11(Pin(DHTpin))
 
@@ -40,14 +39,23 @@ for i in range(5):
 temp = int(round(temptot / 5))
 hum = int(round(humtot / 5))
 
-# send sensor data 
-to_address = 0x0003
-to_channel = 0x04
-message = { 'node': '01', 'temp': str(temp), 'hum': str(hum) }
-print('Sending fixed monitor : address %s - channel %d - message %s'%(to_address, to_channel, message))
-e32.sendMessage(to_address, to_channel, message, useChecksum=True)
-utime.sleep(3)
-e32.stop()
+# pack sensor data, send the batch when it is full. A batch not sent is retried at the next wakeup : the oldest
+# sample makes room for the new one, so the batch always ends with the sample just taken and the monitor dates
+# the samples from the receive time
+packer = packerE32('01', ('temp', 'hum'))
+if packer.isFull():
+    packer.dropOldest()
+packer.add({ 'temp': temp, 'hum': hum })
+if packer.isFull():
+    # instance E32
+    e32 = ebyteE32(M0pin, M1pin, AUXpin, Address=0x0001, Channel=0x02, debug=False)
+    e32.start()
+    to_address = 0x0003
+    to_channel = 0x04
+    print('Sending fixed monitor : address %s - channel %d - %d samples'%(to_address, to_channel, packer.count()))
+    if e32.sendFrame(to_address, to_channel, packer.frame(), useChecksum=True) == 'OK':
+        packer.clear()
+    e32.stop()
 
 # deepsleep for 5 min
 deepsleep(300000)
\ No newline at end of file
@@ -1,6 +1,8 @@
 ###########################################################################
-# this node sends temperature & pressure of a BMP180 sensor every 5 minutes,
-# after transmitting the ESP32 goes to deepsleep to save battery power
+# this node sends temperature & pressure of a BMP180 sensor every 5 minutes.
+# The samples are packed in RTC memory and sent as one batch when the E32
+# sub-packet is full, in between the ESP32 goes to deepsleep to save
+# battery power without starting the E32 module
 ###########################################################################
 # transmitter - address 0002 - channel 02
 # message     - address 0003 - channel 04
@@ -9,6 +11,7 @@
 
 from machine import Pin, I2C, deepsleep
 from loraE32 import ebyteE32
+from packerE32 import packerE32
 from bmp180 import BMP180
 import utime
 import sys
@@ -18,10 +21,6 @@ M0pin = 25
 M1pin = 26
 AUXpin = 27
 
-# instance E32
-e32 = ebyteE32(M0pin, M1pin, AUXpin, Address=0x0001, Channel=0x02, debug=False)
-e32.start()
-
 # instance BPM180
 bus =  I2C(scl=Pin(22), sda=Pin(21), freq=100000)
 bmp180 = BMP180(bus)
@@ -39,14 +38,23 @@ for i in range(5):
 temp = int(round(temptot / 5))
 pres = int(round(prestot / 5))
 
-# send sensor data 
-to_address = 0x0003
-to_channel = 0x04
-message = { 'node': '02', 'temp': str(temp), 'pres': str(pres) }
-print('Sending fixed monitor : address %s - channel %d - message %s'%(to_address, to_channel, message))
-e32.sendMessage(to_address, to_channel, message, useChecksum=True)
-utime.sleep(3)
-e32.stop()
+# pack sensor data, send the batch when it is full. A batch not sent is retried at the next wakeup : the oldest
+# sample makes room for the new one, so the batch always ends with the sample just taken and the monitor dates
+# the samples from the receive time
+packer = packerE32('02', ('temp', 'pres'))
+if packer.isFull():
+    packer.dropOldest()
+packer.add({ 'temp': temp, 'pres': pres })
+if packer.isFull():
+    # instance E32
+    e32 = ebyteE32(M0pin, M1pin, AUXpin, Address=0x0001, Channel=0x02, debug=False)
+    e32.start()
+    to_address = 0x0003
+    to_channel = 0x04
+    print('Sending fixed monitor : address %s - channel %d - %d samples'%(to_address, to_channel, packer.count()))
+    if e32.sendFrame(to_address, to_channel, packer.frame(), useChecksum=True) == 'OK':
+        packer.clear()
+    e32.stop()
 
 # deepsleep for 5 min
 deepsleep(300000)
\ No newline at end of file
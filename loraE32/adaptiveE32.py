@@ -0,0 +1,310 @@
+#######################################################################
+# MicroPython link adaptation for EBYTE E32 Series LoRa modules.
+# Every node uses the air data rate and TX power of its constructor,
+# also a node next to the monitor. This class adapts both per link,
+# driven by the ACKs of the acknowledged delivery of reliableE32 :
+#
+#   e32 = adaptiveE32(M0pin, M1pin, AUXpin, Address=0x0001, Channel=0x04)
+#   e32.start()
+#   e32.adaptLink(0x0003, 0x04)
+#   e32.sendMessage(0x0003, 0x04, { 'node':'01', 'temp':'21' }, useCRC=True)
+#
+# After GOOD messages in a row delivered without retransmission, the
+# link steps up : first a higher air data rate, at the highest rate a
+# lower TX power. Retransmissions step the link down in the reverse
+# order. Both ends need the same air data rate, so a step is agreed
+# with the peer (also an adaptiveE32) in link control frames :
+#
+#   LINK : [0xB6][6][ADDH][ADDL][CHAN][OP][RATE][POWER]
+#
+# ADDH, ADDL and CHAN are the address and channel of the transmitter of
+# the frame, RATE the air data rate bits and POWER the TX power bits.
+# The transmitter sends a REQ with the current settings, the peer
+# answers CONFIRM with the settings it accepted and switches. The
+# transmitter switches too and sends a CHECK with the new settings,
+# which the peer answers with a CONFIRM. Without CHECK both ends return
+# to the previous settings after CHECKWAIT ms. A peer which receives
+# from several transmitters sets acceptRate = False : it keeps its own
+# air data rate and the transmitter only lowers its TX power.
+#
+# A message which is not acknowledged steps the link down. When that
+# step is not confirmed either, both ends return to the settings of
+# their constructor : the transmitter at once, the peer when it hears
+# nothing from the transmitter during fallback ms.
+#######################################################################
+
+from loraE32 import ebyteE32
+from reliableE32 import reliableE32
+import utime
+
+
+class adaptiveE32(reliableE32):
+    ''' class to adapt the air data rate and TX power of ebyte E32 LoRa modules per link '''
+
+    # header byte of a link control frame
+    LINK = 0xB6
+    # operations of a link control frame
+    REQ = 1
+    CONFIRM = 2
+    CHECK = 3
+    # air data rates from low to high
+    RATES = ('0.3k', '1.2k', '2.4k', '4.8k', '9.6k', '19.2k')
+    # highest air data rate and lowest TX power (TXPOWER bits) of an adapted link
+    MAXRATE = '19.2k'
+    MINPOWER = 0b11
+    # messages in a row without retransmission before stepping up
+    GOOD = 6
+    # retransmissions (since the last step) before stepping down
+    BAD = 2
+    # time without frames of the transmitter before the peer returns to its own settings (ms)
+    FALLBACK = 300000
+    # a step down multiplies the GOOD messages before the next step up
+    HOLDOFF = 4
+    # time the peer waits for the CHECK before returning to the previous settings (ms)
+    CHECKWAIT = 10000
+    # time between the CONFIRM and the CHECK, for the peer to switch (ms)
+    GUARD = 50
+
+
+    def __init__(self, PinM0, PinM1, PinAUX, **kwargs):
+        ''' constructor for ebyte E32 LoRa module with link adaptation, see ebyteE32 for the arguments '''
+        super().__init__(PinM0, PinM1, PinAUX, **kwargs)
+        self.baseRate = self.config['datarate']        # settings without adaptation
+        self.basePower = self.config['txpower']
+        self.links = {}                                # per adapted destination : [datarate, txpower, good, bad, fixed, unconfirmed]
+        self.link = bytearray(8)                       # preallocated link control frame
+        self.linkReply = None                          # settings in the awaited CONFIRM
+        self.acceptRate = True                         # follow the air data rate requested by a transmitter
+        self.fallback = adaptiveE32.FALLBACK
+        self.linkPeer = None                           # transmitter whose settings the module uses
+        self.linkHeard = 0                             # time of the last frame of that transmitter
+        self.linkPrevious = None                       # settings before the switch until the CHECK arrives
+        self.adaptation = { 'up':0, 'down':0, 'failed':0, 'fallbacks':0 }
+
+
+    def adaptLink(self, address, channel):
+        ''' Adapt the air data rate and TX power of the sends to this address and channel '''
+        self.links[(address, channel)] = [self.baseRate, self.basePower, 0, 0, False, None]
+
+
+    def sendFrame(self, to_address, to_channel, data, useChecksum=False, useCRC=False, retries=reliableE32.RETRIES):
+        ''' Send an encoded payload with the settings of the link, see reliableE32.sendFrame. The result of the send
+            steps the link up or down, a message which was not acknowledged is sent once more when the link was
+            stepped down. '''
+        destination = (to_address, to_channel)
+        link = self.links.get(destination)
+        if link is None:
+            # settings agreed with a transmitter stay in use
+            if self.linkPeer is None and self.setRadio(self.baseRate, self.basePower) != "OK":
+                return "NOK"
+            return super().sendFrame(to_address, to_channel, data, useChecksum, useCRC, retries)
+        for attempt in range(2):
+            if self.setRadio(link[0], link[1]) != "OK":
+                return "NOK"
+            before = self.delivery['retries']
+            result = super().sendFrame(to_address, to_channel, data, useChecksum, useCRC, retries)
+            if self.adapt(destination, result, self.delivery['retries'] - before, useChecksum, useCRC) != "OK":
+                break
+        return result
+
+
+    def adapt(self, destination, result, retries, useChecksum=False, useCRC=False):
+        ''' Step the link to the destination up after GOOD messages in a row without retransmission, down after BAD
+            retransmissions (the first after a step up) or a message which was not acknowledged. Back to the own
+            settings when the peer does not confirm the step down. Returns "OK" when the link was stepped down
+            after a message which was not acknowledged. '''
+        link = self.links[destination]
+        if result != "OK":
+            if link[5] is not None:
+                # the peer may have received the unconfirmed CHECK : agree the settings from there
+                current, link[0:2] = link[0:2], link[5]
+                if self.agreeLink(destination, current[0], current[1], useChecksum, useCRC) == "OK":
+                    return "OK"
+                link[0:2] = current
+            # the peer may still hear a step down
+            if self.stepLink(destination, False, useChecksum, useCRC) == "OK":
+                return "OK"
+            link[0:4] = [self.baseRate, self.basePower, 0, 0]
+            self.adaptation['fallbacks'] += 1
+            return "NOK"
+        if retries:
+            link[2] = min(link[2], 0)
+            link[3] += retries
+            if link[3] >= adaptiveE32.BAD:
+                self.stepLink(destination, False, useChecksum, useCRC)
+        else:
+            link[2] += 1
+            if link[2] >= adaptiveE32.GOOD:
+                self.stepLink(destination, True, useChecksum, useCRC)
+        return "NOK"
+
+
+    def stepLink(self, destination, up, useChecksum=False, useCRC=False):
+        ''' Agree the next higher (up) or lower settings of the link with the peer. Returns "NOK" if the link is at
+            its limit or the peer did not confirm. '''
+        link = self.links[destination]
+        link[2] = link[3] = 0
+        rate, power = link[0], link[1]
+        i = adaptiveE32.RATES.index(rate)
+        if up:
+            if not link[4] and i < adaptiveE32.RATES.index(adaptiveE32.MAXRATE):
+                rate = adaptiveE32.RATES[i + 1]
+            elif power < adaptiveE32.MINPOWER:
+                power += 1
+            else:
+                return "NOK"
+        else:
+            if power > self.basePower:
+                power -= 1
+            elif i > adaptiveE32.RATES.index(self.baseRate):
+                rate = adaptiveE32.RATES[i - 1]
+            else:
+                return "NOK"
+        if self.agreeLink(destination, rate, power, useChecksum, useCRC) != "OK":
+            return "NOK"
+        self.adaptation['up' if up else 'down'] += 1
+        if up:
+            # on probation : the first retransmission steps down again
+            link[3] = adaptiveE32.BAD - 1
+        else:
+            link[2] = -adaptiveE32.HOLDOFF * adaptiveE32.GOOD
+        return "OK"
+
+
+    def agreeLink(self, destination, rate, power, useChecksum=False, useCRC=False):
+        ''' Switch the link to the settings : a REQ with the current settings of the link, a CHECK with the settings
+            the peer confirmed. Without CONFIRM of the CHECK the link keeps the current settings, the settings of the
+            CHECK are kept as unconfirmed. '''
+        link = self.links[destination]
+        if self.setRadio(link[0], link[1]) != "OK":
+            return "NOK"
+        if self.sendLink(destination, adaptiveE32.REQ, rate, power, useChecksum, useCRC) != "OK":
+            self.adaptation['failed'] += 1
+            return "NOK"
+        if self.linkReply[0] != rate:
+            # the peer keeps its air data rate
+            link[4] = True
+            if self.linkReply[0] == link[0] and power == link[1]:
+                return "NOK"
+        current = link[0], link[1]
+        link[0], link[1], link[5] = self.linkReply[0], power, None
+        switched = utime.ticks_ms()
+        if self.setRadio(link[0], link[1]) == "OK":
+            self.sleepMs(adaptiveE32.GUARD)
+            if self.sendLink(destination, adaptiveE32.CHECK, link[0], link[1], useChecksum, useCRC) == "OK":
+                return "OK"
+        # the peer returns to the current settings CHECKWAIT ms after the switch, unless it received the CHECK
+        self.sleepMs(max(adaptiveE32.CHECKWAIT - utime.ticks_diff(utime.ticks_ms(), switched), 0) + adaptiveE32.GUARD)
+        link[5] = (link[0], link[1])
+        link[0], link[1] = current
+        self.adaptation['failed'] += 1
+        return "NOK"
+
+
+    def sendLink(self, destination, op, rate, power, useChecksum=False, useCRC=False, retries=reliableE32.RETRIES):
+        ''' Send a link control frame to the peer and wait for its CONFIRM, retransmitted at most retries times.
+            The confirmed settings are in linkReply. '''
+        frame = self.buildLink(op, rate, power)
+        rto = self.getRTO(destination, useChecksum, useCRC)
+        try:
+            for attempt in range(retries + 1):
+                if attempt:
+                    rto = min(2 * rto, reliableE32.MAXRTO)
+                # no sequence number : an ACK does not match, messages received meanwhile are kept
+                self.waiting = (destination, -1)
+                self.acked = False
+                self.linkReply = None
+                # as a plain frame, not in a DATA frame
+                if ebyteE32.sendFrame(self, destination[0], destination[1], frame, useChecksum, useCRC) != "OK":
+                    continue
+                if self.waitForAck(utime.ticks_ms(), rto, useChecksum, useCRC):
+                    return "OK"
+            return "NOK"
+
+        finally:
+            self.waiting = None
+
+
+    def buildLink(self, op, rate, power):
+        ''' Build the link control frame with the operation and settings '''
+        frame = self.link
+        frame[0] = adaptiveE32.LINK
+        frame[1] = 6
+        frame[2] = self.config['address'] >> 8
+        frame[3] = self.config['address'] & 0xFF
+        frame[4] = self.config['channel']
+        frame[5] = op
+        frame[6] = ebyteE32.DATARATE[rate]
+        frame[7] = power
+        return frame
+
+
+    def nextMessage(self, useChecksum=False, useCRC=False):
+        ''' Return to the previous settings when the CHECK of the transmitter does not arrive within CHECKWAIT ms, to
+            the own settings when the transmitter is not heard for fallback ms, see reliableE32.nextMessage '''
+        if self.linkPeer is not None:
+            elapsed = utime.ticks_diff(utime.ticks_ms(), self.linkHeard)
+            if self.linkPrevious is not None and elapsed > adaptiveE32.CHECKWAIT:
+                self.setRadio(*self.linkPrevious)
+                self.setOperationMode('normal')
+                self.linkPrevious = None
+                self.adaptation['failed'] += 1
+            elif elapsed > self.fallback:
+                self.setRadio(self.baseRate, self.basePower)
+                self.setOperationMode('normal')
+                self.linkPeer = None
+                self.adaptation['fallbacks'] += 1
+        return super().nextMessage(useChecksum, useCRC)
+
+
+    def decodeFrame(self, frame, useChecksum=False, useCRC=False):
+        ''' Decode a validated frame : a link control frame is answered or registered. Returns None for a link control
+            frame, see reliableE32.decodeFrame '''
+        header = frame[0]
+        if header not in (adaptiveE32.LINK, reliableE32.DATA) or len(frame) < 6:
+            return super().decodeFrame(frame, useChecksum, useCRC)
+        source = ((frame[2] << 8 | frame[3]), frame[4])
+        if source == self.linkPeer:
+            self.linkHeard = utime.ticks_ms()
+        if header == reliableE32.DATA:
+            return super().decodeFrame(frame, useChecksum, useCRC)
+        if len(frame) != 8:
+            return None
+        op, rate, power = frame[5], ebyteE32.DATARINV.get(frame[6]), frame[7]
+        if op == adaptiveE32.CONFIRM:
+            # a monitor (address 0xFFFF) confirms for any address on its channel
+            if self.waiting is not None and rate is not None:
+                (to_address, to_channel), seq = self.waiting
+                if seq == -1 and frame[4] == to_channel and source[0] in (to_address, 0xFFFF):
+                    self.linkReply = (rate, power)
+                    self.acked = True
+            return None
+        if rate is None or power > adaptiveE32.MINPOWER:
+            return None
+        if op == adaptiveE32.REQ:
+            if not self.acceptRate:
+                # keep the air data rate and TX power, the transmitter can still lower its TX power
+                rate, power = self.config['datarate'], self.config['txpower']
+            self.buildLink(adaptiveE32.CONFIRM, rate, power)
+            if ebyteE32.sendFrame(self, source[0], source[1], self.link, useChecksum, useCRC) != "OK":
+                return None
+            if self.acceptRate:
+                self.linkPeer = source
+                self.linkHeard = utime.ticks_ms()
+                self.linkPrevious = (self.config['datarate'], self.config['txpower'])
+                self.setRadio(rate, power)
+                self.setOperationMode('normal')
+        elif op == adaptiveE32.CHECK:
+            if source == self.linkPeer:
+                self.linkPrevious = None
+            self.buildLink(adaptiveE32.CONFIRM, self.config['datarate'], self.config['txpower'])
+            ebyteE32.sendFrame(self, source[0], source[1], self.link, useChecksum, useCRC)
+        return None
+
+
+    def getLinkStats(self):
+        ''' Link adaptation statistics : steps up and down, steps the peer did not confirm, returns to the own settings
+            and the air data rate and TX power per adapted destination '''
+        stats = dict(self.adaptation)
+        stats['links'] = { '%04X:%02X'%(d[0], d[1]):(l[0], l[1]) for d, l in self.links.items() }
+        return stats
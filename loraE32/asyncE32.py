@@ -0,0 +1,253 @@
+#######################################################################
+# MicroPython uasyncio API for EBYTE E32 Series LoRa modules.
+# The methods of ebyteE32 block until the module is idle. The async
+# counterparts of this class await the AUX pin and the UART instead, so
+# one event loop can receive radio traffic, push data to a database and
+# drive a display at the same time :
+#
+#   e32 = asyncE32(M0pin, M1pin, AUXpin, Address=0xFFFF, Channel=0x04)
+#   e32.start()
+#
+#   async def receiver():
+#       async for message in e32.messages(0x0001, 0x02, useChecksum=True):
+#           print(message)
+#
+#   async def sender():
+#       await e32.send(0x0003, 0x04, { 'node':'01', 'temp':'21' })
+#
+# The AUX interrupt handler sets a ThreadSafeFlag, the UART is read with
+# a uasyncio StreamReader. Mode and config changes and the reads of a
+# messages loop hold a lock, so a config response is not taken by the
+# messages loop. The loop reads in slices of RECVWAIT ms, a send waits
+# at most that long while a messages loop is waiting for data.
+#######################################################################
+
+from loraE32 import ebyteE32
+from framesE32 import framesE32
+import uasyncio as asyncio
+import utime
+
+
+class asyncE32(ebyteE32):
+    ''' class to interface the EBYTE E32 Series LoRa modules with uasyncio '''
+
+    # maximum time a messages loop holds the UART (ms)
+    RECVWAIT = 100
+
+    def __init__(self, PinM0, PinM1, PinAUX, **kwargs):
+        ''' constructor for ebyte E32 LoRa module with uasyncio API, see ebyteE32 for the arguments '''
+        super().__init__(PinM0, PinM1, PinAUX, **kwargs)
+        self.auxflag = asyncio.ThreadSafeFlag()    # flag set by the AUX interrupt handler
+        self.lock = asyncio.Lock()                 # lock for mode and config changes and UART reads
+        self.reader = None                         # StreamReader on the UART
+
+
+    def start(self):
+        ''' Start the ebyte E32 LoRa module '''
+        result = super().start()
+        if result == "OK":
+            self.reader = asyncio.StreamReader(self.serdev)
+        return result
+
+
+    def auxHandler(self, pin):
+        ''' Interrupt handler for the rising edge of the AUX pin (module becomes idle) '''
+        self.auxrise = True
+        self.auxflag.set()
+
+
+    async def waitIdle(self, edge=False, timeout=None):
+        ''' Await the E32 LoRa module to become idle (AUX pin high). With edge=True await the rising edge of the
+            AUX pin seen by the interrupt handler since auxrise was cleared. Returns "NOK" on timeout '''
+        if timeout is None:
+            timeout = self.timeout
+        start = utime.ticks_ms()
+        result = "OK"
+        while not (self.auxrise if edge else self.AUX.value()):
+            remaining = timeout - utime.ticks_diff(utime.ticks_ms(), start)
+            if remaining <= 0:
+                if self.debug:
+                    print('Timeout waiting for AUX after %d ms'%(timeout))
+                self.counters['aux_timeouts'] += 1
+                result = "NOK"
+                break
+            try:
+                await asyncio.wait_for_ms(self.auxflag.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        self.countAuxWait(utime.ticks_diff(utime.ticks_ms(), start))
+        return result
+
+
+    async def setMode(self, mode):
+        ''' Set operation mode of the E32 LoRa module and await the mode switch '''
+        if mode == self.mode:
+            return "OK"
+        start = utime.ticks_ms()
+        bits = ebyteE32.OPERMODE.get(mode, '00')
+        self.M0.value(int(bits[0]))
+        self.M1.value(int(bits[1]))
+        # the mode switch is done when AUX is high again
+        await asyncio.sleep_ms(2)
+        result = await self.waitIdle()
+        self.mode = mode if result == "OK" else None
+        self.counters['modes'] += 1
+        self.counters['mode_ms'] += utime.ticks_diff(utime.ticks_ms(), start)
+        return result
+
+
+    async def setTransmission(self, transmode):
+        ''' Set the transmission mode of the E32 LoRa module with a temporary config (C2), see setTransmissionMode '''
+        if transmode == self.config['transmode'] and self.shadow is not None:
+            return "OK"
+        previous = self.config['transmode']
+        self.config['transmode'] = transmode
+        if self.profile is not None:
+            # precompiled frame of the profile in use
+            result = await self.writeConfig(*self.profiles[self.profile][1][transmode])
+        else:
+            result = await self.writeConfig()
+        if result != "OK":
+            # config of the module unknown : keep the previous transmission mode, the next call writes it again
+            self.config['transmode'] = previous
+        return result
+
+
+    async def setWakeup(self, wutime):
+        ''' Set the wakeup time of the E32 LoRa module with a temporary config (C2), see setWakeupTime '''
+        if wutime == self.config['wutime'] and self.shadow is not None:
+            return "OK"
+        if wutime != self.config['wutime']:
+            self.profile = None
+        previous = self.config['wutime']
+        self.config['wutime'] = wutime
+        result = await self.writeConfig()
+        if result != "OK":
+            # config of the module unknown : keep the previous wakeup time, the next call writes it again
+            self.config['wutime'] = previous
+        return result
+
+
+    async def writeConfig(self, frame=None, config=None):
+        ''' Write a C2 frame with the config bytes config (default the frame of the config dictionary) to the E32 LoRa
+            module and await the response, see writeProfile '''
+        if frame is None:
+            config = bytes(self.encodeConfig()[1:])
+            frame = bytes([ebyteE32.CMDS['setConfigPwrDwnNoSave']]) + config
+        if config == self.shadow:
+            self.avoided['module'] += 1
+            return "OK"
+        start = utime.ticks_ms()
+        result = None
+        if await self.setMode('sleep') == "OK":
+            # received bytes still on the UART go to the frame receiver, not into the response
+            self.receiver.feed(self.serdev)
+            self.auxrise = False
+            self.serdev.write(frame)
+            if await self.waitIdle(edge=True) == "OK":
+                result = self.serdev.read()
+        self.counters['config_ms'] += utime.ticks_diff(utime.ticks_ms(), start)
+        if result is None or len(result) != 6:
+            self.counters['config_errors'] += 1
+            self.shadow = None
+            return "NOK"
+        self.counters['config_writes'] += 1
+        self.shadow = config
+        return "OK"
+
+
+    async def send(self, to_address, to_channel, payload, useChecksum=False, useBinary=False, useCRC=False):
+        ''' Send the payload dictionary to ebyte E32 LoRa modules in transparent or fixed mode, see sendMessage '''
+        try:
+            if type(payload) != dict:
+                print('payload is not a dictionary')
+                return 'NOK'
+            return await self.sendData(to_address, to_channel, self.encodePayload(payload, useBinary), useChecksum, useCRC)
+
+        except Exception as E:
+            if self.debug:
+                print('Error on send: ',E)
+            return "NOK"
+
+
+    async def sendData(self, to_address, to_channel, data, useChecksum=False, useCRC=False):
+        ''' Send an encoded payload to ebyte E32 LoRa modules in transparent or fixed mode, see sendFrame '''
+        async with self.lock:
+            # type of transmission
+            if (to_address == self.config['address']) and (to_channel == self.config['channel']):
+                transmode = 0
+            else:
+                transmode = 1
+            if await self.setTransmission(transmode) != "OK":
+                return "NOK"
+            # preamble at least as long as the wake interval of a power save receiver
+            if await self.setWakeup(self.wakeupPeers.get((to_address, to_channel), self.wutime)) != "OK":
+                return "NOK"
+            # put into wakeup mode
+            if await self.setMode('wakeup') != "OK":
+                return "NOK"
+            length = self.buildFrame(to_address, to_channel, data, useChecksum, useCRC)
+            # check duty cycle budget of the sub-band
+            channel = self.config['channel'] if transmode == 0 else to_channel
+            airtime = self.calcAirtime(length)
+            wait = self.getDutyCycleWait(channel, airtime)
+            if wait < 0 or wait > self.dutyMaxWait:
+                self.deferred += 1
+                return "NOK"
+            if wait > 0:
+                await asyncio.sleep_ms(wait)
+            # wait for idle module and send the message
+            if await self.waitIdle() != "OK":
+                return "NOK"
+            self.auxrise = False
+            self.serdev.write(self.framemv[:length])
+            self.addAirtime(channel, airtime)
+            self.counters['frames_tx'] += 1
+            self.counters['bytes_tx'] += length
+            # wait until transmitted
+            return await self.waitIdle(edge=True, timeout=self.timeout + airtime)
+
+
+    def messages(self, from_address, from_channel, useChecksum=False, useCRC=False):
+        ''' Asynchronous iterator of the messages received from ebyte E32 LoRa modules, see recvMessage :
+            async for message in e32.messages(from_address, from_channel) '''
+        return messagesE32(self, from_address, from_channel, useChecksum, useCRC)
+
+
+class messagesE32:
+    ''' asynchronous iterator of the messages received by an asyncE32 instance '''
+
+
+    def __init__(self, e32, from_address, from_channel, useChecksum, useCRC):
+        self.e32 = e32
+        self.transmode = 0 if (from_address == e32.config['address']) and (from_channel == e32.config['channel']) else 1
+        self.useChecksum = useChecksum
+        self.useCRC = useCRC
+
+
+    def __aiter__(self):
+        return self
+
+
+    async def __anext__(self):
+        e32 = self.e32
+        while True:
+            # complete message in the frame receiver ?
+            try:
+                message = e32.nextMessage(self.useChecksum, self.useCRC)
+                if message is not None:
+                    return message
+            except Exception as E:
+                if e32.debug:
+                    print('Error on messages: ',E)
+                continue
+            # listen in normal mode (a send may have changed the mode) and await received bytes, the lock is
+            # released every RECVWAIT ms for a send
+            async with e32.lock:
+                if await e32.setTransmission(self.transmode) != "OK" or await e32.setMode('normal') != "OK":
+                    continue
+                try:
+                    data = await asyncio.wait_for_ms(e32.reader.read(framesE32.MAXFRAME), asyncE32.RECVWAIT)
+                except asyncio.TimeoutError:
+                    continue
+            e32.receiver.write(data)
@@ -0,0 +1,35 @@
+###########################################
+# benchmark payload codecs
+###########################################
+# compares size and encode/decode time of
+# the JSON and binary payloads for the
+# messages of the sensor nodes
+###########################################
+
+from codecE32 import codecE32
+import ujson
+import utime
+
+RUNS = 200
+
+messages = [ { 'node': '01', 'temp': '21', 'hum': '55' },        # SensorNodeE32_01
+             { 'node': '02', 'temp': '25', 'pres': '101860' } ]  # SensorNodeE32_02
+
+codec = codecE32()
+
+
+def timeit(func, arg):
+    start = utime.ticks_us()
+    for i in range(RUNS):
+        func(arg)
+    return utime.ticks_diff(utime.ticks_us(), start) / RUNS
+
+
+print('codec \tbytes\tencode us\tdecode us\tmessage')
+for message in messages:
+    js = ujson.dumps(message).encode()
+    bn = bytes(codec.encode(message))
+    # both must decode to the same dictionary
+    assert ujson.loads(js) == codec.decode(bn) == message
+    print('json  \t%5d\t%9.1f\t%9.1f\t%s'%(len(js), timeit(ujson.dumps, message), timeit(ujson.loads, js), message))
+    print('binary\t%5d\t%9.1f\t%9.1f\t%s'%(len(bn), timeit(codec.encode, message), timeit(codec.decode, bn), message))
@@ -0,0 +1,87 @@
+###########################################
+# benchmark of the config codec
+###########################################
+# compares the former string based
+# encodeConfig/decodeConfig with the
+# integer shift/mask implementation
+###########################################
+
+import configE32
+import utime
+
+RUNS = 500
+
+config = { 'address':0x0001, 'parity':'8N1', 'baudrate':9600, 'datarate':'2.4k', 'channel':0x02,
+           'transmode':1, 'iomode':1, 'wutime':0, 'fec':1, 'txpower':0 }
+
+# former tables with bit strings
+PARSTR = { '8N1':'00', '8O1':'01', '8E1':'10' }
+PARINV = { v:k for k, v in PARSTR.items() }
+BAUDRATE = { 1200:'000', 2400:'001', 4800:'010', 9600:'011',
+             19200:'100', 38400:'101', 57600:'110', 115200:'111' }
+BAUDRINV = { v:k for k, v in BAUDRATE.items() }
+DATARATE = { '0.3k':'000', '1.2k':'001', '2.4k':'010',
+             '4.8k':'011', '9.6k':'100', '19.2k':'101' }
+DATARINV = { v:k for k, v in DATARATE.items() }
+
+
+def legacyEncode(config):
+    ''' former string based encodeConfig '''
+    message = []
+    message.append(0xC0)
+    message.append(config['address']//256)
+    message.append(config['address']%256)
+    bits = '0b'
+    bits += PARSTR.get(config['parity'])
+    bits += BAUDRATE.get(config['baudrate'])
+    bits += DATARATE.get(config['datarate'])
+    message.append(int(bits, 2))
+    message.append(config['channel'])
+    bits = '0b'
+    bits += str(config['transmode'])
+    bits += str(config['iomode'])
+    bits += '{0:03b}'.format(config['wutime'])
+    bits += str(config['fec'])
+    bits += '{0:02b}'.format(config['txpower'])
+    message.append(int(bits, 2))
+    return message
+
+
+def legacyDecode(message, config):
+    ''' former string based decodeConfig '''
+    config['address'] = int(message[1])*256 + int(message[2])
+    bits = '{0:08b}'.format(message[3])
+    config['parity'] = PARINV.get(bits[0:2])
+    config['baudrate'] = BAUDRINV.get(bits[2:5])
+    config['datarate'] = DATARINV.get(bits[5:])
+    config['channel'] = int(message[4])
+    bits = '{0:08b}'.format(message[5])
+    config['transmode'] = int(bits[0:1])
+    config['iomode'] = int(bits[1:2])
+    config['wutime'] = int(bits[2:5])
+    config['fec'] = int(bits[5:6])
+    config['txpower'] = int(bits[6:])
+    return config
+
+
+def bench(name, encode, decode):
+    message = encode(config)
+    start = utime.ticks_us()
+    for i in range(RUNS):
+        encode(config)
+    encoding = utime.ticks_diff(utime.ticks_us(), start) / RUNS
+    result = {}
+    start = utime.ticks_us()
+    for i in range(RUNS):
+        decode(message, result)
+    decoding = utime.ticks_diff(utime.ticks_us(), start) / RUNS
+    print('%-8s\t%8.1f us encode\t%8.1f us decode'%(name, encoding, decoding))
+
+
+# both must give the same config bytes and config
+message = configE32.encodeConfig(config)
+assert bytes(legacyEncode(config)) == message
+assert legacyDecode(message, {}) == configE32.decodeConfig(message, {}) == config
+
+bench('string', legacyEncode, legacyDecode)
+bench('integer', configE32.encodeConfig, configE32.decodeConfig)
@@ -0,0 +1,71 @@
+###########################################
+# benchmark building send frames
+###########################################
+# compares the former list based frame
+# building of sendMessage with the frame
+# built in place in the preallocated
+# frame buffer (allocations and time)
+###########################################
+
+from loraE32 import ebyteE32
+import ujson
+import utime
+import gc
+
+M0pin = 25
+M1pin = 26
+AUXpin = 27
+
+RUNS = 200
+
+e32 = ebyteE32(M0pin, M1pin, AUXpin, Address=0x0001, Channel=0x02, debug=False)
+e32.config['transmode'] = 1
+
+to_address = 0x0003
+to_channel = 0x04
+message = { 'node': '01', 'temp': '21', 'hum': '55' }
+
+
+def legacyFrame(to_address, to_channel, payload, useChecksum):
+    ''' frame building of sendMessage before the preallocated frame buffer '''
+    msg = []
+    msg.append(to_address//256)
+    msg.append(to_address%256)
+    msg.append(to_channel)
+    js_payload = ujson.dumps(payload)
+    for i in range(len(js_payload)):
+        msg.append(ord(js_payload[i]))
+    if useChecksum:
+        msg.append(int(e32.calcChecksum(js_payload), 16))
+    return bytes(msg)
+
+
+def inplaceFrame(to_address, to_channel, payload, useChecksum):
+    ''' frame building of sendMessage with the preallocated frame buffer '''
+    length = e32.buildFrame(to_address, to_channel, ujson.dumps(payload).encode(), useChecksum)
+    return e32.framemv[:length]
+
+
+def allocated():
+    ''' bytes allocated on the heap so far (MicroPython only) '''
+    return gc.mem_alloc() if hasattr(gc, 'mem_alloc') else 0
+
+
+def bench(name, build):
+    gc.collect()
+    gc.disable()
+    mem = allocated()
+    start = utime.ticks_us()
+    for i in range(RUNS):
+        build(to_address, to_channel, message, True)
+    duration = utime.ticks_diff(utime.ticks_us(), start)
+    mem = allocated() - mem
+    gc.enable()
+    print('%-8s\t%6d us/send\t%6d bytes allocated/send'%(name, duration//RUNS, mem//RUNS))
+
+
+# both must build the same frame
+assert legacyFrame(to_address, to_channel, message, True) == bytes(inplaceFrame(to_address, to_channel, message, True))
+
+bench('legacy', legacyFrame)
+bench('inplace', inplaceFrame)
@@ -0,0 +1,42 @@
+###########################################
+# throughput and latency benchmark suite
+###########################################
+# two E32 modules on UART1 and UART2 of one
+# ESP32, a few meters apart : messages/s,
+# bytes/s, latency percentiles and loss per
+# air data rate, FEC, payload size,
+# transmission mode and checksum. The
+# results are saved in benchE32.json, copy
+# it to compare driver versions with
+# host/benchSuiteE32.py. The sender keeps
+# the duty cycle budget of channel 4 (1%) :
+# the matrix below has 46 s of airtime and
+# takes a bit over an hour, the full matrix
+# of benchmarkE32 about 2 days.
+###########################################
+
+from loraE32 import ebyteE32
+from benchmarkE32 import benchmarkE32
+
+# pins E32 on UART1 (sender)
+M0pin1 = 25
+M1pin1 = 26
+AUXpin1 = 27
+# pins E32 on UART2 (receiver)
+M0pin2 = 32
+M1pin2 = 33
+AUXpin2 = 35
+
+LABEL = 'loraE32'
+RESULTS = 'benchE32.json'
+
+# instances
+sender = ebyteE32(M0pin1, M1pin1, AUXpin1, Port='U1', Address=0x0001, Channel=0x04, debug=False)
+receiver = ebyteE32(M0pin2, M1pin2, AUXpin2, Port='U2', Address=0x0002, Channel=0x04, debug=False)
+sender.start()
+receiver.start()
+
+bench = benchmarkE32(sender, receiver, channel=0x04, messages=5)
+bench.runSuite(bench.cases(rates=('2.4k', '19.2k'), sizes=(24, 200), checksums=(True,)))
+bench.saveResults(RESULTS, label=LABEL)
+print('results saved in %s'%(RESULTS))
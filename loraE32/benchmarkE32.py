@@ -0,0 +1,225 @@
+#######################################################################
+# MicroPython throughput and latency benchmark for EBYTE E32 Series LoRa
+# modules. A sender and a receiver module, e.g. on UART1 and UART2 of
+# one ESP32 or on the host simulator, run a matrix of cases :
+#
+#   bench = benchmarkE32(sender, receiver)
+#   for case in bench.cases(rates=('2.4k', '19.2k'), sizes=(24, 200)):
+#       print(bench.runCase(case))
+#   bench.saveResults('benchE32.json', label='v1.2')
+#
+# A case is an air data rate, FEC on/off, a JSON payload size, the
+# transparent or fixed transmission mode and the checksum on/off. The
+# sender sends the messages back to back with sendMessage, the receiver
+# is read while the sender waits for its AUX pin (busyHook), so the
+# receive time of a message is known to the ms. Per case : messages/s,
+# payload bytes/s, loss and latency percentiles from the start of a send
+# to the decoded message. The time waiting for duty cycle budget is not
+# counted. compareResults lists the cases of two result files which got
+# slower or lost more messages, e.g. between two driver versions.
+#######################################################################
+
+import ujson
+import utime
+
+
+class benchmarkE32:
+    ''' class to measure the throughput, latency and loss of a pair of ebyte E32 LoRa modules '''
+
+    # air data rates, FEC, payload sizes (bytes), transmission modes and checksum of the default matrix
+    RATES = ('0.3k', '1.2k', '2.4k', '4.8k', '9.6k', '19.2k')
+    FECS = (1, 0)
+    SIZES = (24, 50, 200)
+    MODES = ('fixed', 'transparent')
+    CHECKSUMS = (True, False)
+    # messages per case
+    MESSAGES = 10
+    # addresses of the sender and the receiver in fixed mode
+    SENDER = 0x0001
+    RECEIVER = 0x0002
+    # latency percentiles
+    PERCENTILES = (50, 90, 99)
+    # tolerance of compareResults (fraction)
+    TOLERANCE = 0.1
+
+
+    def __init__(self, sender, receiver, channel=0x04, messages=MESSAGES):
+        ''' constructor for the benchmark of two started ebyteE32 instances on the same channel '''
+        self.sender = sender
+        self.receiver = receiver
+        self.channel = channel
+        self.messages = messages
+        self.results = []                          # results of the cases run
+        self.received = []                         # receive time (ms) per message of the running case
+        self.start = 0                             # start of the running case (ms)
+
+
+    def cases(self, rates=RATES, fecs=FECS, sizes=SIZES, modes=MODES, checksums=CHECKSUMS):
+        ''' Generator of the cases of a matrix '''
+        for rate in rates:
+            for fec in fecs:
+                for size in sizes:
+                    for mode in modes:
+                        for checksum in checksums:
+                            yield { 'rate':rate, 'fec':fec, 'size':size, 'mode':mode, 'checksum':checksum }
+
+
+    def configure(self, e32, address, rate, fec):
+        ''' Set the address, air data rate and FEC of a module with a temporary config (C2) '''
+        e32.config['address'] = address
+        e32.config['channel'] = self.channel
+        e32.config['datarate'] = rate
+        e32.config['fec'] = fec
+        e32.profile = None
+        return e32.setConfig('setConfigPwrDwnNoSave')
+
+
+    def payload(self, n, size):
+        ''' Message n as a JSON payload of size bytes '''
+        payload = { 'n':n, 'd':'' }
+        payload['d'] = 'x' * max(size - len(ujson.dumps(payload)), 0)
+        return payload
+
+
+    def poll(self):
+        ''' Read the receiver and note the receive time of the messages (busyHook of the sender) '''
+        now = utime.ticks_diff(utime.ticks_ms(), self.start)
+        for message in self.receiver.pollMessages():
+            n = message.get('n') if type(message) == dict else None
+            if type(n) == int and 0 <= n < len(self.received) and self.received[n] is None:
+                self.received[n] = now
+
+
+    def drain(self, sent):
+        ''' Read the receiver until the messages sent so far are received or for the receiver timeout '''
+        timeout = utime.ticks_add(utime.ticks_ms(), self.receiver.timeout)
+        while utime.ticks_diff(timeout, utime.ticks_ms()) > 0:
+            self.poll()
+            if all(self.received[n] is not None for n in range(len(sent)) if sent[n] is not None):
+                break
+            utime.sleep_ms(1)
+
+
+    def runCase(self, case):
+        ''' Run a case and return its result : the case with messages sent and received, loss, messages/s, payload
+            bytes/s, latency percentiles (ms), airtime per message (ms) and the time waited for duty cycle (ms) '''
+        sender, receiver = self.sender, self.receiver
+        checksum = case['checksum']
+        # transparent : the receiver has the address and channel of the sender
+        if case['mode'] == 'transparent':
+            to_address = benchmarkE32.SENDER
+        else:
+            to_address = benchmarkE32.RECEIVER
+        if (self.configure(sender, benchmarkE32.SENDER, case['rate'], case['fec']) != "OK" or
+                self.configure(receiver, to_address, case['rate'], case['fec']) != "OK"):
+            raise RuntimeError('config of case %s failed'%(case))
+        receiver.listen(benchmarkE32.SENDER, self.channel, useChecksum=checksum)
+        for message in receiver.pollMessages():
+            pass
+        # send the messages back to back
+        self.received = [None] * self.messages
+        sent = [None] * self.messages
+        waited = 0
+        airtime = 0
+        self.start = utime.ticks_ms()
+        sender.busyHook = self.poll
+        try:
+            for n in range(self.messages):
+                payload = self.payload(n, case['size'])
+                length = len(ujson.dumps(payload)) + (3 if case['mode'] == 'fixed' else 0) + (1 if checksum else 0)
+                # wait for duty cycle budget outside the measurement
+                wait = sender.getDutyCycleWait(self.channel, sender.calcAirtime(length))
+                if wait < 0:
+                    break
+                if wait > 0:
+                    self.drain(sent)
+                    utime.sleep_ms(wait)
+                    waited += wait
+                sent[n] = utime.ticks_diff(utime.ticks_ms(), self.start)
+                if sender.sendMessage(to_address, self.channel, payload, useChecksum=checksum) == "OK":
+                    airtime += sender.lastAirtime
+                else:
+                    sent[n] = None
+            # wait for the last message
+            self.drain(sent)
+        finally:
+            sender.busyHook = None
+            receiver.endListen()
+        # results
+        elapsed = max(max([t for t in self.received if t is not None] or [0]) - waited, 1)
+        latency = sorted(self.received[n] - sent[n] for n in range(self.messages)
+                         if sent[n] is not None and self.received[n] is not None)
+        count = len([t for t in sent if t is not None])
+        result = dict(case)
+        result['sent'] = count
+        result['received'] = len(latency)
+        result['loss'] = round(1 - len(latency) / count, 3) if count else None
+        result['msg_s'] = round(len(latency) * 1000 / elapsed, 3)
+        result['bytes_s'] = round(len(latency) * case['size'] * 1000 / elapsed, 1)
+        result['latency_ms'] = self.percentiles(latency)
+        result['airtime_ms'] = airtime // count if count else None
+        result['duty_wait_ms'] = waited
+        self.results.append(result)
+        return result
+
+
+    def caseKey(self, result):
+        ''' Key of the case of a result '''
+        return (result['rate'], result['fec'], result['size'], result['mode'], result['checksum'])
+
+
+    def percentiles(self, values):
+        ''' Nearest rank percentiles and maximum of sorted values '''
+        result = {}
+        for p in benchmarkE32.PERCENTILES:
+            result['p%d'%(p)] = values[max(-(-len(values) * p // 100) - 1, 0)] if values else None
+        result['max'] = values[-1] if values else None
+        return result
+
+
+    def runSuite(self, cases=None, show=True):
+        ''' Run the cases (default the full matrix) and return the results '''
+        for case in (self.cases() if cases is None else cases):
+            result = self.runCase(case)
+            if show:
+                self.showResult(result)
+        return self.results
+
+
+    def showResult(self, result):
+        ''' Print a result on one line '''
+        latency = result['latency_ms']
+        print('%-5s fec %d %3d bytes %-11s %-5s | %d/%d | %7.3f msg/s %8.1f B/s | p50 %s p90 %s p99 %s ms'%(
+              result['rate'], result['fec'], result['size'], result['mode'], 'chk' if result['checksum'] else '-',
+              result['received'], result['sent'], result['msg_s'], result['bytes_s'],
+              latency['p50'], latency['p90'], latency['p99']))
+
+
+    def saveResults(self, filename, label=''):
+        ''' Save the results with a label (e.g. the driver version) to a JSON file '''
+        with open(filename, 'w') as f:
+            ujson.dump({ 'label':label, 'messages':self.messages, 'results':self.results }, f)
+
+
+    def compareResults(self, old, new, tolerance=TOLERANCE):
+        ''' Compare two result files : returns the cases of new whose messages/s dropped, p90 latency rose by more
+            than tolerance, or whose loss rose, with the old and new value '''
+        results = []
+        for filename in (old, new):
+            with open(filename) as f:
+                results.append(ujson.load(f)['results'])
+        before = dict((self.caseKey(r), r) for r in results[0])
+        regressions = []
+        for r in results[1]:
+            key = self.caseKey(r)
+            b = before.get(key)
+            if b is None:
+                continue
+            if r['msg_s'] < b['msg_s'] * (1 - tolerance):
+                regressions.append((key, 'msg_s', b['msg_s'], r['msg_s']))
+            p90, q90 = b['latency_ms']['p90'], r['latency_ms']['p90']
+            if p90 is not None and q90 is not None and q90 > p90 * (1 + tolerance):
+                regressions.append((key, 'p90', p90, q90))
+            if b['loss'] is not None and r['loss'] is not None and r['loss'] > b['loss']:
+                regressions.append((key, 'loss', b['loss'], r['loss']))
+        return regressions
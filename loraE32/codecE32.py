@@ -0,0 +1,155 @@
+#######################################################################
+# MicroPython schema based binary codec for sensor payloads sent with
+# EBYTE E32 Series LoRa modules. It is a compact alternative to JSON:
+# every field is packed as a 1 byte field id followed by its value in a
+# fixed size format, numbers are stored as fixed point integers.
+#
+# Frame layout
+# ============
+#   +-------+-----+----------+-------+----------+-------+-----
+#   | MAGIC | LEN | field id | value | field id | value | ...
+#   +-------+-----+----------+-------+----------+-------+-----
+#     MAGIC : 0xB1 (a JSON payload always starts with '{' = 0x7B)
+#     LEN   : number of bytes following the LEN byte
+#
+# Batch layout (samples of several deep sleep cycles, see packerE32)
+# ============
+#   +-------+-----+------+----+---+-----------+----+--------+----+--------+---
+#   | BATCH | LEN | node | t0 | n | field ids | dt | values | dt | values | ...
+#   +-------+-----+------+----+---+-----------+----+--------+----+--------+---
+#     BATCH : 0xB2
+#     node  : 2 characters
+#     t0    : time of the first sample (uint32, seconds)
+#     n     : number of field ids, followed by the field ids
+#     dt    : time of the sample after t0 (uint16, seconds), followed by
+#             the values of the fields in the order of the field ids
+#
+# Both sides must use the same schema. Decoding returns the values as
+# strings, which is the same dictionary the sensor nodes send as JSON :
+#   { 'node':'01', 'temp':'21', 'hum':'55' }  ->  41 bytes as JSON
+#                                             ->  10 bytes as binary
+#######################################################################
+
+import ustruct
+
+
+class codecE32:
+    ''' class to encode/decode sensor payload dictionaries to/from a compact binary frame '''
+
+    # header byte of a binary payload
+    MAGIC = 0xB1
+    # header byte of a batch of samples
+    BATCH = 0xB2
+    # default schema : key -> (field id, ustruct format, number of decimals)
+    SCHEMA = { 'node':(0x01, '2s', 0),       # node id ('01')
+               'temp':(0x02, '>h', 0),       # temperature (degrees Celsius)
+               'hum':(0x03, 'B', 0),         # relative humidity (%)
+               'pres':(0x04, '>I', 0),       # pressure (Pa)
+               'bat':(0x05, '>H', 2) }       # battery voltage (V)
+
+
+    def __init__(self, schema=None):
+        ''' constructor for the binary codec '''
+        if schema is None:
+            schema = codecE32.SCHEMA
+        # lookup tables for encoding (by key) and decoding (by field id)
+        self.keys = {}
+        self.ids = {}
+        for key, (fid, fmt, decimals) in schema.items():
+            field = (key, fid, fmt, 10**decimals, ustruct.calcsize(fmt), 's' in fmt, '%%.%df'%(decimals))
+            self.keys[key] = field
+            self.ids[fid] = field
+        # preallocated buffer for encoding (maximum LEN is 255)
+        self.buf = bytearray(2 + 255)
+        self.mv = memoryview(self.buf)
+
+
+    def encode(self, payload):
+        ''' Encode a payload dictionary into the preallocated buffer. Returns a memoryview on the buffer which is
+            only valid until the next encode. Raises ValueError for keys not in the schema. '''
+        buf = self.buf
+        pos = 2
+        for key, value in payload.items():
+            field = self.keys.get(key)
+            if field is None:
+                raise ValueError('key %s not in schema'%(key))
+            if pos + 1 + field[4] > len(buf):
+                raise ValueError('payload too long')
+            buf[pos] = field[1]
+            self.packValue(field, buf, pos + 1, value)
+            pos += 1 + field[4]
+        buf[0] = codecE32.MAGIC
+        buf[1] = pos - 2
+        return self.mv[:pos]
+
+
+    def decode(self, data):
+        ''' Decode a binary frame (bytes, bytearray or memoryview) into a payload dictionary with string values.
+            Raises ValueError for a corrupt frame or unknown field ids. '''
+        if len(data) < 2 or data[1] != len(data) - 2:
+            raise ValueError('no binary payload')
+        if data[0] == codecE32.BATCH:
+            return self.decodeBatch(data)
+        if data[0] != codecE32.MAGIC:
+            raise ValueError('no binary payload')
+        payload = {}
+        pos = 2
+        while pos < len(data):
+            field = self.getField(data[pos])
+            payload[field[0]] = self.unpackValue(field, data, pos + 1)
+            pos += 1 + field[4]
+        return payload
+
+
+    def decodeBatch(self, data):
+        ''' Decode a batch of samples into a dictionary with the node and a list of samples. Each sample is a
+            dictionary with the time of the sample, its age in seconds relative to the last sample and the
+            values of the fields as strings. '''
+        node = bytes(data[2:4]).decode()
+        t0 = ustruct.unpack_from('>I', data, 4)[0]
+        fields = [self.getField(fid) for fid in data[9:9 + data[8]]]
+        pos = 9 + data[8]
+        batch = []
+        while pos < len(data):
+            sample = { 'time':t0 + ustruct.unpack_from('>H', data, pos)[0] }
+            pos += 2
+            for field in fields:
+                sample[field[0]] = self.unpackValue(field, data, pos)
+                pos += field[4]
+            batch.append(sample)
+        for sample in batch:
+            sample['age'] = batch[-1]['time'] - sample['time']
+        return { 'node':node, 'batch':batch }
+
+
+    def getField(self, fid):
+        ''' Get the schema field of a field id. Raises ValueError for unknown field ids. '''
+        field = self.ids.get(fid)
+        if field is None:
+            raise ValueError('field id %d not in schema'%(fid))
+        return field
+
+
+    def packValue(self, field, buf, pos, value):
+        ''' Pack the value of a schema field into buf at position pos '''
+        if field[5]:
+            # fixed length string
+            ustruct.pack_into(field[2], buf, pos, str(value).encode())
+        else:
+            # fixed point number
+            ustruct.pack_into(field[2], buf, pos, int(round(float(value) * field[3])))
+
+
+    def unpackValue(self, field, data, pos):
+        ''' Unpack the value of a schema field from data at position pos as a string '''
+        value = ustruct.unpack_from(field[2], data, pos)[0]
+        if field[5]:
+            return bytes(value).rstrip(b'\x00').decode()
+        if field[3] == 1:
+            return str(value)
+        return field[6]%(value / field[3])
+
+
+    def isBinary(self, data):
+        ''' Check if the data (bytes, bytearray or memoryview) starts with the header of a binary payload or batch '''
+        return len(data) > 0 and (data[0] == codecE32.MAGIC or data[0] == codecE32.BATCH)
@@ -0,0 +1,65 @@
+#######################################################################
+# MicroPython config codec for EBYTE E32 Series LoRa modules.
+# Encodes the config dictionary of ebyteE32 into the 6 config bytes of
+# the module and decodes them back, with integer shift and mask
+# operations on small int valued tables.
+#
+# Config bytes
+# ============
+#   0 HEAD  : 0xC0 (save) or 0xC2 (no save)
+#   1 ADDH  : high address byte
+#   2 ADDL  : low address byte
+#   3 SPED  : parity (bit 7-6), baudrate (bit 5-3), air data rate (bit 2-0)
+#   4 CHAN  : channel
+#   5 OPTION: transmode (bit 7), iomode (bit 6), wutime (bit 5-3),
+#             fec (bit 2), txpower (bit 1-0)
+#
+# The codec does not need the machine module, so it can be tested on a
+# host with testConfigE32.py.
+#######################################################################
+
+# UART parity bits
+PARSTR = { '8N1':0b00, '8O1':0b01, '8E1':0b10 }
+PARINV = { v:k for k, v in PARSTR.items() }
+# UART baudrate bits
+BAUDRATE = { 1200:0b000, 2400:0b001, 4800:0b010, 9600:0b011,
+             19200:0b100, 38400:0b101, 57600:0b110, 115200:0b111 }
+BAUDRINV = { v:k for k, v in BAUDRATE.items() }
+# LoRa datarate bits
+DATARATE = { '0.3k':0b000, '1.2k':0b001, '2.4k':0b010,
+             '4.8k':0b011, '9.6k':0b100, '19.2k':0b101 }
+DATARINV = { v:k for k, v in DATARATE.items() }
+
+
+def encodeConfig(config, header=0xC0):
+    ''' encode the config dictionary to create the config message (bytearray of 6 bytes) of the ebyte E32 LoRa module '''
+    message = bytearray(6)
+    message[0] = header
+    message[1] = config['address'] >> 8
+    message[2] = config['address'] & 0xFF
+    message[3] = PARSTR[config['parity']] << 6 | BAUDRATE[config['baudrate']] << 3 | DATARATE[config['datarate']]
+    message[4] = config['channel']
+    message[5] = (config['transmode'] << 7 | config['iomode'] << 6 | config['wutime'] << 3
+                  | config['fec'] << 2 | config['txpower'])
+    return message
+
+
+def decodeConfig(message, config):
+    ''' decode the config message from the ebyte E32 LoRa module to update the config dictionary '''
+    # message byte 1 & 2 = address
+    config['address'] = message[1] << 8 | message[2]
+    # message byte 3 = speed (parity, baudrate, datarate)
+    speed = message[3]
+    config['parity'] = PARINV.get(speed >> 6)
+    config['baudrate'] = BAUDRINV.get(speed >> 3 & 0b111)
+    config['datarate'] = DATARINV.get(speed & 0b111)
+    # message byte 4 = channel
+    config['channel'] = message[4]
+    # message byte 5 = option (transmode, iomode, wutime, fec, txpower)
+    option = message[5]
+    config['transmode'] = option >> 7
+    config['iomode'] = option >> 6 & 0b1
+    config['wutime'] = option >> 3 & 0b111
+    config['fec'] = option >> 2 & 0b1
+    config['txpower'] = option & 0b11
+    return config
@@ -0,0 +1,222 @@
+#######################################################################
+# MicroPython ring buffer receiver for EBYTE E32 Series LoRa modules.
+# The UART delivers a byte stream : several frames can arrive between
+# two polls and a frame can arrive in parts. The receiver accumulates
+# the UART bytes in a ring buffer and splits them into frames :
+#
+#   - JSON frame   : starts with '{' and ends with the matching '}'
+#                    (braces inside strings are skipped)
+#   - binary frame : starts with a header byte 0xB0-0xBF followed by a
+#                    length byte LEN and LEN bytes (see codecE32)
+#
+# A frame can be followed by a trailer of a fixed length : a checksum
+# byte or a CRC-16 (CCITT, polynomial 0x1021, initial value 0xFFFF,
+# high byte first). Bytes that do not start a frame are skipped to
+# resynchronise. A '{' followed by bytes which cannot continue a JSON
+# object (binary bytes, letters outside strings other than those of
+# true/false/null, a '{' after a value) is skipped as soon as they
+# arrive, so a broken frame does not hold back the frames behind it.
+#######################################################################
+
+from array import array
+
+
+def makeCRC16Table(poly=0x1021):
+    ''' Precompute the CRC-16 of every byte value '''
+    table = array('H', [0]*256)
+    for i in range(256):
+        crc = i << 8
+        for bit in range(8):
+            crc = (crc << 1 ^ poly if crc & 0x8000 else crc << 1) & 0xFFFF
+        table[i] = crc
+    return table
+
+
+CRC16TABLE = makeCRC16Table()
+
+
+def makeJSONTable():
+    ''' Bytes which can follow a '{' outside the strings of a JSON object : 1 for a token, 2 for whitespace '''
+    table = bytearray(256)
+    for c in b'{}[]:,"-+.0123456789eEtrufalsn':
+        table[c] = 1
+    for c in b' \t\r\n':
+        table[c] = 2
+    return table
+
+
+JSONTABLE = makeJSONTable()
+
+
+def crc16(data, crc=0xFFFF):
+    ''' CRC-16 (CCITT) of bytes, bytearray or memoryview data. The CRC-16 of data followed by its CRC-16
+        (high byte first) is 0. '''
+    table = CRC16TABLE
+    for b in data:
+        crc = (crc << 8 & 0xFF00) ^ table[crc >> 8 ^ b]
+    return crc
+
+
+class framesE32:
+    ''' class to split the UART byte stream of an E32 LoRa module into frames '''
+
+    # size of the ring buffer
+    SIZE = 1024
+    # maximum frame length (size of the module UART buffer)
+    MAXFRAME = 512
+    # first byte of a JSON frame
+    JSON = 0x7B
+    # range of header bytes of a binary frame (high nibble)
+    BINARY = 0xB0
+
+
+    def __init__(self, size=SIZE):
+        ''' constructor for the frame receiver '''
+        self.buf = bytearray(size)                 # ring buffer
+        self.mv = memoryview(self.buf)             # view on ring buffer to read into without copies
+        self.size = size
+        self.head = 0                              # index of the first byte in the ring buffer
+        self.count = 0                             # number of bytes in the ring buffer
+        self.linear = bytearray(framesE32.MAXFRAME + 2)  # buffer for frames wrapping around the ring end
+        self.linmv = memoryview(self.linear)
+        self.skipped = 0                           # number of bytes skipped to resynchronise
+        self.received = 0                          # number of bytes received
+        self.frames = 0                            # number of frames received
+        self.reset()
+
+
+    def reset(self):
+        ''' Reset the scan state of the JSON frame at the head of the ring buffer '''
+        self.scan = 0                              # number of bytes of the frame scanned
+        self.depth = 0                             # brace depth
+        self.instring = False                      # inside a JSON string
+        self.escape = False                        # previous byte was a backslash in a string
+        self.last = 0                              # previous byte outside strings and whitespace
+
+
+    def clear(self):
+        ''' Discard all bytes in the ring buffer '''
+        self.head = 0
+        self.count = 0
+        self.reset()
+
+
+    def feed(self, serdev):
+        ''' Read all bytes available on the UART into the ring buffer. Returns the number of bytes read. '''
+        total = 0
+        while self.count < self.size:
+            available = serdev.any()
+            if not available:
+                break
+            # contiguous free space after the tail
+            tail = (self.head + self.count) % self.size
+            end = self.head if tail < self.head else self.size
+            n = serdev.readinto(self.mv[tail:min(end, tail + available)])
+            if not n:
+                break
+            self.count += n
+            total += n
+        self.received += total
+        return total
+
+
+    def write(self, data):
+        ''' Add bytes (bytes, bytearray or memoryview) to the ring buffer. Returns the number of bytes added. '''
+        n = min(len(data), self.size - self.count)
+        tail = (self.head + self.count) % self.size
+        for i in range(n):
+            self.buf[(tail + i) % self.size] = data[i]
+        self.count += n
+        self.received += n
+        return n
+
+
+    def at(self, index):
+        ''' Byte at position index from the head of the ring buffer '''
+        return self.buf[(self.head + index) % self.size]
+
+
+    def drop(self, n):
+        ''' Remove n bytes from the head of the ring buffer '''
+        self.head = (self.head + n) % self.size
+        self.count -= n
+        self.reset()
+
+
+    def frameLength(self):
+        ''' Length of the complete frame at the head of the ring buffer, 0 if it is not complete yet and
+            -1 if the head does not start a frame or starts a JSON frame which cannot be valid. '''
+        first = self.at(0)
+        if first & 0xF0 == framesE32.BINARY:
+            # binary frame : header, length byte and LEN bytes
+            if self.count < 2:
+                return 0
+            length = 2 + self.at(1)
+            return length if self.count >= length else 0
+        if first != framesE32.JSON:
+            return -1
+        # JSON frame : continue scanning for the matching brace, -1 as soon as a byte cannot continue the frame
+        table = JSONTABLE
+        while self.scan < self.count:
+            c = self.at(self.scan)
+            self.scan += 1
+            if self.instring:
+                if self.escape:
+                    self.escape = False
+                elif c == 0x5C:                     # backslash
+                    self.escape = True
+                elif c == 0x22:                     # double quote
+                    self.instring = False
+                elif c < 0x20:                      # control bytes are escaped in strings
+                    return -1
+            elif table[c] != 2:                     # whitespace is skipped
+                if not table[c]:
+                    return -1
+                if self.last == 0x7B and c != 0x22 and c != 0x7D:
+                    # a key or the end of the object follows {
+                    return -1
+                if c == 0x7B and self.scan > 1 and self.last not in b':[,':
+                    # an object is only a value
+                    return -1
+                self.last = c
+                if c == 0x22:
+                    self.instring = True
+                elif c == 0x7B:                     # {
+                    self.depth += 1
+                elif c == 0x7D:                     # }
+                    self.depth -= 1
+                    if self.depth == 0:
+                        return self.scan
+            if self.scan > framesE32.MAXFRAME:
+                return -1
+        return 0
+
+
+    def next(self, trailer=0):
+        ''' Remove the next complete frame with its trailer from the ring buffer. Returns a memoryview on the frame
+            which is only valid until the next feed, or None when there is no complete frame. '''
+        while self.count > 0:
+            length = self.frameLength()
+            if length < 0:
+                # no frame start or a broken JSON frame, skip a byte to resynchronise
+                self.drop(1)
+                self.skipped += 1
+                continue
+            if length == 0 or self.count < length + trailer:
+                # wait for the rest of the frame
+                return None
+            length += trailer
+            start = self.head
+            if start + length <= self.size:
+                # contiguous in the ring buffer
+                frame = self.mv[start:start + length]
+            else:
+                # wraps around the ring end, copy into the linear buffer
+                first = self.size - start
+                self.linmv[:first] = self.mv[start:]
+                self.linmv[first:length] = self.mv[:length - first]
+                frame = self.linmv[:length]
+            self.drop(length)
+            self.frames += 1
+            return frame
+        return None
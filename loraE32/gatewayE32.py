@@ -0,0 +1,155 @@
+#######################################################################
+# MicroPython gateway running several EBYTE E32 Series LoRa modules on
+# one ESP32, e.g. on UART1 and UART2, each on its own channel or
+# address. This doubles the channel capacity of a monitor node :
+#
+#   e32a = ebyteE32(25, 26, 27, Port='U1', Address=0xFFFF, Channel=0x04)
+#   e32b = ebyteE32(32, 33, 35, Port='U2', Address=0xFFFF, Channel=0x06)
+#   gateway = gatewayE32([e32a, e32b], useChecksum=True)
+#   gateway.start()
+#   for message in gateway.recvMessages():
+#       print(message)
+#
+# Receive scheduler : poll() reads the modules round robin, starting
+# with a different module every round, and puts the decoded messages of
+# all modules in one queue. A module stays in normal mode between polls,
+# only a send switches it to wakeup mode.
+#
+# Outbound traffic : sendMessage picks the idle module with the largest
+# remaining duty cycle budget for the target channel. While a module is
+# transmitting, the UART bytes of the other modules are read into their
+# frame receivers, so nothing is lost while the send blocks.
+#######################################################################
+
+
+class gatewayE32:
+    ''' class to run several ebyte E32 LoRa modules as one gateway '''
+
+    # maximum number of messages in the queue, the oldest is dropped
+    MAXQUEUE = 32
+
+
+    def __init__(self, radios, useChecksum=False, useCRC=False, maxQueue=MAXQUEUE):
+        ''' constructor for the gateway of a list of ebyteE32 instances (not started) '''
+        self.radios = radios
+        self.useChecksum = useChecksum             # checksum on the frames of all modules
+        self.useCRC = useCRC                       # CRC-16 on the frames of all modules
+        self.maxQueue = maxQueue
+        self.queue = []                            # received messages of all modules : (module index, message)
+        self.listening = [False] * len(radios)     # module in normal mode
+        self.first = 0                             # module polled first in the next round
+        self.received = [0] * len(radios)          # number of messages received per module
+        self.sent = [0] * len(radios)              # number of messages sent per module
+        self.dropped = 0                           # number of messages dropped from a full queue
+        self.deferred = 0                          # number of sends without an idle module with duty cycle budget
+
+
+    def start(self):
+        ''' Start all ebyte E32 LoRa modules '''
+        result = "OK"
+        for radio in self.radios:
+            if radio.start() != "OK":
+                result = "NOK"
+            # read the other modules while this one is busy
+            radio.busyHook = lambda busy=radio: self.feed(busy)
+        return result
+
+
+    def stop(self):
+        ''' Stop all ebyte E32 LoRa modules '''
+        for radio in self.radios:
+            radio.busyHook = None
+            radio.stop()
+        return "OK"
+
+
+    def feed(self, busy=None):
+        ''' Read the UART bytes of all listening modules except busy into their frame receivers '''
+        for i, radio in enumerate(self.radios):
+            if radio is not busy and self.listening[i]:
+                radio.receiver.feed(radio.serdev)
+
+
+    def poll(self):
+        ''' One round of the receive scheduler : decode the received messages of every module into the queue.
+            Returns the number of messages queued. '''
+        count = 0
+        n = len(self.radios)
+        for k in range(n):
+            i = (self.first + k) % n
+            radio = self.radios[i]
+            if not self.listening[i]:
+                if radio.setOperationMode('normal') != "OK":
+                    continue
+                self.listening[i] = True
+            radio.receiver.feed(radio.serdev)
+            while True:
+                try:
+                    message = radio.nextMessage(self.useChecksum, self.useCRC)
+                except Exception as E:
+                    if radio.debug:
+                        print('Error on poll: ',E)
+                    continue
+                if message is None:
+                    break
+                if len(self.queue) >= self.maxQueue:
+                    self.queue.pop(0)
+                    self.dropped += 1
+                self.queue.append((i, message))
+                self.received[i] += 1
+                count += 1
+        self.first = (self.first + 1) % n
+        return count
+
+
+    def recvMessage(self):
+        ''' Receive the next message of any module, see ebyteE32.recvMessage. Returns the module index and the message. '''
+        if not self.queue:
+            self.poll()
+        if not self.queue:
+            return None, { 'msg':None }
+        return self.queue.pop(0)
+
+
+    def recvMessages(self):
+        ''' Generator yielding all messages received by the modules one at a time '''
+        self.poll()
+        while self.queue:
+            yield self.queue.pop(0)[1]
+
+
+    def selectRadio(self, to_channel):
+        ''' Index of the idle module with the largest remaining duty cycle budget for the channel, None if every module
+            is busy or has no budget left '''
+        best = None
+        remaining = 0
+        n = len(self.radios)
+        for k in range(n):
+            i = (self.first + k) % n
+            radio = self.radios[i]
+            if not radio.AUX.value():
+                continue
+            budget = radio.getDutyCycle(to_channel)['remaining']
+            if budget > remaining:
+                best, remaining = i, budget
+        return best
+
+
+    def sendMessage(self, to_address, to_channel, payload, useBinary=False):
+        ''' Send the payload dictionary with the module selected by selectRadio, see ebyteE32.sendMessage '''
+        i = self.selectRadio(to_channel)
+        if i is None:
+            self.deferred += 1
+            return "NOK"
+        # the send switches the module to wakeup mode
+        self.listening[i] = False
+        result = self.radios[i].sendMessage(to_address, to_channel, payload, self.useChecksum, useBinary, self.useCRC)
+        if result == "OK":
+            self.sent[i] += 1
+        return result
+
+
+    def getStats(self):
+        ''' Gateway statistics : messages received and sent per module, queued, dropped and deferred '''
+        return { 'received':list(self.received), 'sent':list(self.sent), 'queued':len(self.queue),
+                 'dropped':self.dropped, 'deferred':self.deferred }
@@ -0,0 +1,79 @@
+###########################################
+# benchmark of the batched send on the E32
+# simulator : frames/s, mode switches and
+# AUX waits of a backlog sent with a loop
+# of sendMessage versus sendMany with and
+# without wakeup preamble, runs on a host :
+# python3 host/benchBatchE32.py
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [here, os.path.dirname(here)]
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim
+from loraE32 import ebyteE32
+import utime
+
+FRAMES = 20
+RATES = ('2.4k', '19.2k')
+
+
+def run(rate, send):
+    ''' send FRAMES messages from 0x0001 to 0x0003 on channel 4, returns the sender statistics and the received messages '''
+    sim.reset()
+    ether = e32sim.Ether()
+    received = []
+    result = {}
+
+    def sender():
+        e32 = ebyteE32(25, 26, 27, AirDataRate=rate, Address=0x0001, Channel=0x04)
+        assert e32.start() == 'OK'
+        utime.sleep_ms(1000)
+        e32.resetStats()
+        payloads = [ { 'node':'01', 'msg':i, 'temp':'21.5', 'hum':'55' } for i in range(FRAMES) ]
+        start = utime.ticks_ms()
+        if send == 'sendMany':
+            assert e32.sendMany(0x0003, 0x04, payloads, useChecksum=True) == 'OK'
+        elif send == 'sendMany wakeup':
+            assert e32.sendMany(0x0003, 0x04, payloads, useChecksum=True, wakeup=True) == 'OK'
+        else:
+            for payload in payloads:
+                assert e32.sendMessage(0x0003, 0x04, payload, useChecksum=True) == 'OK'
+        result['ms'] = utime.ticks_diff(utime.ticks_ms(), start)
+        result['stats'] = e32.stats()
+
+    def monitor():
+        e32 = ebyteE32(25, 26, 27, AirDataRate=rate, Address=0x0003, Channel=0x04)
+        assert e32.start() == 'OK'
+        e32.listen(useChecksum=True)
+        while True:
+            for message in e32.pollMessages():
+                received.append(message['msg'])
+            utime.sleep_ms(20)
+
+    for name, target in (('sensor', sender), ('monitor', monitor)):
+        board = e32sim.Board(name)
+        board.attach(e32sim.E32Module(ether, name=name))
+        sim.process(board, target)
+    sim.run(FRAMES * 2000 + 10000)
+    errors = [p.error for p in sim.processes if p.error is not None]
+    sim.stop()
+    assert not errors, errors
+    assert received == list(range(FRAMES)), received
+    return result
+
+
+print('%d frames of about 50 bytes'%(FRAMES))
+print('rate  | send             | time     | frames/s | mode switches | AUX waits | AUX ms')
+for rate in RATES:
+    for send in ('sendMessage loop', 'sendMany wakeup', 'sendMany'):
+        result = run(rate, send)
+        stats = result['stats']
+        print('%-5s | %-16s | %5d ms | %8.2f | %13d | %9d | %6d'%(rate, send,
+              result['ms'], FRAMES * 1000 / result['ms'], stats['modes'], stats['aux_waits'], stats['aux_ms']))
@@ -0,0 +1,81 @@
+###########################################
+# benchmark of the precompiled profile
+# frames on the E32 simulator
+###########################################
+# time, mode switches and config encodes
+# per config switch : config dictionary
+# and setConfig versus useProfile, and the
+# transmission mode switches with and
+# without a profile in use. runs on a
+# host : python3 host/benchProfileE32.py
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [here, os.path.dirname(here)]
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim
+from loraE32 import ebyteE32
+import utime
+
+RUNS = 20
+PROFILES = { 'monitor':{ 'address':0xFFFF }, 'uplink':{ 'address':0x0005, 'wutime':3 } }
+
+board = e32sim.Board('relay')
+board.attach(e32sim.E32Module(e32sim.Ether(), name='relay'))
+with board:
+    e32 = ebyteE32(25, 26, 27, Address=0x0005, Channel=0x04)
+    e32.start()
+e32.defineProfiles(PROFILES)
+
+# count the config encodes
+encodes = [0]
+encodeConfig = e32.encodeConfig
+def countedEncode():
+    encodes[0] += 1
+    return encodeConfig()
+e32.encodeConfig = countedEncode
+
+
+def bench(name, switch, mode):
+    ''' average time (us), mode switches and config encodes of a switch from operation mode mode '''
+    total = modes = encodes[0] = 0
+    for i in range(RUNS):
+        e32.setOperationMode(mode)
+        count = e32.counters['modes']
+        start = utime.ticks_us()
+        assert switch(i) == 'OK'
+        total += utime.ticks_diff(utime.ticks_us(), start)
+        modes += e32.counters['modes'] - count
+    print('%-28s | %-6s | %6d us | %3.1f | %3.1f'%(name, mode, total / RUNS, modes / RUNS, encodes[0] / RUNS))
+
+
+def setConfig(i):
+    e32.config.update(PROFILES['monitor' if i % 2 else 'uplink'])
+    return e32.setConfig('setConfigPwrDwnNoSave')
+
+
+def useProfile(i):
+    return e32.useProfile('monitor' if i % 2 else 'uplink')
+
+
+def setTransmissionMode(i):
+    return e32.setTransmissionMode(i % 2)
+
+
+print('%d switches'%(RUNS))
+print('switch                       | from   | time      | mode switches | encodes')
+for mode in ('normal', 'sleep'):
+    e32.profile = None
+    bench('config dictionary, setConfig', setConfig, mode)
+    bench('useProfile', useProfile, mode)
+    e32.profile = None
+    bench('setTransmissionMode', setTransmissionMode, mode)
+    e32.useProfile('uplink')
+    bench('setTransmissionMode, profile', setTransmissionMode, mode)
+sim.stop()
@@ -0,0 +1,75 @@
+###########################################
+# throughput and latency benchmark suite on
+# the E32 simulator : the full matrix of
+# benchmarkE32 with two modules on UART1 and
+# UART2 of one board, runs on a host :
+# python3 host/benchSuiteE32.py [results.json] [baseline.json]
+# the results are saved as JSON, the cases
+# which got slower or lost more messages
+# than in the baseline are listed. Result
+# files of an ESP32 (benchSuiteE32.py) :
+# python3 host/benchSuiteE32.py --compare baseline.json results.json
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [here, os.path.dirname(here)]
+compare = len(sys.argv) > 1 and sys.argv[1] == '--compare'
+if compare:
+    del sys.argv[1]
+results = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else None
+baseline = os.path.abspath(sys.argv[2]) if len(sys.argv) > 2 else None
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim
+from loraE32 import ebyteE32
+from benchmarkE32 import benchmarkE32
+import subprocess
+
+bench = [None]
+
+
+def showRegressions(baseline, results):
+    regressions = benchmarkE32(None, None).compareResults(baseline, results)
+    for key, metric, old, new in regressions:
+        print('regression %s %s : %s -> %s'%(key, metric, old, new))
+    print('%d regressions of %s against %s'%(len(regressions), results, baseline))
+    sys.exit(1 if regressions else 0)
+
+
+if compare:
+    # baseline and results given in this order
+    showRegressions(results, baseline)
+
+
+def suite():
+    sender = ebyteE32(25, 26, 27, Port='U1', Address=0x0001, Channel=0x04)
+    receiver = ebyteE32(32, 33, 35, Port='U2', Address=0x0002, Channel=0x04)
+    assert sender.start() == 'OK' and receiver.start() == 'OK'
+    bench[0] = benchmarkE32(sender, receiver)
+    bench[0].runSuite()
+
+
+board = e32sim.Board('bench')
+board.attach(e32sim.E32Module(e32sim.Ether(), name='U1'), M0=25, M1=26, AUX=27, uart=1)
+board.attach(e32sim.E32Module(board.uarts[1].ether, name='U2'), M0=32, M1=33, AUX=35, uart=2)
+sim.process(board, suite)
+sim.run()
+errors = [p.error for p in sim.processes if p.error is not None]
+sim.stop()
+assert not errors, errors
+
+if results is not None:
+    # label : the commit of the driver
+    try:
+        label = subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=here).decode().strip()
+    except Exception:
+        label = ''
+    bench[0].saveResults(results, label=label)
+    print('results saved in %s'%(results))
+    if baseline is not None:
+        showRegressions(baseline, results)
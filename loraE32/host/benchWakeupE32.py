@@ -0,0 +1,79 @@
+###########################################
+# benchmark of the wake on radio receive
+# pipeline on the E32 simulator
+###########################################
+# for every wakeup time : latency of a
+# message to a power save receiver, the
+# part of the time its radio listens and
+# the sends per hour in a 1% duty cycle.
+# runs on a host :
+# python3 host/benchWakeupE32.py [datarate]
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [here, os.path.dirname(here)]
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim
+from loraE32 import ebyteE32
+import utime
+
+RUNS = 5
+# the radio listens about 2 symbols for a preamble at every wakeup (channel activity detection)
+CADSYMBOLS = 2
+
+datarate = sys.argv[1] if len(sys.argv) > 1 else '2.4k'
+ether = e32sim.Ether()
+e32 = {}
+for name, address, channel in (('sender', 0x0001, 0x04), ('receiver', 0x0003, 0x04)):
+    board = e32sim.Board(name)
+    board.attach(e32sim.E32Module(ether, name=name))
+    with board:
+        e32[name] = ebyteE32(25, 26, 27, Address=address, Channel=channel, AirDataRate=datarate)
+        e32[name].start()
+sender = e32['sender']
+receiver = e32['receiver']
+sf, bw = ebyteE32.LORAPARAM[datarate]
+tsym = (1 << sf) / bw
+
+
+def latency(message):
+    ''' time (ms) from the start of the send until the message is decoded by the receiver '''
+    # the benchmark does not wait for duty cycle budget
+    sender.airtime = {}
+    start = utime.ticks_ms()
+    sender.sendMessage(0x0003, 0x04, message, useChecksum=True)
+    while True:
+        for received in receiver.recvPowerSave(useChecksum=True):
+            if received == message:
+                return utime.ticks_diff(utime.ticks_ms(), start)
+        utime.sleep_ms(1)
+        if utime.ticks_diff(utime.ticks_ms(), start) > 10000:
+            return None
+
+
+print('air data rate %s'%(datarate))
+print('WUTIME  | latency  | added   | listening | sends per hour (1%)')
+# receiver in normal mode listens all the time
+receiver.setOperationMode('normal')
+average = sum(latency({ 'node':'01', 'temp':'21.5', 'hum':'60' }) for i in range(RUNS)) / RUNS
+print('%-7s | %5d ms |         | %7.2f %% | %d'%('normal', average, 100, 36000 // sender.lastAirtime))
+base = average
+for wutime in range(8):
+    receiver.listenPowerSave(wutime)
+    sender.setPeerWakeup(0x0003, 0x04, wutime)
+    results = [latency({ 'node':'01', 'temp':'21.5', 'hum':'60' }) for i in range(RUNS)]
+    if None in results:
+        print('%-7s | message lost'%(ebyteE32.WUTIME[wutime]))
+        continue
+    average = sum(results) / RUNS
+    interval = 250 * (wutime + 1)
+    listening = 100 * CADSYMBOLS * tsym / interval
+    sends = 36000 // sender.lastAirtime
+    print('%-7s | %5d ms | %4d ms | %7.2f %% | %d'%(ebyteE32.WUTIME[wutime], average, max(average - base, 0), listening, sends))
+sim.stop()
@@ -0,0 +1,21 @@
+# Host stand-in for the MicroPython dht module, measures a slowly varying climate
+from e32sim import sim
+
+
+class DHT11:
+
+    def __init__(self, pin):
+        self.pin = pin
+
+    def measure(self):
+        self.temp = 18 + sim.rng.randint(0, 6)
+        self.hum = 55 + sim.rng.randint(0, 10)
+
+    def temperature(self):
+        return self.temp
+
+    def humidity(self):
+        return self.hum
+
+
+DHT22 = DHT11
@@ -0,0 +1,555 @@
+#######################################################################
+# Host-side simulator of EBYTE E32 Series LoRa modules, to run the
+# ebyteE32 driver and the node scripts under CPython on a Linux box.
+#
+# The host directory holds stand-ins for the MicroPython modules the
+# driver imports (machine, utime, uasyncio, ujson, ustruct) and for the modules
+# of the node scripts (dht, simpleWifi, influxdbTools, urequests). Put it first on
+# the module search path :
+#
+#   cd loraE32 && PYTHONPATH=host python3 host/runMonitorE32.py
+#
+# Simulation
+# ==========
+#   - virtual clock : utime reads and advances the clock of the
+#       simulator, a sleep takes no real time
+#   - board : one ESP32 with its pins, UARTs and RTC memory. The E32
+#       modules are attached to the pins and UART of a board.
+#   - process : a script or function running on a board. Processes run
+#       one at a time in their own thread, a sleep hands over to the
+#       process or module event that is due next.
+#   - ether : the radio channel shared by the modules. A frame reaches
+#       every module on the same channel and air data rate whose address
+#       matches (fixed P2P, broadcast 0xFFFF or monitor 0xFFFF), which is
+#       listening and in range, overlapping frames collide. With a path
+#       loss set between two modules, frames are lost when the TX power
+#       minus the path loss is near or below the receiver sensitivity of
+#       the air data rate.
+#
+# Module model
+# ============
+#   - operating modes set with M0/M1, AUX low during the mode switch
+#   - commands C0-C4 in sleep mode, AUX low until the response is sent,
+#       C0/C2 can be set to fail (rejected) : no response, config kept
+#   - transparent and fixed transmission in normal and wakeup mode,
+#       AUX low until the frame is on air (airtime from the air data
+#       rate, FEC and sub-packets of 58 bytes, wakeup preamble)
+#   - the packets written to the UART buffer (512 bytes) are sent one
+#       after the other, bytes beyond the buffer are lost
+#   - power save mode : only frames with a wakeup preamble at least as
+#       long as the wakeup time of the receiver are received
+#   - received frames are output on the UART at the UART baudrate with
+#       AUX low, in parts of 16 bytes
+# The timings of the module are approximations, see the constants.
+#######################################################################
+
+import heapq
+import random
+import threading
+
+
+# timings of the module (us)
+MODE_US = 2000              # mode switch
+TXDELAY_US = 2000           # from data received on the UART to start of transmission
+CMD_US = { 0xC0:30000,      # persistent config write
+           0xC1:2000,       # config read
+           0xC2:5000,       # temporary config write
+           0xC3:2000,       # version read
+           0xC4:300000 }    # reset
+CHUNK = 16                  # bytes output on the UART at once
+BUFFER = 512                # module UART buffer (bytes)
+SUBPACKET = 58              # maximum sub-packet length (bytes)
+# start of the virtual clock (seconds since 2000-01-01)
+EPOCH = 750000000
+
+# LoRa spreading factor and bandwidth (kHz) of the air data rate bits
+LORAPARAM = { 0:(12, 125), 1:(11, 250), 2:(11, 500), 3:(10, 500), 4:(9, 500), 5:(8, 500), 6:(8, 500), 7:(8, 500) }
+# receiver sensitivity (dBm) of the air data rate bits (approximation of the SX1276)
+SENSITIVITY = { 0:-138, 1:-133, 2:-130, 3:-127, 4:-124, 5:-121, 6:-121, 7:-121 }
+# output power (dBm) of the E32-868T20D of the TX power bits
+TXDBM = { 0:20, 1:17, 2:14, 3:10 }
+# link margin (dB) below which frames start to get lost
+FADE = 6
+# UART baudrate bits
+BAUDRATE = { 0:1200, 1:2400, 2:4800, 3:9600, 4:19200, 5:38400, 6:57600, 7:115200 }
+# version info of the E32-868T20D
+VERSION = bytes([0xC3, 0x45, 0x0D, 0x14])
+# default config bytes of the E32-868T20D (without header)
+DEFAULT = bytes([0x00, 0x00, 0x1A, 0x06, 0x44])
+
+
+class SimulationEnd(BaseException):
+    ''' raised in a process when the simulation ends '''
+
+
+class DeepSleep(BaseException):
+    ''' raised by machine.deepsleep, the process restarts its script after ms '''
+    def __init__(self, ms):
+        super().__init__(ms)
+        self.ms = ms
+
+
+def airtime_us(length, datarate, fec, preamble_us=0):
+    ''' time on air (us) of length bytes, sent in sub-packets of 58 bytes (Semtech LoRa formula) '''
+    sf, bw = LORAPARAM[datarate]
+    tsym = (1 << sf) * 1000 / bw
+    de = 1 if tsym > 16000 else 0
+    total = 0
+    while length > 0:
+        n = min(length, SUBPACKET)
+        length -= n
+        total += max(12.25 * tsym, preamble_us)
+        preamble_us = 0
+        symbols = -(-(8*n - 4*sf + 28 + 16) // (4*(sf - 2*de)))
+        total += (8 + max(symbols * (fec + 4), 0)) * tsym
+    return int(total)
+
+
+class Simulator:
+    ''' discrete event simulator with a virtual clock '''
+
+    def __init__(self):
+        self.now = 0                               # virtual clock (us)
+        self.events = []                           # heap of (time, sequence, callback or process)
+        self.seq = 0
+        self.processes = []
+        self.main = threading.Semaphore(0)         # released when a process hands back
+        self.local = threading.local()             # board of the main thread
+        self.rng = random.Random(1)
+
+    def reset(self, seed=1):
+        ''' stop all processes and restart the clock '''
+        self.stop()
+        self.__init__()
+        self.rng.seed(seed)
+
+    # events
+    def at(self, delay_us, callback):
+        ''' call callback after delay_us '''
+        self.seq += 1
+        heapq.heappush(self.events, (self.now + int(delay_us), self.seq, callback))
+
+    def advance(self, until):
+        ''' handle all events up to time until (us) '''
+        while self.events and self.events[0][0] <= until:
+            t, seq, target = heapq.heappop(self.events)
+            self.now = max(self.now, t)
+            if isinstance(target, Process):
+                target.resume()
+            else:
+                target()
+        self.now = max(self.now, until)
+
+    def run(self, ms=None):
+        ''' run the simulation for ms (default until no events are left) '''
+        until = float('inf') if ms is None else self.now + int(ms * 1000)
+        self.advance(until)
+
+    def stop(self):
+        ''' end all processes '''
+        for process in self.processes:
+            process.kill()
+        self.processes = []
+
+    # time
+    def sleep_us(self, us):
+        ''' sleep in the calling process, or advance the clock in the main thread '''
+        process = threading.current_thread()
+        if isinstance(process, Process):
+            process.sleep(us)
+        else:
+            self.advance(self.now + int(us))
+
+    # boards
+    def board(self):
+        ''' board of the calling process or the main thread '''
+        process = threading.current_thread()
+        if isinstance(process, Process):
+            return process.board
+        board = getattr(self.local, 'board', None)
+        if board is None:
+            board = self.local.board = Board('main')
+        return board
+
+    def process(self, board, target, delay_ms=0):
+        ''' start target (callable) as a process on board after delay_ms '''
+        process = Process(self, board, target)
+        self.processes.append(process)
+        process.start()
+        self.seq += 1
+        heapq.heappush(self.events, (self.now + int(delay_ms * 1000), self.seq, process))
+        return process
+
+
+sim = Simulator()
+
+
+class Process(threading.Thread):
+    ''' script or function running on a board, one process runs at a time '''
+
+    def __init__(self, simulator, board, target):
+        super().__init__(daemon=True)
+        self.sim = simulator
+        self.board = board
+        self.target = target
+        self.go = threading.Semaphore(0)
+        self.killed = False
+        self.finished = False
+        self.error = None
+
+    def run(self):
+        self.go.acquire()
+        try:
+            if not self.killed:
+                self.target()
+        except SimulationEnd:
+            pass
+        except BaseException as E:
+            self.error = E
+        finally:
+            self.finished = True
+            self.sim.main.release()
+
+    def resume(self):
+        ''' hand over from the scheduler to this process until it sleeps or ends '''
+        if self.finished:
+            return
+        self.go.release()
+        self.sim.main.acquire()
+
+    def sleep(self, us):
+        ''' hand back to the scheduler until us later '''
+        self.sim.seq += 1
+        heapq.heappush(self.sim.events, (self.sim.now + int(us), self.sim.seq, self))
+        self.sim.main.release()
+        self.go.acquire()
+        if self.killed:
+            raise SimulationEnd()
+
+    def kill(self):
+        if self.is_alive() and not self.finished:
+            self.killed = True
+            self.go.release()
+            self.sim.main.acquire()
+
+
+def runScript(path, name='__main__'):
+    ''' target for sim.process running a node script. machine.deepsleep restarts the script after the sleep
+        (the RTC memory of the board is kept), sys.exit ends it. '''
+    def target():
+        while True:
+            try:
+                code = compile(open(path).read(), path, 'exec')
+                exec(code, { '__name__':name, '__file__':path })
+                return
+            except DeepSleep as E:
+                sim.sleep_us(E.ms * 1000)
+            except SystemExit:
+                return
+    return target
+
+
+class Board:
+    ''' ESP32 board with pins, UARTs and RTC memory '''
+
+    def __init__(self, name='esp32'):
+        self.name = name
+        self.pins = {}                             # pin number -> (module, role)
+        self.uarts = {}                            # UART id -> module
+        self.levels = {}                           # level of pins without module
+        self.rtcmemory = b''
+
+    def attach(self, module, M0=25, M1=26, AUX=27, uart=1):
+        ''' connect the pins and UART of an E32 module to the board '''
+        self.pins[M0] = (module, 'M0')
+        self.pins[M1] = (module, 'M1')
+        self.pins[AUX] = (module, 'AUX')
+        self.uarts[uart] = module
+        return module
+
+    def __enter__(self):
+        sim.local.board = self
+        return self
+
+    def __exit__(self, *args):
+        sim.local.board = None
+
+
+class Ether:
+    ''' radio channel shared by the modules '''
+
+    def __init__(self, loss=0.0):
+        self.modules = []
+        self.loss = loss                           # probability a frame is lost for a receiver
+        self.onair = []                            # frames on air : (start, end, channel, datarate, sender)
+        self.blocked = set()                       # pairs of modules out of range of each other
+        self.pathloss = {}                         # path loss (dB) between pairs of modules
+        self.stats = { 'frames':0, 'delivered':0, 'lost':0, 'collisions':0 }
+
+    def join(self, module):
+        self.modules.append(module)
+
+    def outOfRange(self, a, b):
+        ''' modules a and b do not receive each other '''
+        self.blocked.add((a, b))
+        self.blocked.add((b, a))
+
+    def setPathLoss(self, a, b, loss):
+        ''' path loss (dB) between modules a and b : a frame is lost below the sensitivity of the air data rate and
+            with a growing probability when the margin is less than FADE dB '''
+        self.pathloss[(a, b)] = loss
+        self.pathloss[(b, a)] = loss
+
+    def faded(self, sender, module, datarate):
+        ''' is the frame lost on the path from sender to module '''
+        loss = self.pathloss.get((sender, module))
+        if loss is None:
+            return False
+        margin = TXDBM[sender.txpower()] - loss - SENSITIVITY[datarate]
+        return margin < FADE and sim.rng.random() * FADE > margin
+
+    def transmit(self, sender, channel, address, payload, airtime, wakeup):
+        ''' put a frame on air, it is delivered when the transmission ends '''
+        start = sim.now
+        end = start + airtime
+        entry = (start, end, channel, sender.datarate(), sender)
+        self.onair = [f for f in self.onair if f[1] > start] + [entry]
+        self.stats['frames'] += 1
+        sim.at(airtime, lambda: self.deliver(entry, address, payload, wakeup))
+
+    def deliver(self, entry, address, payload, wakeup):
+        start, end, channel, datarate, sender = entry
+        # overlapping frames on the same channel and air data rate collide
+        collided = any(f is not entry and f[2] == channel and f[3] == datarate and f[0] < end and f[1] > start
+                       for f in self.onair)
+        if collided:
+            self.stats['collisions'] += 1
+        for module in self.modules:
+            if module is sender or module.channel() != channel or module.datarate() != datarate:
+                continue
+            if (sender, module) in self.blocked:
+                continue
+            if not (address == 0xFFFF or module.address() == 0xFFFF or module.address() == address):
+                continue
+            if not module.listening(start, wakeup):
+                continue
+            if collided or sim.rng.random() < self.loss or self.faded(sender, module, datarate):
+                self.stats['lost'] += 1
+                continue
+            self.stats['delivered'] += 1
+            module.receive(payload)
+
+
+class E32Module:
+    ''' simulated EBYTE E32 LoRa module '''
+
+    def __init__(self, ether, config=DEFAULT, name='E32'):
+        self.ether = ether
+        self.name = name
+        self.persisted = bytearray(config)         # config saved with C0
+        self.active = bytearray(config)            # config in use
+        self.pins = { 'M0':0, 'M1':0 }
+        self.mode = 0                              # 0=normal 1=wakeup 2=powersave 3=sleep
+        self.busy = 0                              # number of activities holding AUX low
+        self.handlers = []                         # AUX pin interrupt handlers : (trigger, handler, pin)
+        self.toHost = bytearray()                  # bytes waiting to be read by the ESP32
+        self.buffered = 0                          # bytes in the UART buffer waiting for transmission
+        self.txQueue = []                          # packets in the UART buffer : (data, wakeup)
+        self.sending = False                       # transmission of the packets in the buffer started
+        self.command = bytearray()                 # command bytes received in sleep mode
+        self.txUntil = 0                           # end of the current transmission (us)
+        self.rxUntil = 0                           # end of the current reception output (us)
+        self.modeEval = False
+        self.rejected = set()                      # command headers answered with nothing (config write errors)
+        self.stats = { 'tx':0, 'rx':0, 'commands':0, 'overflow':0, 'bytes_tx':0, 'bytes_rx':0, 'airtime_us':0 }
+        ether.join(self)
+
+    # config
+    def address(self):
+        return self.active[0] << 8 | self.active[1]
+
+    def channel(self):
+        return self.active[3]
+
+    def datarate(self):
+        return self.active[2] & 0b111
+
+    def txpower(self):
+        return self.active[4] & 0b11
+
+    def baudrate(self):
+        return BAUDRATE[self.active[2] >> 3 & 0b111]
+
+    def fixed(self):
+        return self.active[4] >> 7
+
+    def wutime_us(self):
+        return 250000 * ((self.active[4] >> 3 & 0b111) + 1)
+
+    def fec(self):
+        return self.active[4] >> 2 & 0b1
+
+    def uart_us(self, n):
+        ''' time to transfer n bytes on the UART (8N1 = 10 bits per byte) '''
+        return n * 10 * 1000000 // self.baudrate()
+
+    # AUX pin
+    def aux(self):
+        return 0 if self.busy else 1
+
+    def busyStart(self):
+        self.busy += 1
+        if self.busy == 1:
+            self.edge(0)
+
+    def busyEnd(self):
+        self.busy -= 1
+        if self.busy == 0:
+            self.edge(1)
+
+    def edge(self, level):
+        for trigger, handler, pin in list(self.handlers):
+            if trigger & (1 if level else 2):
+                handler(pin)
+
+    # M0/M1 pins
+    def setPin(self, role, level):
+        self.pins[role] = 1 if level else 0
+        if not self.modeEval:
+            # both pins are set one after the other
+            self.modeEval = True
+            sim.at(50, self.evalMode)
+
+    def evalMode(self):
+        self.modeEval = False
+        mode = self.pins['M0'] | self.pins['M1'] << 1
+        if mode == self.mode:
+            return
+        self.mode = mode
+        self.command = bytearray()
+        self.busyStart()
+        sim.at(MODE_US, self.busyEnd)
+
+    # UART from the ESP32
+    def hostWrite(self, data):
+        data = bytes(data)
+        sim.at(self.uart_us(len(data)), lambda: self.uartReceived(data))
+        return len(data)
+
+    def uartReceived(self, data):
+        if self.mode == 3:
+            self.command += data
+            self.handleCommand()
+        elif self.mode in (0, 1):
+            if self.buffered + len(data) > BUFFER:
+                self.stats['overflow'] += 1
+                return
+            self.buffered += len(data)
+            self.busyStart()
+            # packets in the buffer are sent one after the other
+            self.txQueue.append((data, self.mode == 1))
+            if not self.sending:
+                self.sending = True
+                sim.at(max(sim.now + TXDELAY_US, self.txUntil) - sim.now, self.transmitNext)
+        # power save mode : UART is off
+
+    def handleCommand(self):
+        cmd = self.command
+        if len(cmd) and cmd[0] in (0xC0, 0xC2):
+            if len(cmd) < 6:
+                return
+            config = bytes(cmd[1:6])
+            header = cmd[0]
+            self.command = cmd[6:]
+            if header in self.rejected:
+                return
+            self.active[:] = config
+            if header == 0xC0:
+                self.persisted[:] = config
+            self.respond(header, bytes([header]) + config)
+        elif len(cmd) >= 3 and cmd[0] == cmd[1] == cmd[2] and cmd[0] in (0xC1, 0xC3, 0xC4):
+            header = cmd[0]
+            self.command = cmd[3:]
+            if header == 0xC1:
+                self.respond(header, bytes([0xC0]) + bytes(self.persisted))
+            elif header == 0xC3:
+                self.respond(header, VERSION)
+            else:
+                self.active[:] = self.persisted
+                self.respond(header, b'')
+        elif len(cmd) >= 3 or (len(cmd) and cmd[0] not in (0xC0, 0xC1, 0xC2, 0xC3, 0xC4)):
+            # unknown command
+            self.command = bytearray()
+
+    def respond(self, header, response):
+        self.stats['commands'] += 1
+        self.busyStart()
+        def done():
+            self.toHost += response
+            self.busyEnd()
+        sim.at(CMD_US[header] + self.uart_us(len(response)), done)
+
+    # radio
+    def transmitNext(self):
+        ''' transmit the next packet of the buffer '''
+        if not self.txQueue:
+            self.sending = False
+            return
+        data, wakeup = self.txQueue.pop(0)
+        self.transmit(data, wakeup)
+        sim.at(max(self.txUntil - sim.now, 0), self.transmitNext)
+
+    def transmit(self, data, wakeup):
+        self.buffered -= len(data)
+        if self.fixed():
+            if len(data) < 3:
+                self.busyEnd()
+                return
+            address = data[0] << 8 | data[1]
+            channel = data[2]
+            payload = data[3:]
+        else:
+            address = self.address()
+            channel = self.channel()
+            payload = data
+        preamble = self.wutime_us() if wakeup else 0
+        airtime = airtime_us(len(payload) + 2, self.datarate(), self.fec(), preamble)
+        self.txUntil = sim.now + airtime
+        self.stats['tx'] += 1
+        self.stats['bytes_tx'] += len(payload)
+        self.stats['airtime_us'] += airtime
+        self.ether.transmit(self, channel, address, payload, airtime, preamble if wakeup else 0)
+        sim.at(airtime, self.busyEnd)
+
+    def listening(self, start, wakeup):
+        ''' can the module receive a frame which started at start (us) '''
+        if self.txUntil > start:
+            return False
+        if self.mode in (0, 1):
+            return True
+        if self.mode == 2:
+            return wakeup >= self.wutime_us()
+        return False
+
+    def receive(self, payload):
+        ''' output a received frame on the UART with AUX low '''
+        self.stats['rx'] += 1
+        self.stats['bytes_rx'] += len(payload)
+        self.busyStart()
+        start = max(sim.now, self.rxUntil)
+        for i in range(0, len(payload), CHUNK):
+            chunk = payload[i:i + CHUNK]
+            start += self.uart_us(len(chunk))
+            sim.at(start - sim.now, lambda chunk=chunk: self.toHost.extend(chunk))
+        self.rxUntil = start
+        sim.at(start - sim.now, self.busyEnd)
+
+    # UART to the ESP32
+    def hostRead(self, n=None):
+        if not self.toHost:
+            return None
+        if n is None:
+            n = len(self.toHost)
+        data = bytes(self.toHost[:n])
+        del self.toHost[:n]
+        return data
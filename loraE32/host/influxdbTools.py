@@ -0,0 +1,20 @@
+# Host stand-in for influxdbTools, the points are kept in influxdbPutData.written instead of sent
+
+
+class influxdbPutData:
+
+    written = []                # points written by all instances : (node, field, value)
+
+    def __init__(self, host, port, database, tag, field, value, debug=False):
+        self.points = []
+        self.debug = debug
+
+    def makeDataStringNodeFieldValue(self, node, field, value):
+        self.points.append((node, field, value))
+
+    def writeToInfluxdb(self):
+        influxdbPutData.written.extend(self.points)
+        if self.debug:
+            print(self.points)
+        self.points = []
+        return True
@@ -0,0 +1,124 @@
+#######################################################################
+# Host stand-in for the MicroPython machine module, backed by the E32
+# simulator (see e32sim). Pins and UARTs connected to a simulated E32
+# module drive it, other pins keep their level.
+#######################################################################
+
+from e32sim import sim, DeepSleep
+
+
+class Pin:
+    ''' stand-in for machine.Pin '''
+
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_UP = 2
+    PULL_DOWN = 1
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.board = sim.board()
+        self.module, self.role = self.board.pins.get(id, (None, None))
+        if value is not None:
+            self.value(value)
+
+    def value(self, v=None):
+        if v is None:
+            if self.role == 'AUX':
+                return self.module.aux()
+            if self.module is not None:
+                return self.module.pins[self.role]
+            return self.board.levels.get(self.id, 0)
+        if self.module is not None and self.role != 'AUX':
+            self.module.setPin(self.role, v)
+        else:
+            self.board.levels[self.id] = 1 if v else 0
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING):
+        if self.role != 'AUX':
+            return None
+        # one handler per pin
+        self.module.handlers = [h for h in self.module.handlers if h[2] is not self]
+        if handler is not None:
+            self.module.handlers.append((trigger, handler, self))
+        return None
+
+
+class UART:
+    ''' stand-in for machine.UART '''
+
+    def __init__(self, id, baudrate=115200, **kwargs):
+        self.id = id
+        self.module = sim.board().uarts.get(id)
+        self.baudrate = baudrate
+
+    def init(self, baudrate=115200, **kwargs):
+        self.baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def any(self):
+        return len(self.module.toHost) if self.module else 0
+
+    def read(self, nbytes=None):
+        return self.module.hostRead(nbytes) if self.module else None
+
+    def readinto(self, buf, nbytes=None):
+        if nbytes is None:
+            nbytes = len(buf)
+        data = self.read(nbytes)
+        if not data:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+    def readline(self):
+        if not self.module or not self.module.toHost:
+            return None
+        end = self.module.toHost.find(b'\n')
+        return self.read(end + 1 if end >= 0 else None)
+
+    def write(self, buf):
+        return self.module.hostWrite(buf) if self.module else len(buf)
+
+
+class RTC:
+    ''' stand-in for machine.RTC, the memory is kept per board during deep sleep '''
+
+    def __init__(self):
+        self.board = sim.board()
+
+    def memory(self, data=None):
+        if data is None:
+            return self.board.rtcmemory
+        self.board.rtcmemory = bytes(data)
+
+
+def deepsleep(ms=0):
+    ''' ends the script, the process restarts it after ms (see e32sim.runScript) '''
+    raise DeepSleep(ms)
+
+
+def lightsleep(ms=0):
+    sim.sleep_us(ms * 1000)
+
+
+def idle():
+    sim.sleep_us(1000)
+
+
+def reset():
+    raise DeepSleep(0)
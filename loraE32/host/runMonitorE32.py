@@ -0,0 +1,58 @@
+###########################################
+# runs MonitorNodeE32.py and a number of
+# SensorNodeE32_01.py nodes on the E32
+# simulator, runs on a host :
+# cd loraE32 && python3 host/runMonitorE32.py [nodes] [hours]
+###########################################
+
+import os
+import sys
+import tempfile
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+scripts = os.path.dirname(here)
+sys.path[0:0] = [here, scripts]
+
+import e32sim
+from e32sim import sim
+import urequests
+
+nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+hours = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+# every board writes its E32config.json in the same temporary directory
+os.chdir(tempfile.mkdtemp())
+ether = e32sim.Ether()
+
+# monitor
+board = e32sim.Board('monitor')
+monitor = board.attach(e32sim.E32Module(ether, name='monitor'))
+sim.process(board, e32sim.runScript(os.path.join(scripts, 'MonitorNodeE32.py')))
+
+# sensor nodes, started 7 s apart so their batches do not collide
+sensors = []
+for i in range(nodes):
+    board = e32sim.Board('sensor%d'%(i))
+    sensors.append(board.attach(e32sim.E32Module(ether, name=board.name)))
+    sim.process(board, e32sim.runScript(os.path.join(scripts, 'SensorNodeE32_01.py')), delay_ms=1000 + i * 7000)
+
+# run
+stdout = sys.stdout
+sys.stdout = open(os.devnull, 'w')
+start = time.time()
+processes = list(sim.processes)
+try:
+    sim.run(hours * 3600000)
+finally:
+    sim.stop()
+    sys.stdout = stdout
+elapsed = time.time() - start
+
+for process in processes:
+    if process.error is not None:
+        print('%s : %r'%(process.board.name, process.error))
+samples = sum(data.count(' temp=') for url, data in urequests.posted)
+print('%d sensor nodes, %.1f h virtual time in %.1f s'%(nodes, hours, elapsed))
+print('frames %(frames)d - delivered %(delivered)d - lost %(lost)d - collisions %(collisions)d'%ether.stats)
+print('monitor received %d frames, %d samples written to influxdb'%(monitor.stats['rx'], samples))
@@ -0,0 +1,16 @@
+# Host stand-in for simpleWifi, the host is always connected
+
+
+class Wifi:
+
+    def open(self):
+        return True
+
+    def get_status(self):
+        return True
+
+    def get_IPdata(self):
+        return ('127.0.0.1', '255.0.0.0', '127.0.0.1', '127.0.0.1')
+
+    def close(self):
+        return True
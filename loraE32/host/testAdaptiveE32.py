@@ -0,0 +1,96 @@
+###########################################
+# test of the link adaptation on the E32
+# simulator : a near and a far link adapt
+# to their path loss, a monitor keeps its
+# air data rate, runs on a host :
+# python3 host/testAdaptiveE32.py
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [here, os.path.dirname(here)]
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim
+from adaptiveE32 import adaptiveE32
+import utime
+
+MESSAGES = 60
+INTERVAL = 90000
+received = {}
+nodes = {}
+
+# sender, address, receiver, address, path loss (dB)
+LINKS = (('near', 0x0001, 'peer1', 0x0003, 112),
+         ('far', 0x0002, 'peer2', 0x0004, 141),
+         ('shared', 0x0005, 'monitor', 0x0007, 112))
+
+
+def sender(name, address, peer):
+    def run():
+        e32 = nodes[name] = adaptiveE32(25, 26, 27, Address=address, Channel=0x04)
+        assert e32.start() == 'OK'
+        e32.adaptLink(peer, 0x04)
+        utime.sleep_ms(address * 20000)
+        for i in range(MESSAGES):
+            e32.sendMessage(peer, 0x04, { 'node':name, 'msg':i }, useCRC=True)
+            utime.sleep_ms(INTERVAL)
+    return run
+
+
+def receiver(name, address):
+    def run():
+        e32 = nodes[name] = adaptiveE32(25, 26, 27, Address=address, Channel=0x04)
+        # a monitor receives from several transmitters
+        e32.acceptRate = name != 'monitor'
+        assert e32.start() == 'OK'
+        while True:
+            for message in e32.recvMessages(0x0001, 0x04, useCRC=True):
+                received.setdefault(message['node'], []).append(message['msg'])
+            utime.sleep_ms(50)
+    return run
+
+
+ether = e32sim.Ether()
+modules = {}
+for tx, txaddress, rx, rxaddress, loss in LINKS:
+    for name, target in ((tx, sender(tx, txaddress, rxaddress)), (rx, receiver(rx, rxaddress))):
+        board = e32sim.Board(name)
+        modules[name] = e32sim.E32Module(ether, name=name)
+        board.attach(modules[name])
+        sim.process(board, target)
+    ether.setPathLoss(modules[tx], modules[rx], loss)
+# only the links are in range
+for a in modules:
+    for b in modules:
+        if a < b and (modules[a], modules[b]) not in ether.pathloss:
+            ether.outOfRange(modules[a], modules[b])
+sim.run(MESSAGES * INTERVAL + 600000)
+errors = [p.error for p in sim.processes if p.error is not None]
+sim.stop()
+assert not errors, errors
+
+results = {}
+for tx, txaddress, rx, rxaddress, loss in LINKS:
+    e32 = nodes[tx]
+    delivery = e32.getDeliveryStats()
+    link = e32.getLinkStats()
+    results[tx] = link['links']['%04X:04'%(rxaddress)]
+    airtime = modules[tx].stats['airtime_us'] / 1000 / modules[tx].stats['tx']
+    print('%-6s : path loss %d dB, %s, ratio %.2f, %d retries, %.0f ms airtime per frame, %s'%(
+        tx, loss, results[tx], delivery['ratio'], delivery['retries'], airtime,
+        { k:v for k, v in link.items() if k != 'links' }))
+    assert delivery['ratio'] > 0.95, delivery
+    assert sorted(set(received[tx])) == sorted(received[tx]), received[tx]
+# the near link reaches the highest air data rate and the lowest TX power
+assert results['near'] == ('19.2k', 3), results
+# the far link can not go much faster
+assert results['far'][0] in ('2.4k', '4.8k') and results['far'][1] == 0, results
+# the monitor keeps 2.4k, the transmitter lowers its TX power
+assert results['shared'] == ('2.4k', 3), results
+assert nodes['monitor'].config['datarate'] == '2.4k'
+print('OK')
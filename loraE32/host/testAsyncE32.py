@@ -0,0 +1,112 @@
+###########################################
+# test of the uasyncio API on the E32
+# simulator : a messages loop and sends
+# switching the transmission mode run at
+# the same time, sends to a power save
+# receiver get a wakeup preamble, runs on
+# a host :
+# python3 host/testAsyncE32.py
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [here, os.path.dirname(here)]
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim
+from loraE32 import ebyteE32
+from asyncE32 import asyncE32
+import uasyncio as asyncio
+import utime
+
+MESSAGES = 10
+INTERVAL = 2000
+received = []
+sent = []
+tagged = []
+woken = []
+nodes = {}
+
+
+def sensor():
+    e32 = ebyteE32(25, 26, 27, Address=0x0001, Channel=0x02)
+    assert e32.start() == 'OK'
+    for i in range(MESSAGES):
+        utime.sleep_ms(INTERVAL * (i + 1) - utime.ticks_ms())
+        assert e32.sendMessage(0x0003, 0x04, { 'node':'01', 'msg':i }, useChecksum=True) == 'OK'
+
+
+def sleeper():
+    # power save receiver waking up every 500 ms
+    e32 = ebyteE32(25, 26, 27, Address=0x0005, Channel=0x06)
+    assert e32.start() == 'OK'
+    assert e32.listenPowerSave(1) == 'OK'
+    while True:
+        for message in e32.recvPowerSave():
+            woken.append(message['msg'])
+        utime.sleep_ms(50)
+
+
+def node():
+    e32 = nodes['node'] = asyncE32(25, 26, 27, Address=0x0003, Channel=0x04)
+    assert e32.start() == 'OK'
+    e32.setPeerWakeup(0x0005, 0x06, 1)
+
+    async def receiver():
+        async for message in e32.messages(0x0001, 0x02, useChecksum=True):
+            received.append(message['msg'])
+
+    async def sender():
+        # between the messages of the sensor, every send switches the transmission mode (C2) while the
+        # messages loop is waiting for data, a send to the power save receiver also the wakeup time
+        for i in range(MESSAGES):
+            await asyncio.sleep_ms(INTERVAL * i + INTERVAL // 2 - utime.ticks_ms())
+            if i % 2:
+                sent.append(await e32.send(0x0003, 0x04, { 'msg':i }))
+            else:
+                sent.append(await e32.send(0x0005, 0x06, { 'msg':i }))
+        await asyncio.sleep_ms(INTERVAL * MESSAGES + INTERVAL // 2 - utime.ticks_ms())
+        # the frames of send are tagged with the source like sendMessage
+        e32.sendSource = True
+        tagged.append(await e32.send(0x0005, 0x06, { 'msg':'tagged' }))
+        tagged.append(bytes(e32.frame[3:8]))
+
+    async def main():
+        task = asyncio.create_task(receiver())
+        await sender()
+        await asyncio.sleep_ms(INTERVAL)
+        task.cancel()
+
+    asyncio.run(main())
+
+
+ether = e32sim.Ether()
+modules = {}
+for name, target in (('sensor', sensor), ('node', node), ('sleeper', sleeper)):
+    board = e32sim.Board(name)
+    modules[name] = board.attach(e32sim.E32Module(ether, name=name))
+    sim.process(board, target)
+sim.run((MESSAGES + 5) * INTERVAL)
+errors = [p.error for p in sim.processes if p.error is not None]
+sim.stop()
+assert not errors, errors
+
+e32 = nodes['node']
+assert sent == ['OK'] * MESSAGES, sent
+assert received == list(range(MESSAGES)), received
+assert woken == [0, 2, 4, 6, 8, 'tagged'], woken
+assert modules['node'].wutime_us() == 500000
+assert tagged == ['OK', bytes([ebyteE32.SOURCE, 3 + 17, 0x00, 0x03, 0x04])], tagged
+assert e32.counters['config_errors'] == 0 and e32.counters['config_writes'] > MESSAGES, e32.counters
+assert ether.stats['collisions'] == 0
+# the mode switches and AUX waits of the coroutines are in the statistics
+stats = e32.stats()
+assert stats['modes'] >= 4 * MESSAGES and stats['mode_ms'] >= 2 * stats['modes'], stats
+assert stats['aux_waits'] == sum(stats['aux_hist']) and stats['aux_waits'] > stats['modes'] + stats['frames_tx'], stats
+assert stats['aux_timeouts'] == 0 and stats['aux_ms'] > stats['mode_ms']
+print('OK : %d sends and %d messages received at the same time, %d config writes'%(len(sent), len(received),
+      e32.counters['config_writes']))
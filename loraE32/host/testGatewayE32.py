@@ -0,0 +1,75 @@
+###########################################
+# test of the dual-radio gateway on the
+# E32 simulator, runs on a host :
+# python3 host/testGatewayE32.py
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [here, os.path.dirname(here)]
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim
+from loraE32 import ebyteE32
+from gatewayE32 import gatewayE32
+import utime
+
+MESSAGES = 30
+received = []
+nodes = {}
+
+
+def sender(address, channel, delay):
+    def target():
+        e32 = ebyteE32(25, 26, 27, Address=address, Channel=0x02)
+        assert e32.start() == 'OK'
+        utime.sleep_ms(delay)
+        for i in range(MESSAGES):
+            assert e32.sendMessage(0x0003, channel, { 'node':'%02d'%(address), 'msg':i }, useChecksum=True) == 'OK'
+            utime.sleep_ms(20000)
+    return target
+
+
+def gateway():
+    e32a = ebyteE32(25, 26, 27, Port='U1', Address=0xFFFF, Channel=0x04)
+    e32b = ebyteE32(32, 33, 35, Port='U2', Address=0xFFFF, Channel=0x06)
+    gateway = nodes['gateway'] = gatewayE32([e32a, e32b], useChecksum=True)
+    assert gateway.start() == 'OK'
+    teller = 0
+    while True:
+        for message in gateway.recvMessages():
+            # the other module of the gateway also hears a broadcast on its channel
+            if 'node' in message:
+                received.append((message['node'], message['msg']))
+        # broadcast on both channels every minute, sent by the module with the most budget left
+        teller += 1
+        if teller % 600 == 0:
+            nodes['sync'] = nodes.get('sync', 0) + 1
+            gateway.sendMessage(0xFFFF, 0x04 if teller % 1200 else 0x06, { 'msg':'sync' })
+        utime.sleep_ms(100)
+
+
+ether = e32sim.Ether()
+board = e32sim.Board('gateway')
+board.attach(e32sim.E32Module(ether, name='U1'), M0=25, M1=26, AUX=27, uart=1)
+board.attach(e32sim.E32Module(ether, name='U2'), M0=32, M1=33, AUX=35, uart=2)
+sim.process(board, gateway)
+# the senders on channel 4 and channel 6 transmit at the same time
+for address, channel in ((1, 0x04), (2, 0x06)):
+    board = e32sim.Board('sender%d'%(address))
+    board.attach(e32sim.E32Module(ether, name=board.name))
+    sim.process(board, sender(address, channel, 5000))
+sim.run(MESSAGES * 20000 + 60000)
+errors = [p.error for p in sim.processes if p.error is not None]
+sim.stop()
+assert not errors, errors
+
+stats = nodes['gateway'].getStats()
+for node in ('01', '02'):
+    assert [m for n, m in received if n == node] == list(range(MESSAGES)), received
+assert sum(stats['sent']) + stats['deferred'] == nodes['sync'] and min(stats['sent']) > 0, stats
+print('OK : %d messages received on 2 channels at the same time, %s'%(len(received), stats))
@@ -0,0 +1,80 @@
+###########################################
+# test of MonitorNodeE32.py with one
+# SensorNodeE32_01.py node on the E32
+# simulator : the samples of a batch are
+# written to influxdb with the time they
+# were taken, also when the batch is only
+# sent at the next wakeup, runs on a host :
+# python3 host/testMonitorE32.py
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+scripts = os.path.dirname(here)
+sys.path[0:0] = [here, scripts]
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim, EPOCH
+import urequests
+import packerE32
+import utime
+
+# seconds from 1970-01-01 to 2000-01-01
+UNIX = 946684800
+# wakeup interval of the sensor node (s)
+INTERVAL = 300
+
+ether = e32sim.Ether()
+board = e32sim.Board('monitor')
+monitor = board.attach(e32sim.E32Module(ether, name='monitor'))
+sim.process(board, e32sim.runScript(os.path.join(scripts, 'MonitorNodeE32.py')))
+board = e32sim.Board('sensor')
+sensor = board.attach(e32sim.E32Module(ether, name='sensor'))
+sim.process(board, e32sim.runScript(os.path.join(scripts, 'SensorNodeE32_01.py')), delay_ms=1000)
+
+# samples added by the sensor node : (time, temp)
+taken = []
+add = packerE32.packerE32.add
+def logAdd(packer, sample, t=None):
+    taken.append((utime.time() if t is None else t, sample['temp']))
+    return add(packer, sample, t)
+packerE32.packerE32.add = logAdd
+# the config write (C2) of the first send of the full batch fails, it is sent at the next wakeup
+sensor.rejected.add(0xC2)
+sim.at(2600 * 1000000, lambda: sensor.rejected.discard(0xC2))
+
+stdout = sys.stdout
+sys.stdout = open(os.devnull, 'w')
+processes = list(sim.processes)
+try:
+    sim.run(3600000)
+finally:
+    sim.stop()
+    sys.stdout = stdout
+errors = [p.error for p in processes if p.error is not None]
+assert not errors, errors
+
+# one batch of 9 samples written at once, one point per sample and field with distinct timestamps in seconds
+assert monitor.stats['rx'] == 1 and len(urequests.posted) == 1
+url, data = urequests.posted[0]
+assert url.endswith('/write?db=serre_frank&precision=s'), url
+points = [line.split(' ') for line in data.split('\n')]
+assert all(p[0] == 'sensors,node=node_01' for p in points), points
+temp = [int(p[2]) for p in points if p[1].startswith('temp=')]
+hum = [int(p[2]) for p in points if p[1].startswith('hum=')]
+assert len(temp) == 9 and temp == hum, points
+assert len(set(temp)) == 9
+# the samples were taken every wakeup interval (plus the measurement time), the last one just before it was sent
+steps = [b - a for a, b in zip(temp, temp[1:])]
+assert all(INTERVAL <= step <= INTERVAL + 30 for step in steps), steps
+# the batch sent at the retry holds the samples of the wakeups 2 to 10 with their own value and time, the monitor
+# dates them from the time it reads the message (polls every 5 s)
+assert len(taken) >= 10, taken
+values = [int(p[1].split('=')[1]) for p in points if p[1].startswith('temp=')]
+assert values == [value for t, value in taken[1:10]], (values, taken)
+assert all(0 <= ts - (t + UNIX) <= 10 for ts, (t, value) in zip(temp, taken[1:10])), (temp, taken)
+print('OK : %d samples written from 1 batch, %d s apart'%(len(temp), steps[0]))
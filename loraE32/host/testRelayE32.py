@@ -0,0 +1,114 @@
+###########################################
+# test of the multi-hop relay on the E32
+# simulator : a sensor out of range of the
+# monitor sends over two relays, runs on a
+# host : python3 host/testRelayE32.py
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [here, os.path.dirname(here)]
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim
+from loraE32 import ebyteE32
+from relayE32 import relayE32
+import utime
+
+MESSAGES = 10
+received = []
+nodes = {}
+
+# sensor 0x0001 -> relay 0x0005 -> relay 0x0006 -> monitor 0x0003
+# 0x0009 is routed in a loop between the relays
+
+
+def scribble(e32):
+    ''' overwrite the free space of the receive buffer at every send, like bytes received while sending '''
+    sendFrame = e32.sendFrame
+    def send(*args, **kwargs):
+        receiver = e32.receiver
+        for i in range(receiver.count, receiver.size):
+            receiver.buf[(receiver.head + i) % receiver.size] = 0
+        receiver.linear[:] = bytes(len(receiver.linear))
+        return sendFrame(*args, **kwargs)
+    e32.sendFrame = send
+
+
+def relay(e32):
+    ''' forward frames in a listen session in fixed mode '''
+    scribble(e32)
+    assert e32.listen(useChecksum=True) == 'OK'
+    while True:
+        for message in e32.pollMessages():
+            pass
+        utime.sleep_ms(50)
+
+
+def sensor():
+    e32 = nodes['sensor'] = relayE32(25, 26, 27, Address=0x0001, Channel=0x02)
+    assert e32.start() == 'OK'
+    e32.setDefaultRoute(0x0005, 0x04)
+    for i in range(MESSAGES):
+        assert e32.sendRouted(0x0003, 0x04, { 'node':'01', 'msg':i }, useChecksum=True) == 'OK'
+        # within the 1% duty cycle budget of an hour of every hop
+        utime.sleep_ms(60000)
+    assert e32.sendRouted(0x0009, 0x04, { 'node':'01', 'msg':'loop' }, useChecksum=True) == 'OK'
+
+
+def relay1():
+    e32 = nodes['relay1'] = relayE32(25, 26, 27, Address=0x0005, Channel=0x04)
+    assert e32.start() == 'OK'
+    e32.addRoute(0x0003, 0x04, 0x0006, 0x04)
+    e32.addRoute(0x0009, 0x04, 0x0006, 0x04)
+    relay(e32)
+
+
+def relay2():
+    e32 = nodes['relay2'] = relayE32(25, 26, 27, Address=0x0006, Channel=0x04)
+    assert e32.start() == 'OK'
+    # monitor in range : no route
+    e32.addRoute(0x0009, 0x04, 0x0005, 0x04)
+    relay(e32)
+
+
+def monitor():
+    # plain ebyteE32 : the last relay sends the bare payload
+    e32 = nodes['monitor'] = ebyteE32(25, 26, 27, Address=0x0003, Channel=0x04)
+    assert e32.start() == 'OK'
+    while True:
+        for message in e32.recvMessages(0x0001, 0x02, useChecksum=True):
+            received.append(message['msg'])
+        utime.sleep_ms(50)
+
+
+ether = e32sim.Ether()
+modules = {}
+for name, target in (('sensor', sensor), ('relay1', relay1), ('relay2', relay2), ('monitor', monitor)):
+    board = e32sim.Board(name)
+    modules[name] = e32sim.E32Module(ether, name=name)
+    board.attach(modules[name])
+    sim.process(board, target)
+for a, b in (('sensor', 'relay2'), ('sensor', 'monitor'), ('relay1', 'monitor')):
+    ether.outOfRange(modules[a], modules[b])
+sim.run(MESSAGES * 60000 + 60000)
+errors = [p.error for p in sim.processes if p.error is not None]
+sim.stop()
+assert not errors, errors
+
+assert received == list(range(MESSAGES)), received
+sensor, relay1, relay2 = nodes['sensor'].getRelayStats(), nodes['relay1'].getRelayStats(), nodes['relay2'].getRelayStats()
+assert sensor['sent'] == MESSAGES + 1, sensor
+assert relay1['forwarded'] == MESSAGES + 1 and relay1['loop'] == 1, relay1
+assert relay2['forwarded'] == MESSAGES + 1, relay2
+# the relays did not decode the payloads
+assert nodes['relay1'].counters['decode_errors'] == 0 and relay1['delivered'] == 0
+# the relays receive in fixed mode : the config writes are the C0 at start and the C2 of the listen session, no
+# transmission mode switch per forward
+for name in ('relay1', 'relay2'):
+    assert nodes[name].counters['config_writes'] <= 2, nodes[name].counters
+print('OK : %d messages over 2 relays, relay stats %s %s'%(len(received), relay1, relay2))
@@ -0,0 +1,61 @@
+###########################################
+# test of the acknowledged delivery on the
+# E32 simulator with frame loss, runs on a
+# host : python3 host/testReliableE32.py
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [here, os.path.dirname(here)]
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim
+from reliableE32 import reliableE32
+import utime
+
+MESSAGES = 40
+received = []
+nodes = {}
+
+
+def sender():
+    e32 = nodes['sender'] = reliableE32(25, 26, 27, Address=0x0001, Channel=0x04)
+    assert e32.start() == 'OK'
+    for i in range(MESSAGES):
+        e32.sendMessage(0x0003, 0x04, { 'msg':i }, useCRC=True)
+        # within the 1% duty cycle budget of an hour, also for the retransmissions
+        utime.sleep_ms(60000)
+
+
+def receiver():
+    e32 = nodes['receiver'] = reliableE32(25, 26, 27, Address=0x0003, Channel=0x04)
+    assert e32.start() == 'OK'
+    while True:
+        for message in e32.recvMessages(0x0001, 0x04, useCRC=True):
+            received.append(message['msg'])
+        utime.sleep_ms(50)
+
+
+# 20% of the frames (data and ACK) is lost, set with LOSS=0.1
+ether = e32sim.Ether(loss=float(os.environ.get('LOSS', 0.2)))
+for name, target in (('sender', sender), ('receiver', receiver)):
+    board = e32sim.Board(name)
+    board.attach(e32sim.E32Module(ether, name=name))
+    sim.process(board, target)
+sim.run(MESSAGES * 60000 + 600000)
+errors = [p.error for p in sim.processes if p.error is not None]
+sim.stop()
+assert not errors, errors
+
+stats = nodes['sender'].getDeliveryStats()
+assert stats['sent'] == MESSAGES, stats
+# no duplicates, in order
+assert received == sorted(set(received)), received
+assert len(received) >= stats['delivered']
+assert stats['ratio'] > 0.95, stats
+print('OK : %d messages, delivery ratio %.2f, %d retries, %d duplicates suppressed, round trip %s ms'%(
+    MESSAGES, stats['ratio'], stats['retries'], nodes['receiver'].delivery['duplicates'], stats['rtt']))
@@ -0,0 +1,272 @@
+###########################################
+# regression test of the ebyteE32 driver
+# on the E32 simulator, runs on a host :
+# cd loraE32 && python3 host/testSimE32.py
+###########################################
+
+import os
+import sys
+import tempfile
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [here, os.path.dirname(here)]
+os.chdir(tempfile.mkdtemp())
+
+import e32sim
+from e32sim import sim
+from loraE32 import ebyteE32
+from framesE32 import framesE32
+import utime
+
+
+def node(ether, name, **kwargs):
+    ''' board with an E32 module and a started driver '''
+    board = e32sim.Board(name)
+    module = board.attach(e32sim.E32Module(ether, name=name))
+    with board:
+        e32 = ebyteE32(25, 26, 27, **kwargs)
+        assert e32.start() == 'OK', name
+    return e32, module
+
+
+def receive(e32, address, channel, **kwargs):
+    ''' poll for a message until the module output is done '''
+    for i in range(50):
+        message = e32.recvMessage(address, channel, **kwargs)
+        if message.get('msg') is not None:
+            return message
+        utime.sleep_ms(20)
+    return None
+
+
+ether = e32sim.Ether()
+sender, module1 = node(ether, 'sender', Address=0x0001, Channel=0x02)
+receiver, module3 = node(ether, 'receiver', Address=0x0003, Channel=0x04)
+other, module5 = node(ether, 'other', Address=0x0005, Channel=0x04)
+monitor, moduleF = node(ether, 'monitor', Address=0xFFFF, Channel=0x04)
+slow, moduleS = node(ether, 'slow', Address=0x0003, Channel=0x04, AirDataRate='0.3k')
+
+# commands : config saved with C0, version
+assert bytes(module1.persisted) == bytes(sender.encodeConfig()[1:])
+assert sender.getVersion() == 'OK'
+assert sender.getConfig() == 'OK' and sender.config['address'] == 0x0001
+# read commands wait for the response bytes, not for a rising edge of AUX
+sender.AUX.irq(handler=None)
+assert sender.getVersion() == 'OK' and sender.getConfig() == 'OK'
+sender.AUX.irq(trigger=sender.AUX.IRQ_RISING, handler=sender.auxHandler)
+
+# fixed P2P : receiver and monitor get the message, other address and other air data rate not
+for e32 in (receiver, other, monitor, slow):
+    e32.recvMessage(0x0001, 0x02)
+start = utime.ticks_ms()
+assert sender.sendMessage(0x0003, 0x04, { 'msg':'P2P' }, useChecksum=True) == 'OK'
+elapsed = utime.ticks_diff(utime.ticks_ms(), start)
+# AUX stays low during the airtime (the estimate of the driver is within 10%)
+assert abs(elapsed - sender.lastAirtime) < sender.lastAirtime // 10 + 30, (elapsed, sender.lastAirtime)
+assert receive(receiver, 0x0001, 0x02, useChecksum=True) == { 'msg':'P2P' }
+assert receive(monitor, 0x0001, 0x02, useChecksum=True) == { 'msg':'P2P' }
+assert receive(other, 0x0001, 0x02, useChecksum=True) is None
+assert receive(slow, 0x0001, 0x02, useChecksum=True) is None
+
+# statistics : the frame sent, mode switches, AUX waits and the received frame with its checksum
+stats = sender.stats()
+assert stats['frames_tx'] == 1 and stats['bytes_tx'] == 3 + 14 + 1, stats
+assert stats['modes'] > 0 and stats['aux_waits'] == sum(stats['aux_hist']) and stats['aux_timeouts'] == 0
+assert stats['flash_writes'] == 1 and stats['sleep_ms'] > 0
+assert receiver.stats()['frames_rx'] == 1 and receiver.stats()['bytes_rx'] == 15
+sender.resetStats()
+assert sender.stats()['frames_tx'] == 0 and sum(sender.stats()['aux_hist']) == 0
+
+# fixed broadcast : every module on channel 4 with the same air data rate
+assert sender.sendMessage(0xFFFF, 0x04, { 'msg':'broadcast' }, useCRC=True) == 'OK'
+for e32 in (receiver, other, monitor):
+    assert receive(e32, 0x0001, 0x02, useCRC=True) == { 'msg':'broadcast' }
+
+# corrupt frames and payloads are counted
+receiver.receiver.write(b'{"msg":"P2P"}\x00{"msg"}' + bytes([-sum(b'{"msg"}') & 0xFF]))
+assert receiver.nextMessage(useChecksum=True)['msg'].startswith('corrupt')
+try:
+    receiver.nextMessage(useChecksum=True)
+except ValueError:
+    pass
+assert receiver.stats()['checksum_errors'] == 1 and receiver.stats()['decode_errors'] == 1
+
+# a '{' which cannot start a JSON frame does not hold back the frames behind it
+frames = framesE32()
+for broken in (b'{"msg":"cut', b'{"msg":12', b'{\x00\xff', b'{"msg":"a\x00'):
+    frames.write(broken + b'{"msg":"next"}\xb2\x01\x07')
+    assert bytes(frames.next()) == b'{"msg":"next"}', broken
+    assert bytes(frames.next()) == b'\xb2\x01\x07' and frames.count == 0
+frame = b'{ "a": [1, -2.5e3, true, false, null, {"b": "{\\"}"}], "c": {} }'
+frames.write(frame)
+assert bytes(frames.next()) == frame
+assert frames.skipped == 11 + 9 + 3 + 10, frames.skipped
+
+# transparent : same address and channel, the message is sent without header
+assert receiver.sendMessage(0x0003, 0x04, { 'msg':'transparent' }) == 'OK'
+assert module3.fixed() == 0
+# the monitor (address 0xFFFF) hears every frame on its channel, the bytes received before its config write are kept
+assert receive(monitor, 0xFFFF, 0x04) == { 'msg':'transparent' }
+assert receive(slow, 0x0003, 0x04) is None
+peer, module3b = node(ether, 'peer', Address=0x0003, Channel=0x04)
+peer.recvMessage(0x0003, 0x04)
+assert receiver.sendMessage(0x0003, 0x04, { 'msg':'transparent' }) == 'OK'
+assert receive(peer, 0x0003, 0x04) == { 'msg':'transparent' }
+
+# power save : only a wakeup preamble at least as long as the wakeup time wakes the receiver
+peer.setOperationMode('powersave')
+assert sender.sendMessage(0x0003, 0x04, { 'msg':'wake up' }) == 'OK'
+utime.sleep_ms(100)
+assert peer.receiver.feed(peer.serdev) > 0
+peer.receiver.clear()
+module3b.active[4] |= 0b111 << 3                  # wakeup time 2000 ms
+assert sender.sendMessage(0x0003, 0x04, { 'msg':'too short' }) == 'OK'
+utime.sleep_ms(100)
+assert peer.receiver.feed(peer.serdev) == 0
+
+# overlapping frames collide
+monitor.recvMessage(0x0001, 0x02)
+monitor.receiver.clear()
+sender.setOperationMode('normal')
+other.setOperationMode('normal')
+sender.serdev.write(b'\x00\x03\x04{"msg":"one"}')
+other.serdev.write(b'\x00\x03\x04{"msg":"two"}')
+assert receive(monitor, 0x0001, 0x02) is None
+assert ether.stats['collisions'] == 2
+
+# fast boot : the module saved the config already, one C1 readback instead of C0
+module3b.active[4] |= 0x80                        # stale temporary config : fixed transmission
+with e32sim.Board('peer') as board:
+    board.attach(module3b)
+    peer = ebyteE32(25, 26, 27, Address=0x0003, Channel=0x04)
+    commands = module3b.stats['commands']
+    assert peer.start() == 'OK'
+assert module3b.stats['commands'] == commands + 1 and peer.avoided['flash'] == 1
+# the active config is unknown after a fast boot, the first send sets it with C2
+receiver.recvMessage(0x0003, 0x04)
+receiver.receiver.clear()
+assert peer.sendMessage(0x0003, 0x04, { 'msg':'restored' }) == 'OK'
+assert module3b.fixed() == 0
+assert receive(receiver, 0x0003, 0x04) == { 'msg':'restored' }
+
+# avoided flash writes only count skipped C0 saves : the C1 readback at start, then the shadow registers
+assert peer.avoided['flash'] == 1
+assert peer.commitConfig() == 'OK' and peer.avoided['flash'] == 2
+flash = peer.counters['flash_writes']
+assert peer.setConfig('setConfigPwrDwnSave') == 'OK' and peer.avoided['flash'] == 3
+assert peer.counters['flash_writes'] == flash
+
+# the JSON file is only written when the config changes, with writeBehind at flushConfig
+json = peer.avoided['json']
+peer.writeBehind = True
+peer.config['txpower'] = 1
+assert peer.setConfig('setConfigPwrDwnSave') == 'OK' and peer.jsonDirty
+assert peer.flushConfig() == 'OK' and not peer.jsonDirty
+assert open('E32config.json').read() == peer.saved
+assert peer.saveConfigToJson() == 'OK' and peer.avoided['json'] == json + 1
+# the first save after a boot compares with the file
+os.utime('E32config.json', ns=(0, 0))
+fresh = ebyteE32(25, 26, 27)
+fresh.config = dict(peer.config)
+assert fresh.saveConfigToJson() == 'OK' and fresh.avoided['json'] == 1
+assert os.stat('E32config.json').st_mtime_ns == 0 and fresh.saved == peer.saved
+
+# profiles : one precompiled C2 frame per switch, no encoding and no switch to sleep mode when asleep
+peer.defineProfiles({ 'monitor':{ 'address':0xFFFF }, 'uplink':{ 'wutime':3 } })
+assert peer.setOperationMode('normal') == 'OK'
+modes, commands = peer.counters['modes'], module3b.stats['commands']
+assert peer.useProfile('monitor') == 'OK' and module3b.address() == 0xFFFF
+assert peer.useProfile('uplink') == 'OK' and module3b.address() == 0x0003 and module3b.wutime_us() == 1000000
+assert peer.counters['modes'] == modes + 1 and module3b.stats['commands'] == commands + 2
+# transmission mode switches use the frames of the profile, sends its wakeup time
+assert peer.sendMessage(0x0005, 0x04, { 'msg':'uplink' }) == 'OK' and module3b.fixed() == 1
+assert peer.profile == 'uplink' and module3b.wutime_us() == 1000000
+assert peer.useProfile('uplink') == 'OK' and peer.avoided['module'] > 0
+# another config change leaves the profile
+assert peer.setRadio('4.8k', 1) == 'OK' and peer.profile is None
+
+# a failed temporary config (C2) : the previous transmission mode is kept, the shadow registers are invalid so the
+# next call writes it again, and the send fails instead of framing for the wrong transmission mode
+assert sender.setTransmissionMode(0) == 'OK' and module1.fixed() == 0
+module1.rejected.add(0xC2)
+errors, frames = sender.counters['config_errors'], sender.counters['frames_tx']
+assert sender.sendMessage(0x0003, 0x04, { 'msg':'rejected' }) == 'NOK'
+assert sender.config['transmode'] == 0 and sender.shadow is None and module1.fixed() == 0
+assert sender.counters['config_errors'] == errors + 1 and sender.counters['frames_tx'] == frames
+assert sender.setTransmissionMode(0) == 'NOK' and sender.counters['config_errors'] == errors + 2
+module1.rejected.clear()
+assert sender.sendMessage(0x0003, 0x04, { 'msg':'accepted' }) == 'OK' and module1.fixed() == 1
+assert receive(receiver, 0x0001, 0x02) == { 'msg':'accepted' }
+# same for the wakeup time of a batch to a power save receiver
+sender.setPeerWakeup(0x0003, 0x04, 3)
+module1.rejected.add(0xC2)
+assert sender.sendMany(0x0003, 0x04, [{ 'msg':'batch' }]) == 'NOK'
+assert sender.config['wutime'] == 0 and sender.shadow is None and sender.getBatchStats()['sent'] == 0
+module1.rejected.clear()
+assert sender.sendMany(0x0003, 0x04, [{ 'msg':'batch' }]) == 'OK' and module1.wutime_us() == 1000000
+assert receive(receiver, 0x0001, 0x02) == { 'msg':'batch' }
+del sender.wakeupPeers[(0x0003, 0x04)]
+# and for the air data rate and TX power, the airtime estimate keeps the settings of the module
+airtime = sender.calcAirtime(20)
+module1.rejected.add(0xC2)
+assert sender.setRadio('9.6k', 2) == 'NOK'
+assert (sender.config['datarate'], sender.config['txpower']) == ('2.4k', 0) and sender.shadow is None
+assert sender.calcAirtime(20) == airtime and module1.datarate() == 2
+module1.rejected.clear()
+assert sender.setRadio('2.4k', 0) == 'OK' and sender.shadow is not None
+
+# listen session : modes set once, frames of other transmitters dropped on their source tag
+def poll(e32, ms=1500):
+    ''' messages of the listen session received within ms '''
+    messages = []
+    for i in range(ms // 50):
+        messages.extend(e32.pollMessages())
+        utime.sleep_ms(50)
+    return messages
+
+assert receiver.listen(0x0001, 0x02, useChecksum=True) == 'OK'
+modes = receiver.counters['modes']
+sender.sendSource = other.sendSource = True
+assert sender.sendMessage(0x0003, 0x04, { 'msg':'from 1' }, useChecksum=True) == 'OK'
+assert other.sendMessage(0x0003, 0x04, { 'msg':'from 5' }, useChecksum=True) == 'OK'
+other.sendSource = False
+assert other.sendMessage(0x0003, 0x04, { 'msg':'untagged' }, useChecksum=True) == 'OK'
+assert poll(receiver) == [{ 'msg':'from 1' }, { 'msg':'untagged' }]
+assert receiver.counters['modes'] == modes and receiver.counters['filtered'] == 1
+# a send within the session, the next poll returns to normal mode
+assert receiver.sendMessage(0x0001, 0x02, { 'msg':'reply' }, useChecksum=True) == 'OK'
+assert sender.sendMessage(0x0003, 0x04, { 'msg':'again' }, useChecksum=True) == 'OK'
+assert poll(receiver) == [{ 'msg':'again' }]
+# recvMessage ends the session and its source filter
+assert receiver.sendMessage(0x0001, 0x02, { 'msg':'reply' }, useChecksum=True) == 'OK'
+other.sendSource = True
+assert other.sendMessage(0x0003, 0x04, { 'msg':'from 5' }, useChecksum=True) == 'OK'
+assert receive(receiver, 0x0005, 0x04, useChecksum=True) == { 'msg':'from 5' }
+assert receiver.session is None and receiver.sourceFilter is None
+# the length of a tagged payload fits in one byte
+frames = other.counters['frames_tx']
+assert other.sendMessage(0x0003, 0x04, { 'msg':'x' * 242 }) == 'NOK' and other.counters['frames_tx'] == frames
+other.sendSource = False
+assert other.sendMessage(0x0003, 0x04, { 'msg':'x' * 242 }) == 'OK'
+
+# duty cycle : the airtime of the last hour is kept in RTC memory during deep sleep, restored at start
+with e32sim.Board('sleeper') as board:
+    moduleW = board.attach(e32sim.E32Module(ether, name='sleeper'))
+    sleeper = ebyteE32(25, 26, 27, Address=0x0007, Channel=0x04)
+    assert sleeper.start() == 'OK' and sleeper.getDutyCycle()['used'] == 0
+    for i in range(3):
+        assert sleeper.sendMessage(0x0003, 0x04, { 'msg':'before sleep' }) == 'OK'
+        utime.sleep_ms(70000)
+    used = sleeper.getDutyCycle()['used']
+    assert used == 3 * sleeper.lastAirtime, used
+    woken = ebyteE32(25, 26, 27, Address=0x0007, Channel=0x04)
+    assert woken.start() == 'OK' and woken.getDutyCycle()['used'] == used
+    assert woken.sendMessage(0x0003, 0x04, { 'msg':'after wake' }) == 'OK'
+    assert woken.getDutyCycle()['used'] == used + woken.lastAirtime
+    # the minutes leave the sliding hour
+    utime.sleep_ms(61 * 60000)
+    woken = ebyteE32(25, 26, 27, Address=0x0007, Channel=0x04)
+    assert woken.start() == 'OK' and woken.getDutyCycle()['used'] == 0
+
+sim.stop()
+print('OK : %d frames, %d delivered, %.1f s virtual time'%(ether.stats['frames'], ether.stats['delivered'], sim.now / 1000000))
@@ -0,0 +1,119 @@
+#######################################################################
+# Host stand-in for the MicroPython uasyncio module : the asyncio event
+# loop of CPython on the virtual clock of the E32 simulator (see e32sim).
+# The loop sleeps in the simulator until its next timer, so tasks of
+# one process take turns like on the ESP32 and a sleep takes no real
+# time. ThreadSafeFlag and StreamReader poll every ms.
+#######################################################################
+
+import asyncio
+import math
+import selectors
+from asyncio import CancelledError, Event, Lock, TimeoutError, gather, wait_for
+from e32sim import sim
+
+
+class SimSelector(selectors.SelectSelector):
+    ''' selector sleeping on the virtual clock instead of waiting for file objects '''
+
+    def select(self, timeout=None):
+        if timeout is None:
+            timeout = 0.001
+        if timeout > 0:
+            sim.sleep_us(math.ceil(timeout * 1000000))
+        return super().select(0)
+
+
+class SimEventLoop(asyncio.SelectorEventLoop):
+    ''' event loop on the virtual clock '''
+
+    def __init__(self):
+        super().__init__(SimSelector())
+
+    def time(self):
+        return sim.now / 1000000
+
+
+def new_event_loop():
+    loop = SimEventLoop()
+    asyncio.set_event_loop(loop)
+    return loop
+
+
+def get_event_loop():
+    try:
+        loop = asyncio.get_event_loop_policy().get_event_loop()
+        if isinstance(loop, SimEventLoop) and not loop.is_closed():
+            return loop
+    except RuntimeError:
+        pass
+    return new_event_loop()
+
+
+def run(coro):
+    loop = new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        # end the tasks still running
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+def create_task(coro):
+    return asyncio.get_event_loop().create_task(coro)
+
+
+async def sleep(seconds):
+    await asyncio.sleep(seconds)
+
+
+async def sleep_ms(ms):
+    await asyncio.sleep(ms / 1000)
+
+
+async def wait_for_ms(aw, ms):
+    return await asyncio.wait_for(aw, ms / 1000)
+
+
+class ThreadSafeFlag:
+    ''' stand-in for uasyncio.ThreadSafeFlag, set by an interrupt handler of the simulator '''
+
+    def __init__(self):
+        self.state = False
+
+    def set(self):
+        self.state = True
+
+    def clear(self):
+        self.state = False
+
+    async def wait(self):
+        while not self.state:
+            await asyncio.sleep(0.001)
+        self.state = False
+
+
+class StreamReader:
+    ''' stand-in for uasyncio.StreamReader on a machine.UART '''
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def read(self, n=-1):
+        while not self.stream.any():
+            await asyncio.sleep(0.001)
+        return self.stream.read(None if n < 0 else n)
+
+    async def readline(self):
+        line = b''
+        while not line.endswith(b'\n'):
+            while not self.stream.any():
+                await asyncio.sleep(0.001)
+            line += self.stream.readline()
+        return line
+
@@ -0,0 +1,38 @@
+#######################################################################
+# Host stand-in for the MicroPython utime module on the virtual clock
+# of the E32 simulator (see e32sim). A sleep takes no real time.
+#######################################################################
+
+from e32sim import sim, EPOCH
+
+
+def sleep(seconds):
+    sim.sleep_us(seconds * 1000000)
+
+
+def sleep_ms(ms):
+    sim.sleep_us(ms * 1000)
+
+
+def sleep_us(us):
+    sim.sleep_us(us)
+
+
+def ticks_ms():
+    return sim.now // 1000
+
+
+def ticks_us():
+    return sim.now
+
+
+def ticks_add(ticks, delta):
+    return ticks + delta
+
+
+def ticks_diff(ticks1, ticks2):
+    return ticks1 - ticks2
+
+
+def time():
+    return EPOCH + sim.now // 1000000
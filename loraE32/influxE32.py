@@ -0,0 +1,62 @@
+#######################################################################
+# MicroPython writer of timestamped sensor points to InfluxDB for the
+# monitor nodes. A batch of packerE32 holds the samples of several
+# wakeups of a sensor node, each sample is written with the time it was
+# taken. influxdbTools writes its points without a timestamp, so the
+# database sets the write time and the samples of a batch overwrite
+# each other. The points are posted to the HTTP API of InfluxDB 1.x in
+# line protocol, with the timestamp in seconds (precision=s) :
+#
+#   points = influxE32(dbhost, 8086, "serre_frank", "sensors")
+#   points.add('node_01', 'temp', 21, 1700000000)
+#   points.write()
+#
+# writes the point "sensors,node=node_01 temp=21 1700000000".
+#######################################################################
+
+import urequests
+
+
+class influxE32:
+    ''' class to write sensor points with their own timestamp to an Influx database '''
+
+    # maximum number of points kept while the database can not be reached
+    MAXPOINTS = 200
+
+
+    def __init__(self, host, port, database, measurement, tag='node', debug=False):
+        ''' constructor for the writer of the points of measurement, tag is the tag key of the node '''
+        self.url = 'http://%s:%d/write?db=%s&precision=s'%(host, port, database)
+        self.measurement = measurement
+        self.tag = tag
+        self.debug = debug
+        self.points = []                           # lines not yet written
+
+
+    def add(self, node, field, value, timestamp):
+        ''' Add the value of field of node, taken at timestamp (seconds since 1970-01-01). The oldest point is
+            dropped when MAXPOINTS points are waiting. '''
+        if len(self.points) >= influxE32.MAXPOINTS:
+            self.points.pop(0)
+        self.points.append('%s,%s=%s %s=%s %d'%(self.measurement, self.tag, node, field, value, timestamp))
+
+
+    def write(self):
+        ''' Write the points added since the last write. Returns True when the database has stored them, the points
+            are kept for the next write otherwise. '''
+        if not self.points:
+            return True
+        try:
+            response = urequests.post(self.url, data='\n'.join(self.points))
+            status = response.status_code
+            response.close()
+        except Exception as E:
+            if self.debug:
+                print('Error on write: ',E)
+            return False
+        if status != 204:
+            if self.debug:
+                print('Influx write failed with status %d'%(status))
+            return False
+        self.points = []
+        return True
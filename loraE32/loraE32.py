@@ -61,6 +61,10 @@
 from machine import Pin, UART
 import utime
 import ujson
+from codecE32 import codecE32
+from framesE32 import framesE32, crc16
+import configE32
+import rtcE32
 
 
 class ebyteE32:
@@ -68,25 +72,27 @@ class ebyteE32:
     
     # UART ports
     PORT = { 'U1':1, 'U2':2 }
-    # UART parity strings
-    PARSTR = { '8N1':'00', '8O1':'01', '8E1':'10' }
-    PARINV = { v:k for k, v in PARSTR.items() }
+    # UART parity (config bits)
+    PARSTR = configE32.PARSTR
+    PARINV = configE32.PARINV
     # UART parity bits
     PARBIT = { 'N':None, 'E':0, 'O':1 }
     # UART baudrate
-    BAUDRATE = { 1200:'000', 2400:'001', 4800:'010', 9600:'011',
-                 19200:'100', 38400:'101', 57600:'110', 115200:'111' }
-    BAUDRINV = { v:k for k, v in BAUDRATE.items() }
+    BAUDRATE = configE32.BAUDRATE
+    BAUDRINV = configE32.BAUDRINV
     # LoRa datarate
-    DATARATE = { '0.3k':'000', '1.2k':'001', '2.4k':'010',
-                 '4.8k':'011', '9.6k':'100', '19.2k':'101' }
-    DATARINV = { v:k for k, v in DATARATE.items() }
+    DATARATE = configE32.DATARATE
+    DATARINV = configE32.DATARINV
+    # maximum message length (size of the module UART buffer)
+    MAXMSG = 512
     # Commands
     CMDS = { 'setConfigPwrDwnSave':0xC0,
              'getConfig':0xC1,
              'setConfigPwrDwnNoSave':0xC2,
              'getVersion':0xC3,
              'reset':0xC4 }
+    # response length of the read commands
+    RESPONSE = { 0xC1:6, 0xC3:4 }
     # operation modes (set with M0 & M1)
     OPERMODE = { 'normal':'00', 'wakeup':'10', 'powersave':'01', 'sleep':'11' }
     # model frequency ranges (MHz)
@@ -112,9 +118,32 @@ class ebyteE32:
                 0b01:['17dBm', '24dBm', '27dBm'],
                 0b10:['14dBm', '21dBm', '24dBm'],
                 0b11:['10dBm', '18dBm', '21dBm'] }
+    # LoRa spreading factor and bandwidth (kHz) of the air data rates (approximation of the SX1276 settings)
+    LORAPARAM = { '0.3k':(12, 125), '1.2k':(11, 250), '2.4k':(11, 500),
+                  '4.8k':(10, 500), '9.6k':(9, 500), '19.2k':(8, 500) }
+    # maximum length of a sub-packet (sent as one LoRa packet)
+    SUBPACKET = 58
+    # duty cycle sub-bands (ETSI EN 300 220) : minimum (kHz), maximum (kHz), name, duty cycle (%)
+    SUBBAND = [ (863000, 865000, 'g', 0.1), (865000, 868000, 'g1', 1), (868000, 868600, 'g2', 1),
+                (868700, 869200, 'g3', 0.1), (869400, 869650, 'g4', 10), (869700, 870000, 'g5', 1),
+                (433050, 434790, 'eu433', 10) ]
+    # duty cycle of frequencies outside the sub-bands (%)
+    DUTYDEFAULT = 1
+    # tag of the RTC memory section with the duty cycle budget (see rtcE32), plus the UART port number
+    DUTYTAG = 0xD0
+    # file with the config saved in the module
+    CONFIGFILE = 'E32config.json'
+    # header byte of a frame tagged with the address and channel of its transmitter
+    SOURCE = 0xB7
+    # UART idle time (bytes) between the frames of a batch, the module starts a new packet after the gap
+    GAPBYTES = 3
+    # margin (ms) on the estimated airtime of a frame in a batch
+    BATCHGUARD = 5
+    # upper bounds (ms) of the histogram buckets of the AUX wait times, the last bucket has no upper bound
+    AUXHIST = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
     
 
-    def __init__(self, PinM0, PinM1, PinAUX, Model='868T20D', Port='U1', Baudrate=9600, Parity='8N1', AirDataRate='2.4k', Address=0x0000, Channel=0x06, debug=False):
+    def __init__(self, PinM0, PinM1, PinAUX, Model='868T20D', Port='U1', Baudrate=9600, Parity='8N1', AirDataRate='2.4k', TxPower=0, Address=0x0000, Channel=0x06, Timeout=1000, debug=False):
         ''' constructor for ebyte E32 LoRa module '''
         # configuration in dictionary
         self.config = {}
@@ -130,7 +159,7 @@ class ebyteE32:
         self.config['iomode'] = 1                  # IO mode (default 1 = not floating)
         self.config['wutime'] = 0                  # wakeup time from sleep mode (default 0 = 250ms)
         self.config['fec'] = 1                     # forward error correction (default 1 = on)
-        self.config['txpower'] = 0                 # transmission power (default 0 = 20dBm/100mW)
+        self.config['txpower'] = TxPower           # transmission power (default 0 = 20dBm/100mW)
         # 
         self.PinM0 = PinM0                         # M0 pin number
         self.PinM1 = PinM1                         # M1 pin number
@@ -139,7 +168,44 @@ class ebyteE32:
         self.M1 = None                             # instance for M1 Pin (set operation mode)
         self.AUX = None                            # instance for AUX Pin (device status : 0=busy - 1=idle)
         self.serdev = None                         # instance for UART
+        self.frame = bytearray(3 + ebyteE32.MAXMSG + 2)  # preallocated frame buffer (header, message, checksum/CRC)
+        self.framemv = memoryview(self.frame)      # view on frame buffer to send parts without copies
+        self.codec = codecE32()                    # binary payload codec
+        self.receiver = framesE32()                # ring buffer splitting the received bytes into frames
+        self.timeout = Timeout                     # maximum wait time for the module to become idle (ms)
+        self.auxrise = False                       # rising edge on AUX pin seen (set by interrupt handler)
+        self.busyHook = None                       # function called while waiting for the module (e.g. to read another module)
         self.debug = debug
+        # shadow registers of the 5 config bytes (without header)
+        self.shadow = None                         # config active in the module (set with C0 or C2)
+        self.persisted = None                      # config saved in the module (set with C0)
+        self.avoided = { 'module':0, 'flash':0, 'json':0 }  # number of avoided module, flash and JSON file writes
+        # JSON file with the config saved in the module
+        self.saved = None                          # contents of the JSON file
+        self.writeBehind = False                   # defer the JSON file write to flushConfig()
+        self.jsonDirty = False                     # JSON file write deferred
+        # duty cycle
+        self.airtime = {}                          # airtime per sub-band : minute and airtime (ms) of the last 60 minutes
+        self.lastAirtime = 0                       # airtime of the last frame sent (ms)
+        self.dutyMaxWait = 0                       # maximum time a send waits for duty cycle budget (ms)
+        self.deferred = 0                          # number of sends deferred for lack of duty cycle budget
+        # wake on radio
+        self.wutime = 0                            # wakeup time (preamble) of sends to receivers not in wakeupPeers
+        self.wakeupPeers = {}                      # wakeup time of power save receivers per address and channel
+        # operating profiles
+        self.profiles = {}                         # per profile : settings and precompiled C2 frames per transmission mode
+        self.profile = None                        # profile in use (None when the config differs from every profile)
+        self.mode = None                           # operation mode set with M0 & M1
+        # listen session
+        self.session = None                        # transmission mode, checksum and CRC of the listen session
+        self.sourceFilter = None                   # transmitter of the listen session : address << 8 | channel
+        self.sendSource = False                    # tag the frames of sendMessage with the address and channel of the module
+        # batched send
+        self.batch = { 'frames':0, 'sent':0, 'bytes':0, 'ms':0, 'fps':0 }  # result of the last sendMany / sendFrames
+        # statistics
+        self.counters = {}                         # operation counters and cumulative durations (ms), see stats()
+        self.auxhist = [0] * (len(ebyteE32.AUXHIST) + 1)  # histogram of the AUX wait times
+        self.resetStats()
         
 
     def start(self):
@@ -156,6 +222,8 @@ class ebyteE32:
                 self.config['parity'] = '8N1'
             if self.config['datarate'] not in ebyteE32.DATARATE:
                 self.config['datarate'] = '2.4k'
+            if self.config['txpower'] not in ebyteE32.TXPOWER:
+                self.config['txpower'] = 0
             if self.config['channel'] > 31:
                 self.config['channel'] = 31
             # make UART instance
@@ -169,10 +237,14 @@ class ebyteE32:
             self.M0 = Pin(self.PinM0, Pin.OUT)
             self.M1 = Pin(self.PinM1, Pin.OUT)
             self.AUX = Pin(self.PinAUX, Pin.IN, Pin.PULL_UP)
+            self.AUX.irq(trigger=Pin.IRQ_RISING, handler=self.auxHandler)
             if self.debug:
                 print(self.M0, self.M1, self.AUX)
-            # set config to the ebyte E32 LoRa module
-            self.setConfig('setConfigPwrDwnSave')
+            # set config to the ebyte E32 LoRa module, unless it has saved the config already
+            if self.restoreConfig() != "OK":
+                self.setConfig('setConfigPwrDwnSave')
+            # airtime of the last hour sent before a deep sleep
+            self.loadDutyCycle()
             return "OK"
         
         except Exception as E:
@@ -181,100 +253,415 @@ class ebyteE32:
             return "NOK"
         
   
-    def sendMessage(self, to_address, to_channel, payload, useChecksum=False):
+    def sendMessage(self, to_address, to_channel, payload, useChecksum=False, useBinary=False, useCRC=False):
         ''' Send the payload to ebyte E32 LoRa modules in transparent or fixed mode. The payload is a data dictionary to
-            accomodate key value pairs commonly used to store sensor data and is converted to a JSON string before sending.
-            The payload can be appended with a 2's complement checksum to validate correct transmission.
+            accomodate key value pairs commonly used to store sensor data and is converted to a JSON string before sending,
+            or with useBinary to a compact binary payload (see codecE32 for the schema of the keys).
+            The payload can be appended with a 2's complement checksum, or with useCRC a CRC-16 (CCITT), to validate
+            correct transmission. The receiver has to use the same setting.
             - transparent mode : all modules with the same address and channel of the transmitter will receive the payload
             - fixed mode : only the module with this address and channel will receive the payload;
                            if the address is 0xFFFF all modules with the same channel will receive the payload'''
+        try:
+            # check payload
+            if type(payload) != dict:
+                print('payload is not a dictionary')
+                return 'NOK'
+            # convert payload to binary or JSON and send it
+            return self.sendFrame(to_address, to_channel, self.encodePayload(payload, useBinary), useChecksum, useCRC)
+        
+        except Exception as E:
+            if self.debug:
+                print('Error on sendMessage: ',E)
+            return "NOK"
+
+
+    def sendFrame(self, to_address, to_channel, data, useChecksum=False, useCRC=False):
+        ''' Send an encoded payload (bytes, bytearray or memoryview) to ebyte E32 LoRa modules in transparent or fixed
+            mode. The frame is built in the preallocated frame buffer and written to the UART without copies. '''
         try:
             # type of transmission
             if (to_address == self.config['address']) and (to_channel == self.config['channel']):
                 # transparent transmission mode
                 # all modules with the same address and channel will receive the payload
-                self.setTransmissionMode(0)
+                transmode = 0
             else:
                 # fixed transmission mode
                 # only the module with the target address and channel will receive the payload
-                self.setTransmissionMode(1)
+                transmode = 1
+            if self.setTransmissionMode(transmode) != "OK":
+                return "NOK"
+            # preamble at least as long as the wake interval of a power save receiver
+            if self.setWakeupTime(self.wakeupPeers.get((to_address, to_channel), self.wutime)) != "OK":
+                return "NOK"
             # put into wakeup mode (includes preamble signals to wake up device in powersave or sleep mode)
-            self.setOperationMode('wakeup')
-            # check payload
-            if type(payload) != dict:
-                print('payload is not a dictionary')
-                return 'NOK'
+            if self.setOperationMode('wakeup') != "OK":
+                return "NOK"
             # encode message
-            msg = []
-            if self.config['transmode'] == 1:     # only for fixed transmission mode
-                msg.append(to_address//256)          # high address byte
-                msg.append(to_address%256)           # low address byte
-                msg.append(to_channel)               # channel
-            js_payload = ujson.dumps(payload)     # convert payload to JSON string 
-            for i in range(len(js_payload)):      # message
-                msg.append(ord(js_payload[i]))    # ascii code of character
-            if useChecksum:                       # attach 2's complement checksum
-                msg.append(int(self.calcChecksum(js_payload), 16))
+            length = self.buildFrame(to_address, to_channel, data, useChecksum, useCRC)
             # debug
             if self.debug:
-                print(msg)
+                print(bytes(self.framemv[:length]))
+            # check duty cycle budget of the sub-band
+            channel = self.config['channel'] if self.config['transmode'] == 0 else to_channel
+            airtime = self.calcAirtime(length)
+            if self.waitForDutyCycle(channel, airtime) != "OK":
+                return "NOK"
             # wait for idle module
-            self.waitForDeviceIdle()
+            if self.waitForDeviceIdle() != "OK":
+                return "NOK"
             # send the message
-            self.serdev.write(bytes(msg))
-            return "OK"
+            self.auxrise = False
+            self.serdev.write(self.framemv[:length])
+            self.addAirtime(channel, airtime)
+            self.counters['frames_tx'] += 1
+            self.counters['bytes_tx'] += length
+            # wait until transmitted
+            return self.waitForDeviceIdle(edge=True, timeout=self.timeout + airtime)
         
         except Exception as E:
             if self.debug:
-                print('Error on sendMessage: ',E)
+                print('Error on sendFrame: ',E)
+            return "NOK"
+
+
+    def encodePayload(self, payload, useBinary=False):
+        ''' Convert the payload dictionary to a JSON string or with useBinary to a binary payload, tagged with the
+            address and channel of the module when sendSource is set. Raises ValueError when the payload is too long
+            for the tag (252 bytes). '''
+        if useBinary:
+            data = self.codec.encode(payload)
+        else:
+            data = ujson.dumps(payload).encode()
+        if self.sendSource:
+            # source tag : [0xB7][LEN][ADDH][ADDL][CHAN][payload], LEN is one byte
+            if 3 + len(data) > 0xFF:
+                raise ValueError('payload too long for the source tag')
+            data = bytes([ebyteE32.SOURCE, 3 + len(data), self.config['address'] >> 8, self.config['address'] & 0xFF,
+                          self.config['channel']]) + data
+        return data
+
+
+    def sendMany(self, to_address, to_channel, payloads, useChecksum=False, useBinary=False, useCRC=False, wakeup=None):
+        ''' Send a list of payload dictionaries to the same destination back to back, see sendMessage and sendFrames.
+            Returns "OK" when all payloads were sent, getBatchStats() has the frames/s achieved. '''
+        try:
+            for payload in payloads:
+                if type(payload) != dict:
+                    print('payload is not a dictionary')
+                    return 'NOK'
+            return self.sendFrames(to_address, to_channel, (self.encodePayload(payload, useBinary) for payload in payloads),
+                                   useChecksum, useCRC, wakeup)
+
+        except Exception as E:
+            if self.debug:
+                print('Error on sendMany: ',E)
+            return "NOK"
+
+
+    def sendFrames(self, to_address, to_channel, frames, useChecksum=False, useCRC=False, wakeup=None):
+        ''' Send encoded payloads (an iterable of bytes, bytearray or memoryview) to the same destination back to back.
+            The transmission mode and operation mode are set once. A frame is written as soon as the module UART
+            buffer (MAXMSG bytes) has room for it : the bytes of a frame leave the buffer when the previous frames
+            are on air, estimated with their airtime. AUX is only awaited after the last frame.
+            With wakeup=None the frames get a wakeup preamble only when the destination is a power save receiver
+            (setPeerWakeup), otherwise normal mode sends them with a short preamble.
+            Returns "OK" when all frames were sent, a batch stops at the first frame deferred for duty cycle. '''
+        start = utime.ticks_ms()
+        sent = 0
+        total = 0
+        count = 0
+        result = "NOK"
+        try:
+            if wakeup is None:
+                wakeup = (to_address, to_channel) in self.wakeupPeers
+            # type of transmission, preamble and operation mode, once for the batch
+            if (to_address == self.config['address']) and (to_channel == self.config['channel']):
+                transmode = 0
+            else:
+                transmode = 1
+            if self.setTransmissionMode(transmode) != "OK":
+                return "NOK"
+            if wakeup and self.setWakeupTime(self.wakeupPeers.get((to_address, to_channel), self.wutime)) != "OK":
+                return "NOK"
+            if self.setOperationMode('wakeup' if wakeup else 'normal') != "OK":
+                return "NOK"
+            channel = self.config['channel'] if self.config['transmode'] == 0 else to_channel
+            # frames in the module buffer : estimated tick the frame is on air and its length
+            queue = []
+            queued = 0
+            onair = start
+            baudrate = int(self.config['baudrate'])
+            result = "OK"
+            for data in frames:
+                count += 1
+                length = self.buildFrame(to_address, to_channel, data, useChecksum, useCRC)
+                airtime = self.calcAirtime(length, wakeup)
+                if self.waitForDutyCycle(channel, airtime) != "OK":
+                    result = "NOK"
+                    break
+                # wait for room in the module buffer
+                while queued + length > ebyteE32.MAXMSG:
+                    if self.AUX.value():
+                        # module idle : buffer empty
+                        queue.clear()
+                        queued = 0
+                        break
+                    now = utime.ticks_ms()
+                    while queue and utime.ticks_diff(now, queue[0][0]) >= 0:
+                        queued -= queue.pop(0)[1]
+                    if queued + length > ebyteE32.MAXMSG:
+                        if utime.ticks_diff(now, onair) > self.timeout:
+                            if self.debug:
+                                print('Timeout waiting for room in the module buffer')
+                            self.counters['aux_timeouts'] += 1
+                            return "NOK"
+                        self.sleepMs(1)
+                # send the frame and leave a gap on the UART
+                if not queue and self.AUX.value():
+                    # module idle : the frame goes on air now
+                    onair = utime.ticks_ms()
+                self.auxrise = False
+                self.serdev.write(self.framemv[:length])
+                queue.append((onair, length))
+                queued += length
+                onair = utime.ticks_add(onair, airtime + ebyteE32.BATCHGUARD)
+                self.addAirtime(channel, airtime)
+                self.counters['frames_tx'] += 1
+                self.counters['bytes_tx'] += length
+                sent += 1
+                total += length
+                self.sleepMs(-(-(length + ebyteE32.GAPBYTES) * 10000 // baudrate))
+            # wait until the last frame is transmitted
+            if sent and self.waitForDeviceIdle(timeout=self.timeout + max(utime.ticks_diff(onair, utime.ticks_ms()), 0)) != "OK":
+                result = "NOK"
+            return result
+
+        except Exception as E:
+            if self.debug:
+                print('Error on sendFrames: ',E)
             return "NOK"
+
+        finally:
+            elapsed = utime.ticks_diff(utime.ticks_ms(), start)
+            self.batch = { 'frames':count, 'sent':sent, 'bytes':total, 'ms':elapsed,
+                           'fps':round(sent * 1000 / elapsed, 2) if elapsed > 0 else 0 }
+
+
+    def getBatchStats(self):
+        ''' Result of the last sendMany or sendFrames : frames offered and sent, bytes sent, duration (ms) and frames/s '''
+        return dict(self.batch)
+
+
+    def calcAirtime(self, length, wakeup=True):
+        ''' Estimate the time on air (ms) of a frame of length bytes with the current air data rate and FEC setting.
+            The module sends a sub-packet of maximum 58 bytes as one LoRa packet. In wakeup mode the preamble of
+            the first packet lasts the wakeup time. '''
+        sf, bw = ebyteE32.LORAPARAM.get(self.config['datarate'], (11, 500))
+        tsym = (1 << sf) / bw                                 # symbol time (ms)
+        de = 1 if tsym > 16 else 0                            # low data rate optimisation
+        cr = self.config['fec']                               # coding rate 4/5 with FEC, no coding without FEC
+        airtime = 0
+        while length > 0:
+            n = min(length, ebyteE32.SUBPACKET)
+            length -= n
+            # preamble (8 symbols + sync)
+            preamble = 12.25 * tsym
+            if wakeup:
+                preamble = max(preamble, 250 * (self.config['wutime'] + 1))
+                wakeup = False
+            airtime += preamble
+            # header and payload with CRC
+            symbols = -(-(8*n - 4*sf + 28 + 16) // (4*(sf - 2*de)))
+            airtime += (8 + max(symbols * (cr + 4), 0)) * tsym
+        return int(airtime + 0.5)
+
+
+    def getSubBand(self, channel):
+        ''' Get the duty cycle sub-band (name, duty cycle %) of a channel '''
+        freqkey = int(self.config['model'].split('T')[0])
+        freq = (ebyteE32.FREQ.get(freqkey)[0] + channel) * 1000
+        for fmin, fmax, name, duty in ebyteE32.SUBBAND:
+            if fmin <= freq < fmax:
+                return name, duty
+        return 'other', ebyteE32.DUTYDEFAULT
+
+
+    def getDutyCycle(self, channel=None):
+        ''' Get the duty cycle budget of the sub-band of a channel (default the module channel) over the last hour.
+            Returns a dictionary with the sub-band, duty cycle (%), limit, used and remaining airtime (ms). '''
+        if channel is None:
+            channel = self.config['channel']
+        name, duty = self.getSubBand(channel)
+        limit = int(3600000 * duty / 100)
+        used = 0
+        minute = utime.time() // 60
+        minutes, airtimes = self.airtime.get(name, ((), ()))
+        for i in range(len(minutes)):
+            if minute - minutes[i] < 60:
+                used += airtimes[i]
+        return { 'subband':name, 'duty':duty, 'limit':limit, 'used':used, 'remaining':max(limit - used, 0) }
+
+
+    def addAirtime(self, channel, airtime):
+        ''' Add the airtime (ms) of a frame to the sliding 1 hour budget of the sub-band of the channel. The hour
+            is kept in 60 slots of 1 minute. '''
+        self.lastAirtime = airtime
+        name = self.getSubBand(channel)[0]
+        if name not in self.airtime:
+            self.airtime[name] = ([0]*60, [0]*60)
+        minutes, airtimes = self.airtime[name]
+        minute = utime.time() // 60
+        slot = minute % 60
+        if minutes[slot] != minute:
+            minutes[slot] = minute
+            airtimes[slot] = 0
+        airtimes[slot] += airtime
+        self.saveDutyCycle()
+
+
+    def saveDutyCycle(self):
+        ''' Keep the airtime of the last hour in RTC memory during deep sleep. A record per sub-band holds the index
+            of the sub-band (len(SUBBAND) for other frequencies), the current minute (4 bytes) and the airtime (ms,
+            2 bytes) of the 60 minutes up to it. Each UART port has its own section. A power cycle clears the RTC
+            memory and so the budget. '''
+        now = utime.time() // 60
+        names = [band[2] for band in ebyteE32.SUBBAND]
+        data = bytearray()
+        for name in self.airtime:
+            minutes, airtimes = self.airtime[name]
+            data.append(names.index(name) if name in names else len(names))
+            data.extend(now.to_bytes(4, 'big'))
+            for k in range(60):
+                slot = (now - k) % 60
+                used = airtimes[slot] if minutes[slot] == now - k else 0
+                data.extend(min(used, 0xFFFF).to_bytes(2, 'big'))
+        try:
+            rtcE32.writeSection(ebyteE32.DUTYTAG + ebyteE32.PORT.get(self.config['port'], 0), data)
+        except Exception as E:
+            if self.debug:
+                print('Error on saveDutyCycle: ',E)
+
+
+    def loadDutyCycle(self):
+        ''' Restore the airtime of the last hour kept in RTC memory by saveDutyCycle '''
+        try:
+            data = rtcE32.readSection(ebyteE32.DUTYTAG + ebyteE32.PORT.get(self.config['port'], 0)) or b''
+        except Exception as E:
+            if self.debug:
+                print('Error on loadDutyCycle: ',E)
+            return
+        record = 1 + 4 + 60*2
+        if len(data) % record:
+            return
+        for pos in range(0, len(data), record):
+            index = data[pos]
+            name = ebyteE32.SUBBAND[index][2] if index < len(ebyteE32.SUBBAND) else 'other'
+            base = int.from_bytes(data[pos+1:pos+5], 'big')
+            minutes, airtimes = [0]*60, [0]*60
+            for k in range(60):
+                slot = (base - k) % 60
+                minutes[slot] = base - k
+                airtimes[slot] = int.from_bytes(data[pos+5+2*k:pos+7+2*k], 'big')
+            self.airtime[name] = (minutes, airtimes)
+
+
+    def getDutyCycleWait(self, channel, airtime):
+        ''' Time (ms) until the sub-band of the channel has budget for a frame with this airtime (ms) '''
+        budget = self.getDutyCycle(channel)
+        needed = airtime - budget['remaining']
+        if needed <= 0:
+            return 0
+        if airtime > budget['limit']:
+            return -1
+        # the oldest minutes leave the sliding hour first
+        name = budget['subband']
+        minutes, airtimes = self.airtime[name]
+        now = utime.time()
+        for minute, used in sorted(zip(minutes, airtimes)):
+            if now // 60 - minute >= 60 or used == 0:
+                continue
+            needed -= used
+            if needed <= 0:
+                return max((minute + 60) * 60 - now, 0) * 1000
+        return -1
+
+
+    def waitForDutyCycle(self, channel, airtime):
+        ''' Wait up to dutyMaxWait ms until the sub-band of the channel has budget for a frame with this airtime.
+            Returns "NOK" when the send has to be deferred, the frame is not sent. '''
+        wait = self.getDutyCycleWait(channel, airtime)
+        if wait == 0:
+            return "OK"
+        if 0 < wait <= self.dutyMaxWait:
+            self.sleepMs(wait)
+            return "OK"
+        self.deferred += 1
+        if self.debug:
+            print('Duty cycle budget exceeded, send deferred for %d ms'%(wait))
+        return "NOK"
+
+
+    def buildFrame(self, to_address, to_channel, data, useChecksum=False, useCRC=False):
+        ''' Build the frame in place in the preallocated frame buffer and return its length. In fixed transmission mode
+            the frame starts with the target address and channel, the payload can be followed by a checksum byte or
+            a CRC-16 (high byte first). '''
+        frame = self.frame
+        start = 0
+        if self.config['transmode'] == 1:     # only for fixed transmission mode
+            frame[0] = to_address >> 8           # high address byte
+            frame[1] = to_address & 0xFF         # low address byte
+            frame[2] = to_channel                # channel
+            start = 3
+        end = start + len(data)
+        if end - start > ebyteE32.MAXMSG:
+            raise ValueError('payload longer than %d bytes'%(ebyteE32.MAXMSG))
+        self.framemv[start:end] = data        # message
+        if useCRC:                            # attach CRC-16
+            crc = crc16(self.framemv[start:end])
+            frame[end] = crc >> 8
+            frame[end + 1] = crc & 0xFF
+            end += 2
+        elif useChecksum:                     # attach 2's complement checksum
+            frame[end] = self.calcChecksumByte(self.framemv[start:end])
+            end += 1
+        return end
         
         
-    def recvMessage(self, from_address, from_channel, useChecksum=False):
+    def recvMessage(self, from_address, from_channel, useChecksum=False, useCRC=False):
         ''' Receive payload messages from ebyte E32 LoRa modules in transparent or fixed mode. The payload is a JSON string
-            of a data dictionary to accomodate key value pairs commonly used to store sensor data. If checksumming is used, the
-            checksum of the received payload including the checksum byte should result in 0 for a correct transmission.
+            of a data dictionary to accomodate key value pairs commonly used to store sensor data, or a binary payload sent
+            with useBinary which is recognised by its header byte. If checksumming is used, the checksum of the received
+            payload including the checksum byte should result in 0 for a correct transmission. With useCRC the payload
+            is followed by a CRC-16 (CCITT) which is verified before decoding.
             - transparent mode : payload will be received if the module has the same address and channel of the transmitter
             - fixed mode : only payloads from transmitters with this address and channel will be received;
                            if the address is 0xFFFF, payloads from all transmitters with this channel will be received'''
         try:
+            # a receive with its own transmission mode ends the listen session and its source filter
+            self.endListen()
             # type of transmission
             if (from_address == self.config['address']) and (from_channel == self.config['channel']):
                 # transparent transmission mode
                 # all modules with the same address and channel will receive the message
-                self.setTransmissionMode(0)
+                transmode = 0
             else:
                 # fixed transmission mode
                 # only the module with the target address and channel will receive the message
-                self.setTransmissionMode(1)
+                transmode = 1
+            if self.setTransmissionMode(transmode) != "OK":
+                return "NOK"
             # put into normal mode
-            self.setOperationMode('normal')
-            # receive message
-            js_payload = self.serdev.read()
-            # debug
-            if self.debug:
-                print(js_payload)
-            # did we receive anything ?
-            if js_payload == None:
+            if self.setOperationMode('normal') != "OK":
+                return "NOK"
+            # receive bytes into the frame receiver
+            self.receiver.feed(self.serdev)
+            # decode the first complete message
+            message = self.nextMessage(useChecksum, useCRC)
+            if message is None:
                 # nothing
                 return { 'msg':None }
-            else :
-                # decode message
-                msg = ''
-                for i in range(len(js_payload)):
-                    msg += chr(js_payload[i])
-                # checksum check
-                if useChecksum:
-                    cs = int(self.calcChecksum(msg),16)
-                    if cs != 0:
-                        # corrupt
-                        return { 'msg':'corrupt message, checksum ' + str(cs) }
-                    else:
-                        # message ok, remove checksum
-                        msg = msg[:-1]
-                # JSON to dictionary
-                message = ujson.loads(msg)
-                return message
+            return message
         
         except Exception as E:
             if self.debug:
@@ -282,6 +669,179 @@ class ebyteE32:
             return "NOK"
 
     
+    def recvMessages(self, from_address, from_channel, useChecksum=False, useCRC=False):
+        ''' Generator yielding all complete messages received from ebyte E32 LoRa modules one at a time, see recvMessage.
+            Messages which can not be decoded are skipped. '''
+        # a receive with its own transmission mode ends the listen session and its source filter
+        self.endListen()
+        # type of transmission
+        if (from_address == self.config['address']) and (from_channel == self.config['channel']):
+            transmode = 0
+        else:
+            transmode = 1
+        if self.setTransmissionMode(transmode) != "OK":
+            return
+        # put into normal mode
+        if self.setOperationMode('normal') != "OK":
+            return
+        # receive bytes into the frame receiver
+        self.receiver.feed(self.serdev)
+        while True:
+            try:
+                message = self.nextMessage(useChecksum, useCRC)
+            except Exception as E:
+                if self.debug:
+                    print('Error on recvMessages: ',E)
+                continue
+            if message is None:
+                return
+            yield message
+
+
+    def listen(self, from_address=None, from_channel=None, useChecksum=False, useCRC=False):
+        ''' Start a listen session : the transmission mode (see recvMessage) and normal mode are set once, pollMessages
+            then only reads the UART. Frames with the address and channel of another transmitter in their header (see
+            frameSource) are dropped before decoding, frames without source are kept. Without from_address the
+            session receives from all transmitters in fixed mode. The session ends with endListen, recvMessage or
+            recvMessages. '''
+        if (from_address == self.config['address']) and (from_channel == self.config['channel']):
+            transmode = 0
+        else:
+            transmode = 1
+        self.session = (transmode, useChecksum, useCRC)
+        if transmode == 1 and from_address is not None and from_address != 0xFFFF:
+            self.sourceFilter = from_address << 8 | from_channel
+        else:
+            self.sourceFilter = None
+        if self.setTransmissionMode(transmode) != "OK":
+            return "NOK"
+        return self.setOperationMode('normal')
+
+
+    def pollMessages(self):
+        ''' Generator yielding the messages received in the listen session one at a time, see listen. Only reads the
+            UART, unless a send switched the transmission mode or the operation mode. '''
+        if self.session is None:
+            return
+        transmode, useChecksum, useCRC = self.session
+        if self.setTransmissionMode(transmode) != "OK":
+            return
+        if self.mode != 'normal' and self.setOperationMode('normal') != "OK":
+            return
+        # receive bytes into the frame receiver
+        self.receiver.feed(self.serdev)
+        while True:
+            try:
+                message = self.nextMessage(useChecksum, useCRC)
+            except Exception as E:
+                if self.debug:
+                    print('Error on pollMessages: ',E)
+                continue
+            if message is None:
+                return
+            yield message
+
+
+    def endListen(self):
+        ''' End the listen session '''
+        self.session = None
+        self.sourceFilter = None
+
+
+    def listenPowerSave(self, wutime=None):
+        ''' Park the E32 LoRa module in power save mode : the radio wakes up every wakeup time to listen for a preamble
+            (wake on radio), a received message is output on the UART. wutime sets the wake interval (WUTIME bits,
+            0=250ms ... 7=2000ms) with a temporary config (C2). The transmitters have to send with a wakeup
+            preamble at least as long, see setPeerWakeup. '''
+        if wutime is not None and self.setWakeupTime(wutime) != "OK":
+            return "NOK"
+        return self.setOperationMode('powersave')
+
+
+    def recvPowerSave(self, useChecksum=False, useCRC=False):
+        ''' Generator yielding the messages received in power save mode one at a time, without mode switches. The module
+            has to be parked with listenPowerSave, see recvMessages. '''
+        # receive bytes into the frame receiver
+        self.receiver.feed(self.serdev)
+        while True:
+            try:
+                message = self.nextMessage(useChecksum, useCRC)
+            except Exception as E:
+                if self.debug:
+                    print('Error on recvPowerSave: ',E)
+                continue
+            if message is None:
+                return
+            yield message
+
+
+    def nextMessage(self, useChecksum=False, useCRC=False):
+        ''' Decode the next complete frame in the frame receiver into a message. The checksum or CRC-16 is validated
+            on the bytes of the frame before decoding. Returns None when no complete frame has been received. '''
+        while True:
+            frame = self.receiver.next(2 if useCRC else 1 if useChecksum else 0)
+            if frame is None:
+                return None
+            # frames of other transmitters than the one of the listen session, on the header bytes
+            if self.sourceFilter is not None:
+                source = self.frameSource(frame)
+                if source is not None and source != self.sourceFilter:
+                    self.counters['filtered'] += 1
+                    continue
+            # debug
+            if self.debug:
+                print(bytes(frame))
+            # CRC check
+            if useCRC:
+                if crc16(frame) != 0:
+                    # corrupt
+                    self.counters['crc_errors'] += 1
+                    return { 'msg':'corrupt message, CRC error' }
+                # message ok, remove CRC
+                frame = frame[:-2]
+            # checksum check
+            elif useChecksum:
+                cs = self.calcChecksumByte(frame)
+                if cs != 0:
+                    # corrupt
+                    self.counters['checksum_errors'] += 1
+                    return { 'msg':'corrupt message, checksum ' + str(cs) }
+                # message ok, remove checksum
+                frame = frame[:-1]
+            # frames without message (None) are skipped
+            message = self.decodeFrame(frame, useChecksum, useCRC)
+            if message is not None:
+                return message
+
+
+    def decodeFrame(self, frame, useChecksum=False, useCRC=False):
+        ''' Decode a validated frame (without checksum or CRC) into a message dictionary '''
+        # binary or JSON to dictionary
+        try:
+            if frame[0] == ebyteE32.SOURCE:
+                frame = frame[5:]
+            if self.codec.isBinary(frame):
+                return self.codec.decode(frame)
+            return ujson.loads(bytes(frame))
+        except Exception:
+            self.counters['decode_errors'] += 1
+            raise
+
+
+    def frameSource(self, frame):
+        ''' Address and channel of the transmitter in the header of a frame (address << 8 | channel), None for a frame
+            without source '''
+        if frame[0] == ebyteE32.SOURCE and len(frame) >= 5:
+            return frame[2] << 16 | frame[3] << 8 | frame[4]
+        return None
+
+
+    def calcChecksumByte(self, data):
+        ''' Calculates the checksum byte of an encoded payload (bytes, bytearray or memoryview) without conversions.
+            Returns the lower byte of the two's complement of the sum of all bytes. '''
+        return -sum(data) & 0xFF
+
+
     def calcChecksum(self, payload):
         ''' Calculates checksum for sending/receiving payloads. Sums the ASCII character values mod256 and returns
             the lower byte of the two's complement of that value in hex notation. '''
@@ -305,6 +865,9 @@ class ebyteE32:
     def stop(self):
         ''' Stop the ebyte E32 LoRa module '''
         try:
+            self.flushConfig()
+            if self.AUX != None:
+                self.AUX.irq(handler=None)
             if self.serdev != None:
                 self.serdev.deinit()
                 del self.serdev
@@ -321,9 +884,11 @@ class ebyteE32:
             The module has to be in sleep mode '''
         try:
             # put into sleep mode
-            self.setOperationMode('sleep')
+            if self.setOperationMode('sleep') != "OK":
+                return "NOK"
             # send command
             HexCmd = ebyteE32.CMDS.get(command)
+            length = ebyteE32.RESPONSE.get(HexCmd)
             if HexCmd in [0xC0, 0xC2]:        # set config to device
                 header = HexCmd
                 HexCmd = self.encodeConfig()
@@ -332,16 +897,22 @@ class ebyteE32:
                 HexCmd = [HexCmd]*3
             if self.debug:
                 print(HexCmd)
+            # received bytes still on the UART go to the frame receiver, not into the response
+            self.receiver.feed(self.serdev)
+            self.auxrise = False
             self.serdev.write(bytes(HexCmd))
-            # wait for result
-            utime.sleep_ms(50)
+            if length is not None:
+                # read command : wait for the response bytes, AUX may already be high again
+                if self.waitForResponse(length) != "OK":
+                    return "NOK"
+            # wait for result (module idle again after the response is sent)
+            elif self.waitForDeviceIdle(edge=True) != "OK":
+                return "NOK"
             # read result
             if command == 'reset':
                 result = ''
             else:
                 result = self.serdev.read()
-                # wait for result
-                utime.sleep_ms(50)
                 # debug
                 if self.debug:
                     print(result)
@@ -401,53 +972,12 @@ class ebyteE32:
 
     def decodeConfig(self, message):
         ''' decode the config message from the ebyte E32 LoRa module to update the config dictionary '''
-        # message byte 0 = header
-        header = int(message[0])
-        # message byte 1 & 2 = address
-        self.config['address'] = int(message[1])*256 + int(message[2])
-        # message byte 3 = speed (parity, baudrate, datarate)
-        bits = '{0:08b}'.format(message[3])
-        self.config['parity'] = ebyteE32.PARINV.get(bits[0:2])
-        self.config['baudrate'] = ebyteE32.BAUDRINV.get(bits[2:5])
-        self.config['datarate'] = ebyteE32.DATARINV.get(bits[5:])
-        # message byte 4 = channel
-        self.config['channel'] = int(message[4])
-        # message byte 5 = option (transmode, iomode, wutime, fec, txpower)
-        bits = '{0:08b}'.format(message[5])
-        self.config['transmode'] = int(bits[0:1])
-        self.config['iomode'] = int(bits[1:2])
-        self.config['wutime'] = int(bits[2:5])
-        self.config['fec'] = int(bits[5:6])
-        self.config['txpower'] = int(bits[6:])
+        configE32.decodeConfig(message, self.config)
         
     
     def encodeConfig(self):
-        ''' encode the config dictionary to create the config message of the ebyte E32 LoRa module '''
-        # Initialize config message
-        message = []
-        # message byte 0 = header
-        message.append(0xC0)
-        # message byte 1 = high address
-        message.append(self.config['address']//256)
-        # message byte 2 = low address
-        message.append(self.config['address']%256)
-        # message byte 3 = speed (parity, baudrate, datarate)
-        bits = '0b'
-        bits += ebyteE32.PARSTR.get(self.config['parity'])
-        bits += ebyteE32.BAUDRATE.get(self.config['baudrate'])
-        bits += ebyteE32.DATARATE.get(self.config['datarate'])
-        message.append(int(bits))
-        # message byte 4 = channel
-        message.append(self.config['channel'])
-        # message byte 5 = option (transmode, iomode, wutime, fec, txpower)
-        bits = '0b'
-        bits += str(self.config['transmode'])
-        bits += str(self.config['iomode'])
-        bits += '{0:03b}'.format(self.config['wutime'])
-        bits += str(self.config['fec'])
-        bits += '{0:02b}'.format(self.config['txpower'])
-        message.append(int(bits))
-        return message
+        ''' encode the config dictionary to create the config message (bytearray) of the ebyte E32 LoRa module '''
+        return configE32.encodeConfig(self.config)
     
 
     def showConfig(self):
@@ -470,32 +1000,134 @@ class ebyteE32:
         print('================================================')
 
 
-    def waitForDeviceIdle(self):
-        ''' Wait for the E32 LoRa module to become idle (AUX pin high) '''
-        count = 0
+    def auxHandler(self, pin):
+        ''' Interrupt handler for the rising edge of the AUX pin (module becomes idle) '''
+        self.auxrise = True
+
+
+    def waitForDeviceIdle(self, edge=False, timeout=None):
+        ''' Wait for the E32 LoRa module to become idle (AUX pin high). With edge=True wait for the rising edge
+            of the AUX pin seen by the interrupt handler since auxrise was cleared. Returns "NOK" on timeout '''
+        if timeout is None:
+            timeout = self.timeout
+        start = utime.ticks_ms()
+        result = "OK"
         # loop for device busy
-        while not self.AUX.value():
-            # increment count
-            count += 1
-            # maximum wait time 100 ms
-            if count == 10:
+        while not (self.auxrise if edge else self.AUX.value()):
+            # maximum wait time
+            if utime.ticks_diff(utime.ticks_ms(), start) >= timeout:
+                if self.debug:
+                    print('Timeout waiting for AUX after %d ms'%(timeout))
+                self.counters['aux_timeouts'] += 1
+                result = "NOK"
+                break
+            if self.busyHook is not None:
+                self.busyHook()
+            self.sleepMs(1)
+        self.countAuxWait(utime.ticks_diff(utime.ticks_ms(), start))
+        return result
+
+
+    def waitForResponse(self, length, timeout=None):
+        ''' Wait for a command response of length bytes on the UART, then for the E32 LoRa module to be idle (AUX pin
+            high). The response of a read command does not need a rising edge of the AUX pin, the module can be idle
+            before the command and stay idle. Returns "NOK" on timeout '''
+        if timeout is None:
+            timeout = self.timeout
+        start = utime.ticks_ms()
+        while self.serdev.any() < length:
+            if utime.ticks_diff(utime.ticks_ms(), start) >= timeout:
+                if self.debug:
+                    print('Timeout waiting for %d response bytes after %d ms'%(length, timeout))
+                return "NOK"
+            self.sleepMs(1)
+        # the module is idle again after the response is sent
+        return self.waitForDeviceIdle(timeout=timeout)
+
+
+    def countAuxWait(self, elapsed):
+        ''' Count a wait for the AUX pin of elapsed ms in the statistics '''
+        self.counters['aux_waits'] += 1
+        self.counters['aux_ms'] += elapsed
+        i = 0
+        for bound in ebyteE32.AUXHIST:
+            if elapsed < bound:
                 break
-            # sleep for 10 ms
-            utime.sleep_ms(10)
+            i += 1
+        self.auxhist[i] += 1
             
             
     def saveConfigToJson(self):
-        ''' Save config dictionary to JSON file ''' 
-        with open('E32config.json', 'w') as outfile:  
-            ujson.dump(self.config, outfile)    
+        ''' Save config dictionary to JSON file, only if the file contents change. Before the first load or save the
+            contents are read from the file. '''
+        data = ujson.dumps(self.config)
+        if self.saved is None:
+            try:
+                with open(ebyteE32.CONFIGFILE, 'r') as infile:
+                    self.saved = infile.read()
+            except OSError:
+                pass
+        if data == self.saved:
+            self.avoided['json'] += 1
+            return "OK"
+        with open(ebyteE32.CONFIGFILE, 'w') as outfile:
+            outfile.write(data)
+        self.saved = data
+        return "OK"
 
 
     def loadConfigFromJson(self):
-        ''' Load config dictionary from JSON file ''' 
-        with open('E32config.json', 'r') as infile:
-            result = ujson.load(infile)
-        print(self.config)
-        
+        ''' Load config dictionary from JSON file '''
+        try:
+            with open(ebyteE32.CONFIGFILE, 'r') as infile:
+                data = infile.read()
+            self.config.update(ujson.loads(data))
+            self.saved = data
+            if self.debug:
+                print(self.config)
+            return "OK"
+
+        except Exception as E:
+            if self.debug:
+                print('Error on loadConfigFromJson: ',E)
+            return "NOK"
+
+
+    def flushConfig(self):
+        ''' Write the JSON file deferred by writeBehind '''
+        if not self.jsonDirty:
+            return "OK"
+        self.jsonDirty = False
+        return self.saveConfigToJson()
+
+
+    def restoreConfig(self):
+        ''' Skip the persistent config write (C0) at start when the config cached in the JSON file and the config
+            read back once from the module (C1) equal the requested config. The module returns its saved config, the
+            active config is unknown until the next temporary config (C2). Returns "NOK" when C0 is needed. '''
+        try:
+            config = bytes(self.encodeConfig()[1:])
+            # cached config
+            with open(ebyteE32.CONFIGFILE, 'r') as infile:
+                data = infile.read()
+            self.saved = data
+            if bytes(configE32.encodeConfig(ujson.loads(data))[1:]) != config:
+                return "NOK"
+            # config saved in the module
+            result = self.sendCommand('getConfig')
+            if len(result) != 6 or bytes(result[1:]) != config:
+                return "NOK"
+            self.persisted = config
+            self.shadow = None
+            self.avoided['flash'] += 1
+            return "OK"
+
+        except Exception as E:
+            if self.debug:
+                print('Error on restoreConfig: ',E)
+            return "NOK"
+
+
     
     def calcFrequency(self):
         ''' Calculate the frequency (= minimum frequency + channel * 1MHz)''' 
@@ -513,44 +1145,249 @@ class ebyteE32:
 
         
     def setTransmissionMode(self, transmode):
-        ''' Set the transmission mode of the E32 LoRa module '''
-        if transmode != self.config['transmode']:
+        ''' Set the transmission mode of the E32 LoRa module. The change is temporary (C2), use commitConfig()
+            to save it persistently in the module '''
+        if transmode != self.config['transmode'] or self.shadow is None:
+            previous = self.config['transmode']
             self.config['transmode'] = transmode
-            self.setConfig('setConfigPwrDwnSave')
+            if self.profile is not None:
+                # precompiled frame of the profile in use
+                result = self.writeProfile(*self.profiles[self.profile][1][transmode])
+            else:
+                result = self.setConfig('setConfigPwrDwnNoSave')
+            if result != "OK":
+                # config of the module unknown : keep the previous transmission mode, the next call writes it again
+                self.config['transmode'] = previous
+                self.shadow = None
+            return result
+        return "OK"
             
             
+    def setWakeupTime(self, wutime):
+        ''' Set the wakeup time of the E32 LoRa module : the wake interval in power save mode and the preamble length in
+            wakeup mode. The change is temporary (C2) '''
+        if wutime != self.config['wutime'] or self.shadow is None:
+            if wutime != self.config['wutime']:
+                self.profile = None
+            previous = self.config['wutime']
+            self.config['wutime'] = wutime
+            result = self.setConfig('setConfigPwrDwnNoSave')
+            if result != "OK":
+                # config of the module unknown : keep the previous wakeup time, the next call writes it again
+                self.config['wutime'] = previous
+                self.shadow = None
+            return result
+        return "OK"
+
+
+    def setRadio(self, datarate, txpower):
+        ''' Set the air data rate ('0.3k' ... '19.2k') and the transmission power (TXPOWER bits, 0=max ... 3=min) of
+            the E32 LoRa module. Both ends of a link need the same air data rate. The change is temporary (C2) '''
+        if datarate != self.config['datarate'] or txpower != self.config['txpower'] or self.shadow is None:
+            if datarate != self.config['datarate'] or txpower != self.config['txpower']:
+                self.profile = None
+            previous = self.config['datarate'], self.config['txpower']
+            self.config['datarate'] = datarate
+            self.config['txpower'] = txpower
+            result = self.setConfig('setConfigPwrDwnNoSave')
+            if result != "OK":
+                # config of the module unknown : keep the previous settings, the next call writes them again
+                self.config['datarate'], self.config['txpower'] = previous
+                self.shadow = None
+            return result
+        return "OK"
+
+
+    def setPeerWakeup(self, address, channel, wutime):
+        ''' Register the wake interval (WUTIME bits) of a power save receiver, sends to this address and channel use a
+            wakeup preamble of the same length '''
+        self.wakeupPeers[(address, channel)] = wutime
+
+
+    def defineProfiles(self, profiles):
+        ''' Declare the operating profiles of the application, e.g. { 'monitor':{ 'address':0xFFFF }, 'uplink':{ 'wutime':3 },
+            'relay':{ 'datarate':'4.8k' } } : per name the config keys which differ from the current config. Each
+            profile holds the complete config, its C2 frames are built once in both transmission modes, see useProfile '''
+        self.profiles = {}
+        self.profile = None
+        for name, settings in profiles.items():
+            config = dict(self.config)
+            config.update(settings)
+            frames = []
+            for transmode in (0, 1):
+                config['transmode'] = transmode
+                frame = bytes(configE32.encodeConfig(config, 0xC2))
+                # frame and shadow registers
+                frames.append((frame, frame[1:]))
+            # the transmission mode is kept unless the profile sets it, the frequency follows the channel
+            if 'transmode' in settings:
+                config['transmode'] = settings['transmode']
+            else:
+                del config['transmode']
+            del config['frequency']
+            self.profiles[name] = (config, frames)
+
+
+    def useProfile(self, name):
+        ''' Switch to an operating profile declared with defineProfiles : one write of its precompiled C2 frame and a
+            wait for AUX. The transmission mode switches of sendMessage and recvMessage use the frames of the profile
+            until another config change. '''
+        config, frames = self.profiles[name]
+        channel = self.config['channel']
+        self.config.update(config)
+        if self.config['channel'] != channel:
+            self.calcFrequency()
+        # sends use the wakeup time of the profile
+        self.wutime = self.config['wutime']
+        self.profile = name
+        return self.writeProfile(*frames[self.config['transmode']])
+
+
+    def writeProfile(self, frame, config):
+        ''' Write a precompiled C2 frame with the config bytes config to the E32 LoRa module, without switching to
+            sleep mode when the module is in sleep mode already '''
+        if config == self.shadow:
+            # module already has this config
+            self.avoided['module'] += 1
+            return "OK"
+        start = utime.ticks_ms()
+        if self.mode != 'sleep' and self.setOperationMode('sleep') != "OK":
+            return "NOK"
+        # received bytes still on the UART go to the frame receiver, not into the response
+        self.receiver.feed(self.serdev)
+        self.auxrise = False
+        self.serdev.write(frame)
+        # the module is idle again after the response is sent
+        result = self.serdev.read() if self.waitForDeviceIdle(edge=True) == "OK" else None
+        self.counters['config_ms'] += utime.ticks_diff(utime.ticks_ms(), start)
+        if result is None or len(result) != 6:
+            self.counters['config_errors'] += 1
+            self.shadow = None
+            return "NOK"
+        self.counters['config_writes'] += 1
+        self.shadow = config
+        return "OK"
+
+
+    def isConfigDirty(self):
+        ''' Check if the config active in the E32 LoRa module differs from the config saved in the module '''
+        return self.shadow != self.persisted
+
+
+    def commitConfig(self):
+        ''' Save the active config persistently (C0) in the E32 LoRa module, only if it was changed temporarily '''
+        if self.shadow is not None and not self.isConfigDirty():
+            self.avoided['flash'] += 1
+            return "OK"
+        return self.setConfig('setConfigPwrDwnSave')
+
+
     def setConfig(self, save_cmd):
-        ''' Set config parameters for the ebyte E32 LoRa module '''
+        ''' Set config parameters for the ebyte E32 LoRa module. A temporary config (C2) is not sent when the
+            shadow registers show the module already has it, a persistent config (C0) when the module has it active
+            and saved '''
         try:
+            # compare with shadow registers
+            config = bytes(self.encodeConfig()[1:])
+            if save_cmd == 'setConfigPwrDwnNoSave':
+                if config == self.shadow:
+                    # module already has this config
+                    self.avoided['module'] += 1
+                    return "OK"
+            elif config == self.shadow and config == self.persisted:
+                # module has saved this config already, only the JSON file can differ
+                self.avoided['flash'] += 1
+                if self.writeBehind:
+                    self.jsonDirty = True
+                    return "OK"
+                return self.saveConfigToJson()
             # send the command
+            start = utime.ticks_ms()
             result = self.sendCommand(save_cmd)
+            self.counters['config_ms'] += utime.ticks_diff(utime.ticks_ms(), start)
             # check result
             if len(result) != 6:
+                # config of the module unknown
+                self.counters['config_errors'] += 1
+                self.shadow = None
                 return "NOK"
+            self.counters['config_writes'] += 1
+            # update shadow registers
+            self.shadow = config
+            if save_cmd == 'setConfigPwrDwnNoSave':
+                # no persistent write in the module and no JSON file write
+                return "OK"
+            self.persisted = config
+            self.counters['flash_writes'] += 1
             # debug
             if self.debug:
                 # decode result
                 self.decodeConfig(result)
                 # show config
                 self.showConfig()
-            # save config to json file
-            self.saveConfigToJson()
-            return "OK"
+            # save config to json file (change-only, deferred to flushConfig with writeBehind)
+            if self.writeBehind:
+                self.jsonDirty = True
+                return "OK"
+            return self.saveConfigToJson()
         
         except Exception as E:
             if self.debug:
                 print('Error on setConfig: ',E)
+            self.shadow = None
             return "NOK"  
 
 
     def setOperationMode(self, mode):
         ''' Set operation mode of the E32 LoRa module '''
+        start = utime.ticks_ms()
         # get operation mode settings (default normal)
         bits = ebyteE32.OPERMODE.get(mode, '00')
         # set operation mode
         self.M0.value(int(bits[0]))
         self.M1.value(int(bits[1]))
-        # wait a moment
-        utime.sleep_ms(50)
+        # the mode switch is done when AUX is high again
+        self.sleepMs(2)
+        result = self.waitForDeviceIdle()
+        self.mode = mode if result == "OK" else None
+        self.counters['modes'] += 1
+        self.counters['mode_ms'] += utime.ticks_diff(utime.ticks_ms(), start)
+        return result
+
+
+    def sleepMs(self, ms):
+        ''' utime.sleep_ms counted in the statistics '''
+        self.counters['sleep_ms'] += ms
+        utime.sleep_ms(ms)
+
+
+    def stats(self):
+        ''' Statistics of the driver since the last resetStats() :
+            - modes, mode_ms : operation mode switches and their duration (ms)
+            - config_writes, config_errors, config_ms, flash_writes : config commands C0/C2 sent, failed, their duration
+              (ms) and persistent writes (C0)
+            - sleep_ms : time blocked in utime.sleep_ms (ms)
+            - aux_waits, aux_timeouts, aux_ms, aux_hist : waits for the AUX pin, timeouts, their duration (ms) and a
+              histogram of the wait times with upper bounds AUXHIST (ms)
+            - frames_tx, bytes_tx, frames_rx, bytes_rx : frames and bytes sent, frames and UART bytes received
+            - checksum_errors, crc_errors, decode_errors : corrupt frames and payloads which could not be decoded
+            - filtered : frames of other transmitters dropped in a listen session '''
+        stats = dict(self.counters)
+        stats['aux_hist'] = list(self.auxhist)
+        stats['frames_rx'] = self.receiver.frames
+        stats['bytes_rx'] = self.receiver.received
+        return stats
+
+
+    def resetStats(self):
+        ''' Reset the statistics, e.g. after publishing them '''
+        for key in ('modes', 'mode_ms', 'config_writes', 'config_errors', 'config_ms', 'flash_writes', 'sleep_ms',
+                    'aux_waits', 'aux_timeouts', 'aux_ms', 'frames_tx', 'bytes_tx', 'checksum_errors', 'crc_errors',
+                    'decode_errors', 'filtered'):
+            self.counters[key] = 0
+        for i in range(len(self.auxhist)):
+            self.auxhist[i] = 0
+        self.receiver.frames = 0
+        self.receiver.received = 0
         
     
\ No newline at end of file
@@ -0,0 +1,126 @@
+#######################################################################
+# MicroPython packer to accumulate sensor samples of several deep sleep
+# cycles in the RTC memory of the ESP32 and send them as one batch in a
+# single E32 sub-packet (58 bytes). Every transmission pays the wakeup
+# preamble and the AUX handshake, so packing samples saves energy :
+#
+#   DHT11 node  (temp, hum)  : 9 samples per transmission
+#   BMP180 node (temp, pres) : 5 samples per transmission
+#
+# The batch layout is described in codecE32. The RTC memory keeps the
+# batch being built during deep sleep (a section of rtcE32), the RTC
+# clock keeps the time.
+#######################################################################
+
+from codecE32 import codecE32
+import rtcE32
+import utime
+
+
+class packerE32:
+    ''' class to pack sensor samples of several deep sleep cycles in one E32 sub-packet '''
+
+    # maximum length of a sub-packet of the E32 module
+    SUBPACKET = 58
+
+
+    def __init__(self, node, fields, codec=None, trailer=1):
+        ''' constructor for the sample packer. node is the node id (2 characters), fields the keys of the samples
+            and trailer the number of bytes appended when sending (1 for a checksum byte). '''
+        self.node = node
+        self.codec = codec if codec is not None else codecE32()
+        self.fields = [self.codec.keys[key] for key in fields]
+        # header : BATCH, LEN, node, t0, number of fields, field ids
+        self.header = 9 + len(self.fields)
+        # record : dt and values
+        self.record = 2 + sum(field[4] for field in self.fields)
+        self.capacity = (packerE32.SUBPACKET - trailer - self.header) // self.record
+        self.buf = bytearray(self.header + self.capacity * self.record)
+        self.length = 0
+        self.load()
+
+
+    def load(self):
+        ''' Load the batch kept in RTC memory, start a new batch if there is none for this node and fields '''
+        data = rtcE32.readSection(codecE32.BATCH) or b''
+        if (len(data) >= self.header and len(data) <= len(self.buf) and data[0] == codecE32.BATCH
+                and bytes(data[2:4]) == self.node.encode() and data[8] == len(self.fields)
+                and bytes(data[9:self.header]) == bytes(field[1] for field in self.fields)):
+            self.buf[:len(data)] = data
+            self.length = len(data)
+        else:
+            self.length = 0
+
+
+    def save(self):
+        ''' Keep the batch in RTC memory during deep sleep '''
+        rtcE32.writeSection(codecE32.BATCH, self.buf[:self.length])
+
+
+    def add(self, sample, t=None):
+        ''' Add a sample (dictionary with a value for each field) taken at time t (seconds, default now) and keep
+            the batch in RTC memory. Returns True when the batch is full and has to be sent. '''
+        if t is None:
+            t = utime.time()
+        if self.isFull():
+            raise ValueError('batch is full')
+        if self.length == 0:
+            # new batch
+            self.buf[0] = codecE32.BATCH
+            self.buf[2:4] = self.node.encode()
+            self.buf[4:8] = t.to_bytes(4, 'big')
+            self.buf[8] = len(self.fields)
+            for i, field in enumerate(self.fields):
+                self.buf[9 + i] = field[1]
+            self.length = self.header
+        t0 = int.from_bytes(self.buf[4:8], 'big')
+        pos = self.length
+        self.buf[pos:pos + 2] = min(max(t - t0, 0), 0xFFFF).to_bytes(2, 'big')
+        pos += 2
+        for field in self.fields:
+            self.codec.packValue(field, self.buf, pos, sample[field[0]])
+            pos += field[4]
+        self.length = pos
+        self.buf[1] = self.length - 2
+        self.save()
+        return self.isFull()
+
+
+    def isFull(self):
+        ''' Check if there is no room for another sample in the sub-packet '''
+        return self.length >= len(self.buf)
+
+
+    def count(self):
+        ''' Number of samples in the batch '''
+        return 0 if self.length == 0 else (self.length - self.header) // self.record
+
+
+    def frame(self):
+        ''' The batch as a binary payload for ebyteE32.sendFrame '''
+        return memoryview(self.buf)[:self.length]
+
+
+    def dropOldest(self):
+        ''' Remove the oldest sample, to make room for a new sample when a full batch could not be sent. The base time
+            t0 moves to the next sample, so the other samples keep their time. '''
+        if self.count() <= 1:
+            self.clear()
+            return
+        first = self.header
+        shift = int.from_bytes(self.buf[first + self.record:first + self.record + 2], 'big')
+        self.buf[first:self.length - self.record] = self.buf[first + self.record:self.length]
+        self.length -= self.record
+        for pos in range(first, self.length, self.record):
+            dt = max(int.from_bytes(self.buf[pos:pos + 2], 'big') - shift, 0)
+            self.buf[pos:pos + 2] = dt.to_bytes(2, 'big')
+        t0 = int.from_bytes(self.buf[4:8], 'big')
+        self.buf[4:8] = (t0 + shift).to_bytes(4, 'big')
+        self.buf[1] = self.length - 2
+        self.save()
+
+
+    def clear(self):
+        ''' Start a new batch after it has been sent '''
+        self.length = 0
+        self.save()
@@ -0,0 +1,214 @@
+#######################################################################
+# MicroPython multi-hop relay for EBYTE E32 Series LoRa modules.
+# The reach of one hop is about 3 km. A relay node forwards the frames
+# of sensor nodes out of range of the monitor node, following a routing
+# table which maps a destination to the address and channel of the next
+# hop :
+#
+#   relay = relayE32(M0pin, M1pin, AUXpin, Address=0x0005, Channel=0x04)
+#   relay.start()
+#   relay.addRoute(0x0003, 0x04, 0x0003, 0x04)  # monitor in range
+#   relay.listen(useChecksum=True)               # fixed mode like the forwards
+#   while True:
+#       for message in relay.pollMessages():
+#           print(message)                       # messages for the relay itself
+#
+# The module removes the target address and channel of a fixed frame,
+# so the final destination travels in a relay header :
+#
+#   [0xB5][LEN][DSTH][DSTL][DCHAN][SRCH][SRCL][SCHAN][TTL][ID][payload]
+#
+# A relay does not decode the payload : it copies the frame, decrements
+# TTL and sends it to the next hop. It receives in fixed mode, so a
+# forward needs no transmission mode switch (C2). The hop which has the destination in
+# range sends the bare payload, so the destination does not need this
+# class. Frames whose TTL runs out or which were forwarded before (same
+# source and ID, a routing loop) are dropped.
+#######################################################################
+
+from loraE32 import ebyteE32
+import ujson
+
+
+class relayE32(ebyteE32):
+    ''' class to forward frames of ebyte E32 LoRa modules over several hops '''
+
+    # header byte of a relay frame
+    RELAY = 0xB5
+    # maximum payload length (length byte)
+    MAXDATA = 247
+    # number of hops a frame can take
+    TTL = 4
+    # number of forwarded frames remembered for loop suppression
+    SEEN = 32
+
+
+    def __init__(self, PinM0, PinM1, PinAUX, **kwargs):
+        ''' constructor for ebyte E32 LoRa module with relay role, see ebyteE32 for the arguments '''
+        super().__init__(PinM0, PinM1, PinAUX, **kwargs)
+        self.routes = {}                           # next hop per destination : address << 8 | channel
+        self.defaultRoute = None                   # next hop of destinations without route
+        self.data = bytearray(10 + relayE32.MAXDATA)  # preallocated relay frame
+        self.datamv = memoryview(self.data)
+        self.forward = bytearray(10 + relayE32.MAXDATA)  # copy of the frame being forwarded
+        self.forwardmv = memoryview(self.forward)
+        self.id = 0                                # ID of the last frame sent by this node
+        self.seen = [-1] * relayE32.SEEN           # source and ID of the last forwarded frames (ring)
+        self.seenNext = 0
+        self.relay = { 'sent':0, 'forwarded':0, 'delivered':0, 'ttl':0, 'loop':0 }
+
+
+    def addRoute(self, address, channel, hop_address, hop_channel):
+        ''' Send frames for the destination address and channel to the next hop '''
+        self.routes[address << 8 | channel] = hop_address << 8 | hop_channel
+
+
+    def removeRoute(self, address, channel):
+        ''' Remove the route of the destination '''
+        self.routes.pop(address << 8 | channel, None)
+
+
+    def setDefaultRoute(self, hop_address, hop_channel):
+        ''' Send frames for destinations without route to the next hop (None removes the default route) '''
+        self.defaultRoute = None if hop_address is None else hop_address << 8 | hop_channel
+
+
+    def nextHop(self, address, channel):
+        ''' Address and channel of the next hop to the destination. A destination without route and without default
+            route is taken to be in range. '''
+        key = address << 8 | channel
+        hop = self.routes.get(key, self.defaultRoute)
+        if hop is None:
+            hop = key
+        return hop >> 8, hop & 0xFF
+
+
+    def sendRouted(self, to_address, to_channel, payload, useChecksum=False, useBinary=False, useCRC=False, ttl=TTL):
+        ''' Send the payload dictionary to a destination over the relays in the routing table, see sendMessage '''
+        try:
+            if type(payload) != dict:
+                print('payload is not a dictionary')
+                return 'NOK'
+            if useBinary:
+                data = self.codec.encode(payload)
+            else:
+                data = ujson.dumps(payload).encode()
+            return self.sendFrameRouted(to_address, to_channel, data, useChecksum, useCRC, ttl)
+
+        except Exception as E:
+            if self.debug:
+                print('Error on sendRouted: ',E)
+            return "NOK"
+
+
+    def sendFrameRouted(self, to_address, to_channel, data, useChecksum=False, useCRC=False, ttl=TTL):
+        ''' Send an encoded payload to a destination over the relays in the routing table, see sendFrame. Without
+            relay on the route the bare payload is sent. '''
+        hop_address, hop_channel = self.nextHop(to_address, to_channel)
+        if (hop_address, hop_channel) == (to_address, to_channel):
+            return self.sendFrame(to_address, to_channel, data, useChecksum, useCRC)
+        self.relay['sent'] += 1
+        return self.sendFrame(hop_address, hop_channel, self.buildRelay(to_address, to_channel, data, ttl),
+                              useChecksum, useCRC)
+
+
+    def sendManyRouted(self, to_address, to_channel, payloads, useChecksum=False, useBinary=False, useCRC=False,
+                       ttl=TTL, wakeup=None):
+        ''' Send a list of payload dictionaries to a destination over the relays in the routing table back to back,
+            e.g. to push a backlog, see sendMany '''
+        try:
+            for payload in payloads:
+                if type(payload) != dict:
+                    print('payload is not a dictionary')
+                    return 'NOK'
+            hop_address, hop_channel = self.nextHop(to_address, to_channel)
+            if (hop_address, hop_channel) == (to_address, to_channel):
+                return self.sendMany(to_address, to_channel, payloads, useChecksum, useBinary, useCRC, wakeup)
+            self.relay['sent'] += len(payloads)
+            # the relay frames are built one at a time in the relay frame buffer
+            frames = (self.buildRelay(to_address, to_channel, self.encodePayload(payload, useBinary), ttl)
+                      for payload in payloads)
+            return self.sendFrames(hop_address, hop_channel, frames, useChecksum, useCRC, wakeup)
+
+        except Exception as E:
+            if self.debug:
+                print('Error on sendManyRouted: ',E)
+            return "NOK"
+
+
+    def buildRelay(self, to_address, to_channel, data, ttl=TTL):
+        ''' Build a relay frame for the destination in the relay frame buffer, returns a view on the frame '''
+        if len(data) > relayE32.MAXDATA:
+            raise ValueError('payload longer than %d bytes'%(relayE32.MAXDATA))
+        self.id = (self.id + 1) & 0xFF
+        frame = self.data
+        frame[0] = relayE32.RELAY
+        frame[1] = 8 + len(data)
+        frame[2] = to_address >> 8
+        frame[3] = to_address & 0xFF
+        frame[4] = to_channel
+        frame[5] = self.config['address'] >> 8
+        frame[6] = self.config['address'] & 0xFF
+        frame[7] = self.config['channel']
+        frame[8] = ttl
+        frame[9] = self.id
+        self.datamv[10:10 + len(data)] = data
+        # a frame of this node coming back is a loop
+        self.isSeen(frame[5] << 24 | frame[6] << 16 | frame[7] << 8 | frame[9])
+        return self.datamv[:10 + len(data)]
+
+
+    def isSeen(self, key):
+        ''' Check if the frame with key (source and ID) was forwarded before and remember it '''
+        if key in self.seen:
+            return True
+        self.seen[self.seenNext] = key
+        self.seenNext = (self.seenNext + 1) % relayE32.SEEN
+        return False
+
+
+    def decodeFrame(self, frame, useChecksum=False, useCRC=False):
+        ''' Decode a validated frame : the payload of a relay frame for this node is decoded, other relay frames are
+            forwarded to the next hop without decoding. Returns None for a forwarded or dropped frame, see
+            ebyteE32.decodeFrame '''
+        if frame[0] != relayE32.RELAY or len(frame) < 10:
+            return super().decodeFrame(frame, useChecksum, useCRC)
+        to_address = frame[2] << 8 | frame[3]
+        to_channel = frame[4]
+        if to_address == self.config['address'] and to_channel == self.config['channel']:
+            self.relay['delivered'] += 1
+            return super().decodeFrame(frame[10:], useChecksum, useCRC)
+        # forward
+        if frame[8] <= 1:
+            self.relay['ttl'] += 1
+            return None
+        if self.isSeen(frame[5] << 24 | frame[6] << 16 | frame[7] << 8 | frame[9]):
+            self.relay['loop'] += 1
+            return None
+        # the frame is a view on the receive buffer, which a send can fill with received bytes
+        length = len(frame)
+        self.forwardmv[:length] = frame
+        frame = self.forwardmv[:length]
+        hop_address, hop_channel = self.nextHop(to_address, to_channel)
+        if (hop_address, hop_channel) == (to_address, to_channel):
+            # destination in range : bare payload
+            result = self.sendFrame(to_address, to_channel, frame[10:], useChecksum, useCRC)
+        else:
+            frame[8] -= 1
+            result = self.sendFrame(hop_address, hop_channel, frame, useChecksum, useCRC)
+        if result == "OK":
+            self.relay['forwarded'] += 1
+        return None
+
+
+    def frameSource(self, frame):
+        ''' Address and channel of the source of a relay frame, see ebyteE32.frameSource '''
+        if frame[0] == relayE32.RELAY and len(frame) >= 10:
+            return frame[5] << 16 | frame[6] << 8 | frame[7]
+        return super().frameSource(frame)
+
+
+    def getRelayStats(self):
+        ''' Relay statistics : frames sent by this node over relays, forwarded, delivered to this node and dropped
+            because the TTL ran out or because of a loop '''
+        return dict(self.relay)
@@ -0,0 +1,233 @@
+#######################################################################
+# MicroPython acknowledged delivery for EBYTE E32 Series LoRa modules.
+# sendMessage of ebyteE32 is fire-and-forget. This class adds a
+# reliable mode on top of fixed P2P transmission :
+#
+#   e32 = reliableE32(M0pin, M1pin, AUXpin, Address=0x0001, Channel=0x02)
+#   e32.start()
+#   e32.sendMessage(0x0003, 0x04, { 'node':'01', 'temp':'21' }, useCRC=True)
+#
+# The E32 module does not transmit the address of the transmitter, so
+# the frames carry it :
+#
+#   DATA : [0xB3][LEN][ADDH][ADDL][CHAN][SEQ][payload]
+#   ACK  : [0xB4][4][ADDH][ADDL][CHAN][SEQ]
+#
+# ADDH, ADDL and CHAN are the address and channel of the transmitter of
+# the frame, SEQ counts the frames per destination. The receiver sends
+# an ACK back to the address and channel of the transmitter, also for a
+# duplicate (its ACK may have been lost) which is not delivered again.
+# The transmitter retransmits until the ACK arrives, with a timeout
+# derived from the measured round trips (RFC 6298, Karn's algorithm) and
+# the airtime of the ACK at the current air data rate, doubled at every
+# retry. Broadcast (0xFFFF) and transparent messages are sent as by
+# ebyteE32, without ACK.
+#
+# The receiver acknowledges while it decodes the frames, so it should
+# call recvMessage or recvMessages often : the polling interval adds to
+# the round trip.
+#######################################################################
+
+from loraE32 import ebyteE32
+import utime
+
+
+class reliableE32(ebyteE32):
+    ''' class to send acknowledged messages with ebyte E32 LoRa modules '''
+
+    # header bytes of the frames
+    DATA = 0xB3
+    ACK = 0xB4
+    # maximum payload length (length byte)
+    MAXDATA = 251
+    # number of retransmissions
+    RETRIES = 3
+    # minimum time above the airtime of the ACK, maximum retransmission timeout (ms)
+    MINRTO = 100
+    MAXRTO = 60000
+    # time a received sequence number is remembered for duplicate suppression (ms)
+    DUPWINDOW = 120000
+    # polling interval while waiting for the ACK (ms)
+    POLL = 10
+
+
+    def __init__(self, PinM0, PinM1, PinAUX, **kwargs):
+        ''' constructor for ebyte E32 LoRa module with acknowledged delivery, see ebyteE32 for the arguments '''
+        super().__init__(PinM0, PinM1, PinAUX, **kwargs)
+        self.data = bytearray(6 + reliableE32.MAXDATA)   # preallocated DATA frame
+        self.datamv = memoryview(self.data)
+        self.ack = bytearray(6)                          # preallocated ACK frame
+        self.seqout = {}                                 # last sequence number sent per destination
+        self.seqin = {}                                  # last sequence number and time received per source
+        self.rtt = {}                                    # smoothed round trip and variation per destination (ms)
+        self.waiting = None                              # destination and sequence number of the awaited ACK
+        self.acked = False                               # awaited ACK received
+        self.pending = []                                # messages received while waiting for an ACK
+        self.delivery = { 'sent':0, 'delivered':0, 'failed':0, 'retries':0, 'duplicates':0, 'acks':0 }
+
+
+    def sendFrame(self, to_address, to_channel, data, useChecksum=False, useCRC=False, retries=RETRIES):
+        ''' Send an encoded payload with acknowledged delivery in fixed P2P mode, see ebyteE32.sendFrame. Retransmits
+            until the ACK of the receiver arrives, at most retries times. Returns "NOK" if no ACK arrived. '''
+        if to_address == 0xFFFF or ((to_address == self.config['address']) and (to_channel == self.config['channel'])):
+            # broadcast and transparent messages are not acknowledged
+            return super().sendFrame(to_address, to_channel, data, useChecksum, useCRC)
+        try:
+            length = self.buildData(to_address, to_channel, data)
+            destination = (to_address, to_channel)
+            seq = self.seqout[destination]
+            self.delivery['sent'] += 1
+            rto = self.getRTO(destination, useChecksum, useCRC)
+            for attempt in range(retries + 1):
+                if attempt:
+                    self.delivery['retries'] += 1
+                    rto = min(2 * rto, reliableE32.MAXRTO)
+                self.waiting = (destination, seq)
+                self.acked = False
+                if super().sendFrame(to_address, to_channel, self.datamv[:length], useChecksum, useCRC) != "OK":
+                    continue
+                start = utime.ticks_ms()
+                if self.waitForAck(start, rto, useChecksum, useCRC):
+                    # Karn's algorithm : only the round trip of a frame sent once is unambiguous
+                    if attempt == 0:
+                        self.addRTT(destination, utime.ticks_diff(utime.ticks_ms(), start))
+                    self.delivery['delivered'] += 1
+                    return "OK"
+            self.delivery['failed'] += 1
+            return "NOK"
+
+        except Exception as E:
+            if self.debug:
+                print('Error on sendFrame: ',E)
+            return "NOK"
+
+        finally:
+            self.waiting = None
+
+
+    def buildData(self, to_address, to_channel, data):
+        ''' Build the DATA frame with the next sequence number for the destination and return its length '''
+        if len(data) > reliableE32.MAXDATA:
+            raise ValueError('payload longer than %d bytes'%(reliableE32.MAXDATA))
+        destination = (to_address, to_channel)
+        seq = (self.seqout.get(destination, -1) + 1) & 0xFF
+        self.seqout[destination] = seq
+        frame = self.data
+        frame[0] = reliableE32.DATA
+        frame[1] = 4 + len(data)
+        frame[2] = self.config['address'] >> 8
+        frame[3] = self.config['address'] & 0xFF
+        frame[4] = self.config['channel']
+        frame[5] = seq
+        self.datamv[6:6 + len(data)] = data
+        return 6 + len(data)
+
+
+    def waitForAck(self, start, rto, useChecksum=False, useCRC=False):
+        ''' Listen in normal mode until the awaited ACK arrives or rto ms have passed since start. Messages received
+            meanwhile are kept for recvMessage. Returns True when the ACK arrived. '''
+        while not self.acked:
+            if utime.ticks_diff(utime.ticks_ms(), start) >= rto:
+                return False
+            if self.setOperationMode('normal') == "OK":
+                self.receiver.feed(self.serdev)
+                while not self.acked:
+                    message = self.nextMessage(useChecksum, useCRC)
+                    if message is None:
+                        break
+                    self.pending.append(message)
+            if not self.acked:
+                self.sleepMs(reliableE32.POLL)
+        return True
+
+
+    def nextMessage(self, useChecksum=False, useCRC=False):
+        ''' Decode the next message, messages received while waiting for an ACK first, see ebyteE32.nextMessage '''
+        if self.pending and self.waiting is None:
+            return self.pending.pop(0)
+        return super().nextMessage(useChecksum, useCRC)
+
+
+    def decodeFrame(self, frame, useChecksum=False, useCRC=False):
+        ''' Decode a validated frame : an ACK is registered, a DATA frame is acknowledged and its payload decoded
+            unless it is a duplicate. Returns None for an ACK or a duplicate, see ebyteE32.decodeFrame '''
+        header = frame[0]
+        if header == reliableE32.ACK and len(frame) == 6:
+            self.delivery['acks'] += 1
+            # a monitor (address 0xFFFF) acknowledges frames sent to any address on its channel
+            address = frame[2] << 8 | frame[3]
+            if self.waiting is not None:
+                (to_address, to_channel), seq = self.waiting
+                if frame[5] == seq and frame[4] == to_channel and address in (to_address, 0xFFFF):
+                    self.acked = True
+            return None
+        if header != reliableE32.DATA or len(frame) < 6:
+            return super().decodeFrame(frame, useChecksum, useCRC)
+        source = ((frame[2] << 8 | frame[3]), frame[4])
+        seq = frame[5]
+        # decode before sending the ACK : the frame is a view on the receive buffer
+        message = super().decodeFrame(frame[6:], useChecksum, useCRC)
+        self.sendAck(source, seq, useChecksum, useCRC)
+        now = utime.ticks_ms()
+        last = self.seqin.get(source)
+        if last is not None and last[0] == seq and utime.ticks_diff(now, last[1]) < reliableE32.DUPWINDOW:
+            self.delivery['duplicates'] += 1
+            return None
+        self.seqin[source] = (seq, now)
+        return message
+
+
+    def frameSource(self, frame):
+        ''' Address and channel of the transmitter of a DATA frame, see ebyteE32.frameSource. An ACK has no source :
+            it is matched to the awaited ACK. '''
+        if frame[0] == reliableE32.DATA and len(frame) >= 6:
+            return frame[2] << 16 | frame[3] << 8 | frame[4]
+        if frame[0] == reliableE32.ACK:
+            return None
+        return super().frameSource(frame)
+
+
+    def sendAck(self, source, seq, useChecksum=False, useCRC=False):
+        ''' Send the ACK of the DATA frame with sequence number seq to the address and channel of its transmitter '''
+        ack = self.ack
+        ack[0] = reliableE32.ACK
+        ack[1] = 4
+        ack[2] = self.config['address'] >> 8
+        ack[3] = self.config['address'] & 0xFF
+        ack[4] = self.config['channel']
+        ack[5] = seq
+        return super().sendFrame(source[0], source[1], ack, useChecksum, useCRC)
+
+
+    def getRTO(self, destination, useChecksum=False, useCRC=False):
+        ''' Retransmission timeout (ms) for the destination : the smoothed round trip plus 4 times its variation, at
+            least the airtime of the ACK. Before the first round trip is measured, twice the airtime of the ACK plus
+            the timeout of the module. '''
+        airtime = self.calcAirtime(6 + (2 if useCRC else 1 if useChecksum else 0))
+        rtt = self.rtt.get(destination)
+        if rtt is None:
+            rto = 2 * airtime + self.timeout
+        else:
+            rto = rtt[0] + 4 * rtt[1]
+        return int(min(max(rto, airtime + reliableE32.MINRTO), reliableE32.MAXRTO))
+
+
+    def addRTT(self, destination, sample):
+        ''' Update the smoothed round trip and its variation (ms) of the destination with a measured round trip '''
+        rtt = self.rtt.get(destination)
+        if rtt is None:
+            self.rtt[destination] = (sample, sample / 2)
+        else:
+            srtt, rttvar = rtt
+            rttvar = 0.75 * rttvar + 0.25 * abs(srtt - sample)
+            srtt = 0.875 * srtt + 0.125 * sample
+            self.rtt[destination] = (srtt, rttvar)
+
+
+    def getDeliveryStats(self):
+        ''' Delivery statistics : number of messages sent, delivered and failed, retransmissions, duplicates received and
+            ACKs received, the delivery ratio and the smoothed round trip (ms) per destination '''
+        stats = dict(self.delivery)
+        stats['ratio'] = self.delivery['delivered'] / self.delivery['sent'] if self.delivery['sent'] else None
+        stats['rtt'] = { '%04X:%02X'%(d[0], d[1]):int(r[0]) for d, r in self.rtt.items() }
+        return stats
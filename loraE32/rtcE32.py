@@ -0,0 +1,48 @@
+#######################################################################
+# MicroPython sections in the RTC memory of the ESP32 for the E32 LoRa
+# modules. The RTC memory (machine.RTC().memory(), 2 KB) is one block
+# which is kept during deep sleep and cleared by a power cycle. The
+# sample batch of packerE32 and the duty cycle budget of ebyteE32 share
+# it as sections with a tag and a length :
+#
+#   [TAG][LENH][LENL][data] [TAG][LENH][LENL][data] ...
+#
+# Writing a section keeps the other sections.
+#######################################################################
+
+from machine import RTC
+
+
+def readSections():
+    ''' Sections in the RTC memory as a dictionary tag -> data, empty when the memory holds no valid sections '''
+    data = RTC().memory()
+    sections = {}
+    pos = 0
+    while pos + 3 <= len(data):
+        length = data[pos + 1] << 8 | data[pos + 2]
+        if pos + 3 + length > len(data):
+            return {}
+        sections[data[pos]] = bytes(data[pos + 3:pos + 3 + length])
+        pos += 3 + length
+    return sections if pos == len(data) else {}
+
+
+def readSection(tag):
+    ''' Data of the section with tag, None when there is none '''
+    return readSections().get(tag)
+
+
+def writeSection(tag, data):
+    ''' Write the data of the section with tag, None removes the section '''
+    sections = readSections()
+    if data is None:
+        sections.pop(tag, None)
+    else:
+        sections[tag] = bytes(data)
+    memory = bytearray()
+    for key in sections:
+        memory.append(key)
+        memory.append(len(sections[key]) >> 8)
+        memory.append(len(sections[key]) & 0xFF)
+        memory.extend(sections[key])
+    RTC().memory(memory)
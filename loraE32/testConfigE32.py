@@ -0,0 +1,39 @@
+###########################################
+# round trip test of the config codec
+###########################################
+# encodes and decodes every valid setting
+# of the config bytes, runs on the ESP32
+# or on a host : python3 testConfigE32.py
+###########################################
+
+import configE32
+
+# default config bytes for E32-868T20D : C0 00 00 1A 06 44
+config = { 'address':0x0000, 'parity':'8N1', 'baudrate':9600, 'datarate':'2.4k', 'channel':0x06,
+           'transmode':0, 'iomode':1, 'wutime':0, 'fec':1, 'txpower':0 }
+assert configE32.encodeConfig(config) == bytes([0xC0, 0x00, 0x00, 0x1A, 0x06, 0x44])
+assert configE32.encodeConfig(config, 0xC2)[0] == 0xC2
+
+count = 0
+for parity in configE32.PARSTR:
+    for baudrate in configE32.BAUDRATE:
+        for datarate in configE32.DATARATE:
+            for transmode in (0, 1):
+                for iomode in (0, 1):
+                    for wutime in range(8):
+                        for fec in (0, 1):
+                            for txpower in range(4):
+                                config = { 'address':(count * 7919) & 0xFFFF, 'parity':parity, 'baudrate':baudrate,
+                                           'datarate':datarate, 'channel':count % 32, 'transmode':transmode,
+                                           'iomode':iomode, 'wutime':wutime, 'fec':fec, 'txpower':txpower }
+                                message = configE32.encodeConfig(config)
+                                assert configE32.decodeConfig(message, {}) == config, config
+                                count += 1
+
+# every address and channel
+for address in range(0x10000):
+    config['address'] = address
+    config['channel'] = address & 0xFF
+    assert configE32.decodeConfig(configE32.encodeConfig(config), {}) == config, config
+
+print('OK : %d settings encoded and decoded'%(count))
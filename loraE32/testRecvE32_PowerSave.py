@@ -0,0 +1,31 @@
+###########################################
+# receiving fixed point to point in power
+# save mode (wake on radio)
+###########################################
+# transmitter - address 0001 - channel 02
+# message     - address 0003 - channel 04
+# receiver    - address 0003 - channel 04
+# the receiver wakes up every 1000ms
+###########################################
+
+from loraE32 import ebyteE32
+import utime
+
+M0pin = 25
+M1pin = 26
+AUXpin = 27
+
+e32 = ebyteE32(M0pin, M1pin, AUXpin, Address=0x0003, Channel=0x04, debug=False)
+
+e32.start()
+
+# park the module in power save mode
+e32.listenPowerSave(0b011)
+
+while True:
+    # no mode switches, the module outputs a received message on the UART
+    for message in e32.recvPowerSave(useChecksum=True):
+        print('Receiving fixed P2P power save: message %s'%(message))
+    utime.sleep_ms(100)
+
+e32.stop()
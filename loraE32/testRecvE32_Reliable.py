@@ -0,0 +1,32 @@
+###########################################
+# receiving fixed point to point with ACK
+###########################################
+# transmitter - address 0001 - channel 04
+# message     - address 0003 - channel 04
+# receiver    - address 0003 - channel 04
+# the ACK is sent on the channel of the
+# transmitter : channel 02 (864MHz) has a
+# 0.1% duty cycle, channel 04 (866MHz) 1%
+###########################################
+
+from reliableE32 import reliableE32
+import utime
+
+M0pin = 25
+M1pin = 26
+AUXpin = 27
+
+e32 = reliableE32(M0pin, M1pin, AUXpin, Address=0x0003, Channel=0x04, debug=False)
+
+e32.start()
+
+from_address = 0x0001
+from_channel = 0x04
+
+while True:
+    # poll often, the ACK is sent when the message is decoded
+    for message in e32.recvMessages(from_address, from_channel, useCRC=True):
+        print('Receiving reliable P2P: address %d - channel %d - message %s'%(from_address, from_channel, message))
+    utime.sleep_ms(50)
+
+e32.stop()
@@ -0,0 +1,35 @@
+###########################################
+# sending fixed point to point to a
+# receiver in power save mode
+###########################################
+# transmitter - address 0001 - channel 02
+# message     - address 0003 - channel 04
+# receiver    - address 0003 - channel 04
+# the receiver wakes up every 1000ms, the
+# wakeup preamble is as long
+###########################################
+
+from loraE32 import ebyteE32
+import utime
+
+M0pin = 25
+M1pin = 26
+AUXpin = 27
+
+e32 = ebyteE32(M0pin, M1pin, AUXpin, Address=0x0001, Channel=0x02, debug=False)
+
+e32.start()
+
+to_address = 0x0003
+to_channel = 0x04
+e32.setPeerWakeup(to_address, to_channel, 0b011)
+
+teller = 0
+while True:
+    message = { 'msg': 'HELLO WORLD %s'%str(teller) }
+    print('Sending fixed P2P power save: address %d - channel %d - message %s'%(to_address, to_channel, message))
+    e32.sendMessage(to_address, to_channel, message, useChecksum=True)
+    teller += 1
+    utime.sleep_ms(10000)
+
+e32.stop()
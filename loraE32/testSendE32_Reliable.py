@@ -0,0 +1,37 @@
+###########################################
+# sending fixed point to point with ACK
+###########################################
+# transmitter - address 0001 - channel 04
+# message     - address 0003 - channel 04
+# receiver    - address 0003 - channel 04
+# the ACK is sent on the channel of the
+# transmitter : channel 02 (864MHz) has a
+# 0.1% duty cycle, channel 04 (866MHz) 1%
+###########################################
+
+from reliableE32 import reliableE32
+import utime
+
+M0pin = 25
+M1pin = 26
+AUXpin = 27
+
+e32 = reliableE32(M0pin, M1pin, AUXpin, Address=0x0001, Channel=0x04, debug=False)
+
+e32.start()
+
+to_address = 0x0003
+to_channel = 0x04
+
+teller = 0
+while True:
+    message = { 'msg': 'HELLO WORLD %s'%str(teller) }
+    print('Sending reliable P2P: address %d - channel %d - message %s'%(to_address, to_channel, message), end='')
+    result = e32.sendMessage(to_address, to_channel, message, useCRC=True)
+    print(' - %s'%(result))
+    if teller % 10 == 9:
+        print(e32.getDeliveryStats())
+    teller += 1
+    utime.sleep_ms(2000)
+
+e32.stop()